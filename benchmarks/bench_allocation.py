@@ -0,0 +1,115 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Compare the IPv6 allocators with the linear hosts() scan they replaced:
+#
+#   python benchmarks/bench_allocation.py --peers 10000
+
+import argparse
+import base64
+import os
+import time
+from ipaddress import IPv6Address, IPv6Network
+from typing import Callable, Dict, Set
+
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+
+
+def legacy_next_ipv6_address(net: Network) -> IPv6Address:
+    addresses: Set[IPv6Address] = set()
+    for name in net.peers:
+        if net.peers[name].address_ipv6:
+            addresses.add(IPv6Address(net.peers[name].address_ipv6))
+    for address in IPv6Network(net.ipv6_range).hosts():
+        if address in addresses:
+            continue
+        return address
+    raise RuntimeError("No more IPv6 addresses available")
+
+
+def fake_key() -> str:
+    return base64.standard_b64encode(os.urandom(32)).decode()
+
+
+def populate(net: Network, num_peers: int, assign: Callable[[Network, str], str]):
+    for i in range(num_peers):
+        public_key = fake_key()
+        net.add_peer(
+            Peer(
+                "peer{}".format(i),
+                ipv6=assign(net, public_key),
+                private_key=fake_key(),
+                public_key=public_key,
+            )
+        )
+
+
+def timed(function: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark IPv6 address allocation")
+    parser.add_argument("--peers", type=int, default=10000)
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=20,
+        help="allocations to time for the legacy scan on the full network",
+    )
+    args = parser.parse_args()
+
+    results: Dict[str, float] = {}
+
+    sequential = Network(ipv4=False)
+    results["sequential: build"] = timed(
+        lambda: populate(
+            sequential,
+            args.peers,
+            lambda net, key: str(net.get_next_ipv6_address(key)),
+        )
+    )
+    results["sequential: next address"] = (
+        timed(lambda: [sequential.get_next_ipv6_address() for _ in range(1000)]) / 1000
+    )
+
+    derived = Network(ipv4=False, ipv6_mode="public-key")
+    results["public-key: build"] = timed(
+        lambda: populate(
+            derived, args.peers, lambda net, key: str(net.get_next_ipv6_address(key))
+        )
+    )
+    results["public-key: next address"] = (
+        timed(lambda: [derived.get_next_ipv6_address(fake_key()) for _ in range(1000)])
+        / 1000
+    )
+
+    results["legacy scan: next address"] = (
+        timed(
+            lambda: [legacy_next_ipv6_address(sequential) for _ in range(args.samples)]
+        )
+        / args.samples
+    )
+
+    print("{} peers".format(args.peers))
+    for name in results:
+        print("{:<28} {:12.6f} s".format(name, results[name]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Time and peak memory of the core operations on synthetic networks of growing
+# size. Keys are random bytes, so no wg binary and no X25519 is involved:
+#
+#   python benchmarks/bench_scale.py --sizes 10 100 1000 10000 -o results.json
+#   python benchmarks/bench_scale.py --sizes 10 100 1000 10000 --compare results.json
+#
+# Full meshes grow quadratically and are skipped above --max-mesh-peers.
+
+import argparse
+import base64
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from wgadmin import render, topology
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+
+TOPOLOGIES = ["sparse", "hub", "mesh"]
+FORMATS = [".json", ".yml", ".wgnet", ".db"]
+SPARSE_DEGREE = 4
+
+
+class FakeKeys:
+    def __init__(self, seed: int):
+        self.random = random.Random(seed)
+
+    def __call__(self) -> str:
+        return base64.standard_b64encode(
+            self.random.getrandbits(256).to_bytes(32, "little")
+        ).decode()
+
+
+def create_peers(net: Network, num_peers: int, keys: FakeKeys):
+    for i in range(num_peers):
+        public_key = keys()
+        net.add_peer(
+            Peer(
+                "peer{}".format(i),
+                ipv4=str(net.get_next_ipv4_address()),
+                ipv6=str(net.get_next_ipv6_address(public_key)),
+                endpoint_address="peer{}.example.org".format(i) if i % 10 == 0 else "",
+                private_key=keys(),
+                public_key=public_key,
+            )
+        )
+
+
+def edges(net: Network, name: str) -> Iterator[topology.Edge]:
+    peers = list(net.peers.values())
+    if name == "mesh":
+        return topology.mesh(peers)
+    if name == "hub":
+        return topology.hub(peers[0], peers)
+
+    # ring plus chords: every peer has a handful of neighbors
+    def sparse() -> Iterator[topology.Edge]:
+        seen = set()
+        for i in range(len(peers)):
+            for step in range(1, SPARSE_DEGREE // 2 + 1):
+                j = (i + step**2) % len(peers)
+                if i != j:
+                    edge = topology.normalize(peers[i].name, peers[j].name)
+                    if edge not in seen:
+                        seen.add(edge)
+                        yield edge
+
+    return sparse()
+
+
+def connect(net: Network, name: str, keys: FakeKeys) -> int:
+    count = 0
+    for peer_a, peer_b in edges(net, name):
+        net.add_connection(peer_a, peer_b, keys())
+        count += 1
+    return count
+
+
+def measure(
+    function: Callable[[], Any], repeat: int, memory: bool
+) -> Tuple[float, Optional[int]]:
+    seconds = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    if not memory:
+        return seconds, None
+    # a second run under tracemalloc, which slows the code down considerably
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def run_case(
+    name: str,
+    num_peers: int,
+    directory: Path,
+    formats: List[str],
+    repeat: int,
+    memory: bool,
+) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+
+    def record(operation: str, function: Callable[[], Any], **extra: Any):
+        seconds, peak = measure(function, repeat, memory)
+        entry = {"topology": name, "peers": num_peers, "operation": operation}
+        entry.update(extra)
+        entry.update({"seconds": seconds, "peak_bytes": peak})
+        results.append(entry)
+        print(
+            "{:<7} {:>7} {:<18} {:10.4f} s {:>12}".format(
+                name,
+                num_peers,
+                operation + (" " + extra["format"] if "format" in extra else ""),
+                seconds,
+                "" if peak is None else "{:.1f} MiB".format(peak / 2**20),
+            ),
+            flush=True,
+        )
+
+    def new_network() -> Network:
+        return Network(ipv4_range="10.0.0.0/8")
+
+    record("allocate", lambda: create_peers(new_network(), num_peers, FakeKeys(1)))
+
+    net = new_network()
+    create_peers(net, num_peers, FakeKeys(1))
+    record(
+        "connect",
+        lambda: connect(Network.from_dict(net.to_dict()), name, FakeKeys(2)),
+    )
+    num_edges = connect(net, name, FakeKeys(2))
+
+    # fresh renderers on every run, they cache the sections of the peers
+    record(
+        "render",
+        lambda: [
+            renderer.render(peer)
+            for renderer in map(render.get_renderer, render.BUILTIN_FORMATS)
+            for peer in net.peers.values()
+        ],
+    )
+
+    for suffix in formats:
+        path = directory / (name + str(num_peers) + suffix)
+
+        def save():
+            if path.exists():
+                path.unlink()
+            net.origin = None
+            net.to_file(path)
+
+        record("save", save, format=suffix)
+        record(
+            "load",
+            lambda: Network.from_file(path),
+            format=suffix,
+            bytes=path.stat().st_size,
+        )
+
+    for entry in results:
+        entry.setdefault("edges", num_edges)
+    return results
+
+
+def metadata() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            cwd=str(Path(__file__).parent),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def result_key(entry: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (entry["topology"], entry["peers"], entry["operation"], entry.get("format"))
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> bool:
+    baseline = {result_key(entry): entry for entry in old["results"]}
+    regressed = False
+    print("\ncompared with {}".format(old["meta"].get("commit") or "baseline"))
+    for entry in new["results"]:
+        previous = baseline.get(result_key(entry))
+        if previous is None or previous["seconds"] <= 0:
+            continue
+        ratio = entry["seconds"] / previous["seconds"]
+        marker = ""
+        if ratio > threshold:
+            marker = "  slower"
+            regressed = True
+        print(
+            "{:<7} {:>7} {:<18} {:6.2f}x{}".format(
+                entry["topology"],
+                entry["peers"],
+                entry["operation"]
+                + (" " + entry["format"] if entry.get("format") else ""),
+                ratio,
+                marker,
+            )
+        )
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark wgadmin at scale")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument(
+        "--topologies", nargs="+", choices=TOPOLOGIES, default=TOPOLOGIES
+    )
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument(
+        "--max-mesh-peers",
+        type=int,
+        default=300,
+        help="skip full meshes larger than this",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="report the fastest of these runs"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="do not measure peak memory"
+    )
+    parser.add_argument("-o", "--output", type=Path, help="write the results as JSON")
+    parser.add_argument(
+        "--compare", type=Path, help="JSON results of an earlier run to compare with"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.5,
+        help="slowdown factor that counts as a regression (default: 1.5)",
+    )
+    args = parser.parse_args()
+
+    document: Dict[str, Any] = {"meta": metadata(), "results": []}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.topologies:
+            for num_peers in args.sizes:
+                if name == "mesh" and num_peers > args.max_mesh_peers:
+                    continue
+                document["results"] += run_case(
+                    name,
+                    num_peers,
+                    Path(directory),
+                    args.formats,
+                    args.repeat,
+                    not args.no_memory,
+                )
+
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=2) + "\n")
+    if args.compare and compare(
+        json.loads(args.compare.read_text()), document, args.threshold
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Measure the start-up cost of typical wgadmin invocations and fail when they
+# import heavy dependencies they do not need or exceed an import time budget:
+#
+#   python benchmarks/bench_startup.py --max-import-ms 100
+
+import argparse
+import base64
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+
+# modules that must stay out of the start-up path of the listed commands
+FORBIDDEN = [
+    "argcomplete",
+    "asyncio",
+    "concurrent.futures.process",
+    "jinja2",
+    "sqlite3",
+    "yaml",
+]
+
+
+def fake_key() -> str:
+    return base64.standard_b64encode(os.urandom(32)).decode()
+
+
+def create_network(path: Path, num_peers: int):
+    net = Network()
+    for i in range(num_peers):
+        net.add_peer(
+            Peer(
+                "peer{}".format(i),
+                ipv4=str(net.get_next_ipv4_address()),
+                private_key=fake_key(),
+                public_key=fake_key(),
+            )
+        )
+    for i in range(1, num_peers):
+        net.add_connection("peer0", "peer{}".format(i), fake_key())
+    net.to_file(path)
+
+
+def environment() -> Dict[str, str]:
+    # measure with cached bytecode, like an installed wgadmin
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def import_times(arguments: List[str]) -> Dict[str, int]:
+    # self time in microseconds of every module imported by the invocation
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "wgadmin"] + arguments,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+        env=environment(),
+    )
+    times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, _, module = line[len("import time:") :].split("|")
+        times[module.strip()] = int(self_time)
+    return times
+
+
+def wall_time(arguments: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "wgadmin"] + arguments,
+            stdout=subprocess.DEVNULL,
+            check=True,
+            env=environment(),
+        )
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark wgadmin start-up")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--max-import-ms",
+        type=float,
+        default=100.0,
+        help="budget for the import time of wgadmin and its dependencies",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = str(Path(directory) / "wg0.json")
+        create_network(Path(config), 20)
+
+        invocations: List[Tuple[str, List[str]]] = [
+            ("help", ["--help"]),
+            ("list-peers", ["list-peers", "-c", config]),
+            ("generate-config", ["generate-config", "-c", config, "--wq", "peer0"]),
+        ]
+        baseline = sum(
+            int(line.split("|")[0][len("import time:") :])
+            for line in subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", "pass"],
+                stderr=subprocess.PIPE,
+                check=True,
+                universal_newlines=True,
+                env=environment(),
+            ).stderr.splitlines()
+            if line.startswith("import time:") and "self [us]" not in line
+        )
+
+        failed = False
+        print("{:<18} {:>10} {:>10}".format("invocation", "wall [ms]", "import [ms]"))
+        for name, arguments in invocations:
+            # the first run writes the bytecode caches
+            wall_time(arguments, 1)
+            times = import_times(arguments)
+            imported_ms = (sum(times.values()) - baseline) / 1000
+            print(
+                "{:<18} {:10.1f} {:10.1f}".format(
+                    name, wall_time(arguments, args.repeat) * 1000, imported_ms
+                )
+            )
+
+            forbidden = [module for module in FORBIDDEN if module in times]
+            if forbidden:
+                print("  imports {}".format(", ".join(forbidden)))
+                failed = True
+            if imported_ms > args.max_import_ms:
+                print("  exceeds the budget of {} ms".format(args.max_import_ms))
+                failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, Iterable, Optional, Tuple
+
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+
+# helpers to build test networks, imported by the test modules
+
+
+def add_peer(
+    net: Network,
+    name: str,
+    shard: Optional[str] = None,
+    ipv6: bool = True,
+    keys: bool = True,
+    **kwargs: Any
+) -> Peer:
+    # placeholder keys keep documents readable, validators need real ones
+    public_key = "public-" + name
+    if keys:
+        kwargs.setdefault("private_key", "private-" + name)
+        kwargs.setdefault("public_key", public_key)
+    if "ipv4" not in kwargs:
+        kwargs["ipv4"] = str(net.get_next_ipv4_address(shard))
+    if ipv6 and ("ipv6" not in kwargs):
+        kwargs["ipv6"] = str(net.get_next_ipv6_address(public_key, shard))
+    peer = Peer(name, **kwargs)
+    net.add_peer(peer, shard)
+    return peer
+
+
+def build_network(
+    names: Iterable[str],
+    edges: Iterable[Tuple[str, str]] = (),
+    net: Optional[Network] = None,
+    keys: bool = True,
+    **kwargs: Any
+) -> Network:
+    if net is None:
+        net = Network()
+    for name in names:
+        add_peer(net, name, keys=keys, **kwargs)
+    for peer_a, peer_b in edges:
+        net.add_connection(peer_a, peer_b, "psk-" + peer_a + peer_b if keys else "")
+    return net
@@ -0,0 +1,76 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+
+import pytest
+
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+from wgadmin.subcommands.add_peers import add_peers
+
+
+def test_add_peers(tmp_path, capsys):
+    config = tmp_path / "wg0.yml"
+    Network(ipv4_range="10.0.0.0/29").to_file(config)
+
+    peers = tmp_path / "peers.csv"
+    peers.write_text(
+        "\n".join(
+            ["name,ipv4,port", "a,,", "b,10.0.0.1,", "a,,", "c,,70000", "d,,1234"]
+        )
+    )
+
+    args = argparse.Namespace(
+        config=config, input=str(peers), format=None, jobs=1, shard=None, force=False
+    )
+    with pytest.raises(SystemExit):
+        add_peers(args)
+    assert "added 3 peers, 2 errors" in capsys.readouterr().out
+
+    net = Network.from_file(config)
+    assert list(net.peers) == ["a", "b", "d"]
+    assert net.peers["a"].address_ipv4 == "10.0.0.2"
+    assert net.peers["b"].address_ipv4 == "10.0.0.1"
+    assert net.peers["d"].address_ipv4 == "10.0.0.3"
+    assert net.peers["d"].port == 1234
+
+
+def test_add_peers_force_keeps_rejected(tmp_path, capsys):
+    config = tmp_path / "wg0.yml"
+    net = Network(ipv4_range="10.0.0.0/29")
+    net.add_peer(Peer("a", ipv4="10.0.0.1"))
+    net.add_peer(Peer("b", ipv4="10.0.0.2"))
+    net.to_file(config)
+    public_key = net.peers["b"].public_key
+
+    peers = tmp_path / "peers.csv"
+    peers.write_text("\n".join(["name,ipv4", "a,10.0.0.1", "b,10.0.0.1", "c,,x"]))
+
+    args = argparse.Namespace(
+        config=config, input=str(peers), format=None, jobs=1, shard=None, force=True
+    )
+    with pytest.raises(SystemExit):
+        add_peers(args)
+    captured = capsys.readouterr()
+    assert "added 1 peers, 2 errors" in captured.out
+    assert "more cells than columns" in captured.err
+    assert 'peer "b": IPv4 address in use' in captured.err
+
+    net = Network.from_file(config)
+    assert list(net.peers) == ["a", "b"]
+    assert net.peers["a"].address_ipv4 == "10.0.0.1"
+    assert net.peers["b"].address_ipv4 == "10.0.0.2"
+    assert net.peers["b"].public_key == public_key
@@ -0,0 +1,91 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from ipaddress import IPv4Address, IPv6Address
+
+import pytest
+
+from wgadmin.allocator import IPv4Allocator, IPv6Allocator
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+
+
+def test_ipv4_allocator():
+    allocator = IPv4Allocator("10.0.0.0/29", reserved=["10.0.0.1", "10.0.0.4/31"])
+    assert allocator.allocate() == IPv4Address("10.0.0.2")
+    assert allocator.allocate() == IPv4Address("10.0.0.3")
+    assert allocator.allocate() == IPv4Address("10.0.0.6")
+    with pytest.raises(RuntimeError):
+        allocator.allocate()
+
+    allocator.release("10.0.0.3")
+    allocator.release("10.0.0.1")
+    allocator.release("10.0.0.7")
+    assert allocator.allocate() == IPv4Address("10.0.0.3")
+    assert allocator.num_free() == 0
+
+
+def test_network_reuses_addresses():
+    net = Network(ipv6=False, ipv4_range="10.0.0.0/24", ipv4_reserved=["10.0.0.1"])
+    for name in ["a", "b", "c"]:
+        address = str(net.get_next_ipv4_address())
+        net.add_peer(Peer(name, ipv4=address, private_key="x", public_key="y"))
+    assert [peer.address_ipv4 for peer in net.peers.values()] == [
+        "10.0.0.2",
+        "10.0.0.3",
+        "10.0.0.4",
+    ]
+
+    net.peers["a"].add_connection(net.peers["b"], "psk")
+    net.remove_peer("b")
+    assert net.peers["a"].connections == []
+    assert net.get_next_ipv4_address() == IPv4Address("10.0.0.3")
+
+    loaded = Network.from_yaml(net.to_yaml())
+    assert loaded.ipv4_reserved == ["10.0.0.1"]
+    assert loaded.get_next_ipv4_address() == IPv4Address("10.0.0.3")
+
+
+def test_ipv6_allocator():
+    allocator = IPv6Allocator("fd00::/64")
+    assert allocator.allocate() == IPv6Address("fd00::1")
+    assert allocator.allocate() == IPv6Address("fd00::2")
+    allocator.mark_used("fd00::3")
+    assert allocator.allocate() == IPv6Address("fd00::4")
+
+    allocator.release("fd00::2")
+    assert allocator.allocate() == IPv6Address("fd00::2")
+    assert allocator.allocate() == IPv6Address("fd00::5")
+
+    small = IPv6Allocator("fd00::/126")
+    assert [str(small.allocate()) for _ in range(3)] == [
+        "fd00::1",
+        "fd00::2",
+        "fd00::3",
+    ]
+    with pytest.raises(RuntimeError):
+        small.allocate()
+
+
+def test_ipv6_derived_from_public_key():
+    allocator = IPv6Allocator("fd00::/64")
+    address = allocator.derive("public-key")
+    assert address in allocator.network
+    assert allocator.derive("public-key") == address
+
+    allocator.mark_used(address)
+    probed = allocator.derive("public-key")
+    assert probed != address
+    assert probed in allocator.network
@@ -0,0 +1,119 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import json
+
+import pytest
+
+from wgadmin import check
+from wgadmin.network import Network
+from wgadmin.subcommands.check import check as check_command
+
+from .conftest import build_network
+
+
+def create_network() -> Network:
+    return build_network(
+        ["a", "b", "c", "d"], [("a", "b"), ("a", "c"), ("c", "d")], keys=False
+    )
+
+
+def codes(problems):
+    return sorted(problem.code for problem in problems)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_valid(jobs):
+    assert check.check_network(create_network(), jobs=jobs) == []
+
+
+def test_problems():
+    net = create_network()
+    document = net.to_dict()
+    peers = document["peers"]
+    peers["b"]["ipv4"] = peers["a"]["ipv4"]
+    peers["c"]["ipv4"] = "192.168.0.1"
+    peers["c"]["ipv6"] = "10.0.0.9"
+    peers["d"]["public_key"] = peers["a"]["public_key"]
+    peers["a"]["port"] = "70000"
+    del peers["b"]["interface"]
+    document["connections"].append({"peer_a": "b", "peer_b": "a", "psk": ""})
+    document["connections"].append({"peer_a": "a", "peer_b": "x", "psk": ""})
+    document["connections"].append({"peer_a": "d", "peer_b": "d", "psk": "psk"})
+
+    problems = check.check_document(document)
+    assert codes(problems) == [
+        "address-out-of-range",
+        "duplicate-address",
+        "duplicate-connection",
+        "duplicate-public-key",
+        "invalid-address",
+        "invalid-port",
+        "key-mismatch",
+        "missing-field",
+        "self-connection",
+        "unknown-peer",
+    ]
+    by_code = {problem.code: problem for problem in problems}
+    assert by_code["duplicate-address"].peers == ("a", "b")
+    assert by_code["key-mismatch"].peers == ("d",)
+    assert by_code["unknown-peer"].peers == ("a", "x")
+    assert json.dumps([problem.to_dict() for problem in problems])
+
+    assert "key-mismatch" not in codes(check.check_document(document, keys=False))
+
+
+def test_malformed():
+    document = create_network().to_dict()
+    document["settings"]["ipv6_range"] = "10.0.0.0/24"
+    document["peers"]["a"]["private_key"] = "private-a"
+    document["connections"][0]["psk"] = "psk"
+    del document["connections"][1]["peer_b"]
+    assert codes(check.check_document(document)) == [
+        "invalid-key",
+        "invalid-key",
+        "invalid-range",
+        "missing-field",
+    ]
+
+
+def test_pre_save_hook(tmp_path):
+    config = tmp_path / "wg0.json"
+    net = create_network()
+    net.pre_save_hooks.append(check.validate)
+    net.to_file(config)
+
+    net.update_peer("b", address_ipv4=net.peers["a"].address_ipv4)
+    with pytest.raises(RuntimeError, match="duplicate-address"):
+        net.to_file(config)
+    assert Network.from_file(config).peers["b"].address_ipv4 == "10.0.0.2"
+
+
+def test_command(tmp_path, capsys):
+    config = tmp_path / "wg0.json"
+    document = create_network().to_dict()
+    config.write_text(json.dumps(document))
+    args = argparse.Namespace(config=config, format="json", skip_keys=False, jobs=1)
+    check_command(args)
+    assert json.loads(capsys.readouterr().out) == {"valid": True, "problems": []}
+
+    # would make Network.from_file fail
+    document["connections"].append({"peer_a": "a", "peer_b": "x", "psk": ""})
+    config.write_text(json.dumps(document))
+    args.format = "text"
+    with pytest.raises(SystemExit):
+        check_command(args)
+    assert capsys.readouterr().out.startswith("unknown-peer: ")
@@ -0,0 +1,160 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import asyncio
+import json
+import threading
+
+import pytest
+
+from wgadmin import daemon, keypool, server
+from wgadmin.keypool import KeyPool
+from wgadmin.network import Network
+from wgadmin.subcommands.add_connection import add_connection
+from wgadmin.subcommands.add_peer import add_peer
+from wgadmin.subcommands.find import find
+from wgadmin.subcommands.generate_all_configs import generate_all_configs
+from wgadmin.subcommands.generate_config import generate_config
+from wgadmin.subcommands.list_peers import list_peers
+from wgadmin.subcommands.remove_peer import remove_peer
+
+
+def peer_args(config, name):
+    return argparse.Namespace(
+        config=config,
+        name=name,
+        ipv4="",
+        ipv6="",
+        port=51902,
+        endpoint_address="",
+        interface="wg0",
+        tags=[],
+        shard=None,
+        force=False,
+    )
+
+
+def test_daemon(tmp_path, capsys, monkeypatch):
+    config = tmp_path / "wg0.yml"
+    Network().to_file(config)
+
+    instance = server.Server(config, save_delay=60)
+    instance.load()
+    ready = threading.Event()
+    thread = threading.Thread(target=lambda: asyncio.run(instance.run(ready=ready.set)))
+    thread.start()
+    assert ready.wait(10)
+
+    try:
+        add_peer(peer_args(config, "a"))
+        add_peer(peer_args(config, "b"))
+        add_peer(peer_args(config, "c"))
+        add_connection(
+            argparse.Namespace(config=config, peer_a="a", peer_b="b", force=False)
+        )
+        remove_peer(argparse.Namespace(config=config, name="c"))
+        with pytest.raises(RuntimeError, match="already present"):
+            add_peer(peer_args(config, "a"))
+
+        # nothing has been written yet and direct writers are refused
+        assert Network.from_file(config).peers == {}
+        with pytest.raises(RuntimeError, match="served"):
+            Network.locked(config)
+
+        capsys.readouterr()
+        list_args = argparse.Namespace(
+            config=config,
+            verbose=False,
+            format=None,
+            endpoint_only=False,
+            min_degree=0,
+            name=None,
+            limit=None,
+            offset=0,
+        )
+        list_peers(list_args)
+        assert capsys.readouterr().out == "a\nb\n"
+        list_args.format = "jsonl"
+        list_args.min_degree = 1
+        list_peers(list_args)
+        assert [
+            json.loads(line)["degree"] for line in capsys.readouterr().out.splitlines()
+        ] == [1, 1]
+        generate_config(
+            argparse.Namespace(
+                config=config,
+                name="a",
+                config_format="wg-quick",
+                template=None,
+                output=None,
+            )
+        )
+        assert "[Peer]" in capsys.readouterr().out
+        find(
+            argparse.Namespace(
+                config=config, address="10.0.0.0/24", pubkey=None, endpoint=None
+            )
+        )
+        assert capsys.readouterr().out == "a\nb\n"
+
+        with daemon.connect(config) as client:
+            assert client.call("status", {})["pending_changes"] == 5
+            assert client.call("save", {}) == 5
+            with pytest.raises(RuntimeError, match="unknown method"):
+                client.call("bogus", {})
+        net = Network.from_file(config)
+        assert list(net.peers) == ["a", "b"]
+        assert net.has_connection("a", "b")
+
+        # commands that read the file have the daemon save it first
+        add_peer(peer_args(config, "d"))
+        monkeypatch.chdir(tmp_path)
+        generate_all_configs(argparse.Namespace(config=config, jobs=1, force=False))
+        assert (tmp_path / "wg0" / "d" / "wg0.conf").exists()
+    finally:
+        with daemon.connect(config) as client:
+            client.call("shutdown", {})
+        thread.join(10)
+
+    assert not daemon.socket_path(config).exists()
+    assert daemon.connect(config) is None
+
+
+def test_daemon_saves_pool_first(tmp_path, monkeypatch):
+    config = tmp_path / "wg0.yml"
+    Network().to_file(config)
+    pool = KeyPool(KeyPool.path_for(config), capacity=2)
+    pool.fill()
+    pool.save()
+
+    instance = server.Server(config, save_delay=60)
+    instance.load()
+    try:
+        params = daemon.encode_arguments(peer_args(config, "a"))
+        assert "error" not in instance.dispatch(
+            {"method": "add-peer", "params": params}
+        )
+
+        # a crash while writing the network must not return the keys to the pool
+        def crash(path):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(instance.net, "to_file", crash)
+        with pytest.raises(OSError):
+            instance.save_now({})
+    finally:
+        keypool.set_active(None)
+    assert KeyPool.load(pool.path).stats()["keypairs"] == 1
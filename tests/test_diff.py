@@ -0,0 +1,96 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import json
+
+import pytest
+
+from wgadmin.diff import diff
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+from wgadmin.subcommands.diff import diff as diff_command
+
+from .conftest import add_peer, build_network
+
+
+def create_networks():
+    old = build_network(
+        ["a", "b", "c", "d", "e"],
+        [("a", "b"), ("a", "c"), ("c", "d"), ("d", "e")],
+        ipv6=False,
+    )
+
+    new = Network.from_dict(old.to_dict())
+    new.ipv4_reserved = ["10.0.0.1"]
+    new.update_peer("b", endpoint_address="b.example.org")
+    new.remove_peer("e")
+    add_peer(new, "f", ipv6=False)
+    new.add_connection("f", "a", "psk-af")
+    new.add_connection("a", "c", "new-psk", force=True)
+
+    # renaming keeps the keys of the peer
+    d = new.peers["d"]
+    new.remove_peer("d")
+    new.add_peer(
+        Peer(
+            "dd",
+            ipv4=d.address_ipv4,
+            private_key=d.private_key,
+            public_key=d.public_key,
+        )
+    )
+    new.add_connection("c", "dd", "psk-cd")
+    return old, new
+
+
+def test_diff():
+    old, new = create_networks()
+    result = diff(old, new)
+
+    assert result.settings == {"ipv4_reserved": (None, ["10.0.0.1"])}
+    assert result.added_peers == ["f"]
+    assert result.removed_peers == ["e"]
+    assert result.renamed_peers == {"d": "dd"}
+    assert result.changed_peers == {"b": {"endpoint_address": ("", "b.example.org")}}
+    assert result.added_connections == [("a", "f")]
+    assert result.removed_connections == [("dd", "e")]
+    assert result.changed_connections == [("a", "c")]
+    # a renders the endpoint of b, dd loses its connection to e
+    assert result.affected_peers == ["a", "c", "f", "dd"]
+
+    assert not diff(old, Network.from_dict(old.to_dict()))
+
+
+def test_diff_command(tmp_path, capsys):
+    old, new = create_networks()
+    old.to_file(tmp_path / "old.yml")
+    new.to_file(tmp_path / "new.json")
+
+    args = argparse.Namespace(
+        old=tmp_path / "old.yml", new=tmp_path / "new.json", format="text"
+    )
+    args.exit_code = True
+    with pytest.raises(SystemExit):
+        diff_command(args)
+    output = capsys.readouterr().out
+    assert "~ peer d renamed to dd" in output
+    assert "configs to regenerate: a, c, f, dd" in output
+
+    args.format = "json"
+    args.exit_code = False
+    diff_command(args)
+    document = json.loads(capsys.readouterr().out)
+    assert document["removed_connections"] == [["dd", "e"]]
@@ -0,0 +1,118 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+
+from wgadmin import render, topology
+from wgadmin.network import Network
+from wgadmin.subcommands.generate_all_configs import (
+    FORMATS,
+    generate_all_configs,
+    render_all,
+    templates_hash,
+)
+
+from .conftest import add_peer, build_network
+
+
+def read_tree(path):
+    return {
+        str(child.relative_to(path)): child.read_text()
+        for child in sorted(path.rglob("*"))
+        if child.is_file()
+    }
+
+
+def create_network(path):
+    net = Network()
+    for i in range(12):
+        endpoint = "vpn{}.example.org".format(i) if i % 2 else ""
+        add_peer(net, "peer{}".format(i), endpoint_address=endpoint)
+    for peer_a, peer_b in topology.hub(net.peers["peer0"], list(net.peers.values())):
+        net.add_connection(peer_a, peer_b, "psk-" + peer_b)
+    net.to_file(path)
+
+
+def test_generate_all_configs_jobs(tmp_path, monkeypatch):
+    create_network(tmp_path / "wg0.yml")
+
+    trees = []
+    for jobs in [1, 3]:
+        monkeypatch.chdir(tmp_path)
+        args = argparse.Namespace(config=tmp_path / "wg0.yml", jobs=jobs, force=False)
+        generate_all_configs(args)
+        trees.append(read_tree(tmp_path / "wg0"))
+        (tmp_path / "wg0").rename(tmp_path / "wg0-{}".format(jobs))
+
+    assert len(trees[0]) == 25
+    assert "[Peer]" in trees[0]["peer0/wg0.conf"]
+    assert trees[0] == trees[1]
+
+
+def test_render_all_connection_order(tmp_path):
+    # connections out of canonical order, as left by consecutive add-connection
+    net = build_network(
+        ["a", "b", "m", "y", "z"],
+        [("m", "z"), ("m", "a"), ("b", "m"), ("z", "a"), ("y", "b")],
+    )
+    assert list(net.peers["m"].adjacency) == ["z", "a", "b"]
+
+    names = list(net.peers)
+    assert render_all(net, names, 1) == render_all(net, names, 2)
+
+
+def test_generate_all_configs_incremental(tmp_path, monkeypatch, capsys):
+    config = tmp_path / "wg0.yml"
+    create_network(config)
+    monkeypatch.chdir(tmp_path)
+    args = argparse.Namespace(config=config, jobs=1, force=False)
+
+    generate_all_configs(args)
+    assert "rendered 12 peers, skipped 0 unchanged" in capsys.readouterr().out
+    generate_all_configs(args)
+    assert "rendered 0 peers, skipped 12 unchanged" in capsys.readouterr().out
+
+    # the hub renders the endpoint of peer5 and loses its connection to peer3
+    net = Network.from_file(config)
+    net.update_peer("peer5", endpoint_address="new.example.org")
+    net.remove_peer("peer3")
+    net.to_file(config)
+    (tmp_path / "wg0" / "peer7" / "wg0.conf").unlink()
+
+    generate_all_configs(args)
+    assert (
+        "rendered 3 peers, skipped 8 unchanged, deleted 1 stale"
+        in capsys.readouterr().out
+    )
+    assert not (tmp_path / "wg0" / "peer3").exists()
+    assert "new.example.org" in (tmp_path / "wg0" / "peer0" / "wg0.conf").read_text()
+    assert (tmp_path / "wg0" / "peer7" / "wg0.conf").exists()
+
+    args.force = True
+    generate_all_configs(args)
+    assert "rendered 11 peers, skipped 0 unchanged" in capsys.readouterr().out
+
+
+def test_templates_hash(tmp_path, monkeypatch):
+    source = tmp_path / "render.py"
+    source.write_text("# renderers\n")
+    monkeypatch.setattr(render, "__file__", str(source))
+    (tmp_path / "templates").mkdir()
+    for template, _ in FORMATS:
+        (tmp_path / "templates" / template).write_text(template)
+
+    first = templates_hash()
+    source.write_text("# changed renderers\n")
+    assert templates_hash() != first
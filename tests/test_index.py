@@ -0,0 +1,111 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+
+import pytest
+
+from wgadmin.index import PeerIndex
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+from wgadmin.subcommands.find import find, search
+
+from .conftest import build_network
+
+
+def create_network(indexed_first: bool = False) -> Network:
+    net = Network(ipv4_range="10.0.3.0/24")
+    if indexed_first:
+        assert net.find_by_address("10.0.3.0/24") == []
+    build_network(["e", "d", "c", "b", "a"], net=net)
+    net.update_peer("a", endpoint_address="VPN.example.com")
+    net.update_peer("b", endpoint_address="vpn.example.com")
+    net.update_peer("c", endpoint_address="2001:db8::0:1")
+    return net
+
+
+def find_args(address=None, pubkey=None, endpoint=None) -> argparse.Namespace:
+    return argparse.Namespace(address=address, pubkey=pubkey, endpoint=endpoint)
+
+
+@pytest.mark.parametrize("indexed_first", [False, True])
+def test_index(indexed_first):
+    net = create_network(indexed_first)
+
+    assert [peer.name for peer in net.find_by_address("10.0.3.2")] == ["d"]
+    assert [peer.name for peer in net.find_by_address("10.0.3.0/31")] == ["e"]
+    assert [peer.name for peer in net.find_by_address("10.0.3.0/24")] == [
+        "e",
+        "d",
+        "c",
+        "b",
+        "a",
+    ]
+    assert net.find_by_address("10.0.4.0/24") == []
+    ipv6 = net.peers["b"].address_ipv6
+    assert [peer.name for peer in net.find_by_address(ipv6)] == ["b"]
+    assert [peer.name for peer in net.find_by_public_key("public-c")] == ["c"]
+    assert net.find_by_public_key("public-x") == []
+    assert [peer.name for peer in net.find_by_endpoint("vpn.example.com.")] == [
+        "a",
+        "b",
+    ]
+    assert [peer.name for peer in net.find_by_endpoint("[2001:db8::1]")] == ["c"]
+
+
+def test_index_mutations():
+    net = create_network()
+    net.index
+
+    net.remove_peer("d")
+    assert net.find_by_address("10.0.3.2") == []
+    assert net.find_by_public_key("public-d") == []
+
+    net.update_peer("a", address_ipv4="10.0.3.2", public_key="public-x")
+    assert [peer.name for peer in net.find_by_address("10.0.3.2")] == ["a"]
+    assert net.find_by_address("10.0.3.5") == []
+    assert [peer.name for peer in net.find_by_public_key("public-x")] == ["a"]
+    assert net.find_by_public_key("public-a") == []
+
+    net.update_peer("b", endpoint_address="")
+    assert [peer.name for peer in net.find_by_endpoint("vpn.example.com")] == ["a"]
+
+    # replacing a peer drops the entries of the old one
+    net.add_peer(Peer("e", ipv4="10.0.3.9", private_key="p", public_key="public-e"))
+    assert net.find_by_address("10.0.3.1") == []
+    assert [peer.name for peer in net.find_by_address("10.0.3.9")] == ["e"]
+
+    assert net.index.ipv4 == PeerIndex(net.peers.values()).ipv4
+    assert net.index.public_keys == PeerIndex(net.peers.values()).public_keys
+
+
+def test_search():
+    net = create_network()
+    assert search(net, find_args(address="10.0.3.0/29")) == ["e", "d", "c", "b", "a"]
+    assert search(
+        net, find_args(address="10.0.3.0/29", endpoint="vpn.example.com")
+    ) == ["b", "a"]
+    assert search(net, find_args(pubkey="public-a", endpoint="2001:db8::1")) == []
+    with pytest.raises(RuntimeError, match="at least one"):
+        search(net, find_args())
+
+
+def test_find(tmp_path, capsys):
+    config = tmp_path / "wg0.json"
+    create_network().to_file(config)
+    args = find_args(pubkey="public-c")
+    args.config = config
+    find(args)
+    assert capsys.readouterr().out == "c\n"
@@ -0,0 +1,67 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from wgadmin import journal
+from wgadmin.network import Network
+
+from .conftest import add_peer
+
+
+def test_journal(tmp_path):
+    path = tmp_path / "wg0.yml"
+    Network(journal=True).to_file(path)
+    snapshot = path.read_text()
+
+    net = Network.from_file(path)
+    add_peer(net, "a", ipv6=False)
+    add_peer(net, "b", ipv6=False)
+    net.add_connection("a", "b", "psk")
+    net.to_file(path)
+
+    net = Network.from_file(path)
+    add_peer(net, "c", ipv6=False)
+    net.add_connection("c", "a", "psk2")
+    net.remove_peer("b")
+    net.update_peer("a", endpoint_address="vpn.example.org")
+    net.rotate_keys("c")
+    net.to_file(path)
+    expected = net.to_dict()
+
+    assert path.read_text() == snapshot
+    assert Network.from_file(path).to_dict() == expected
+
+    # a torn record at the end of the journal is ignored and cut off on append
+    with open(journal.journal_path(path), "a") as fptr:
+        fptr.write('{"op": "remove_peer", "na')
+    net = Network.from_file(path)
+    assert net.to_dict() == expected
+    net.add_connection("a", "c", "psk3", force=True)
+    net.to_file(path)
+    expected = net.to_dict()
+    assert Network.from_file(path).to_dict() == expected
+
+    net.compact(path)
+    assert not journal.journal_path(path).exists()
+    assert Network.from_file(path).to_dict() == expected
+
+    # replaying a journal that was already compacted changes nothing
+    net = Network.from_file(path)
+    add_peer(net, "d", ipv6=False)
+    net.to_file(path)
+    records = journal.journal_path(path).read_text()
+    net = Network.from_file(path)
+    net.compact(path)
+    journal.journal_path(path).write_text(records)
+    assert Network.from_file(path).to_dict() == net.to_dict()
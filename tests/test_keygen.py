@@ -0,0 +1,71 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import base64
+import os
+import shutil
+
+import pytest
+
+from wgadmin import curve25519, keygen
+
+# test vectors from RFC 7748, section 6.1
+ALICE_PRIVATE = "77076d0a7318a57d3c16c17251b26645df4c2f87ebc0992ab177fba51db92c2a"
+ALICE_PUBLIC = "8520f0098930a754748b7ddcb43ef75a0dbf3a0d26381af4eba4a98eaa9b4e6a"
+BOB_PRIVATE = "5dab087e624a8a4b79e17f8b83800ee66f3bb1292618b6fd1c2f8b27ff88e0eb"
+BOB_PUBLIC = "de9edb7d7b7dc1b4d35b61c2ece435373f8343c85b78674dadfc7e146f882b4f"
+SHARED = "4a5d9d5ba4ce2de1728e3bf480350f25e07e21c947d19e3376f09b3c1e161742"
+
+
+def test_x25519_rfc7748():
+    alice = bytes.fromhex(ALICE_PRIVATE)
+    bob = bytes.fromhex(BOB_PRIVATE)
+    assert curve25519.x25519_base(alice).hex() == ALICE_PUBLIC
+    assert curve25519.x25519_base(bob).hex() == BOB_PUBLIC
+    assert curve25519.x25519(alice, bytes.fromhex(BOB_PUBLIC)).hex() == SHARED
+    assert curve25519.x25519(bob, bytes.fromhex(ALICE_PUBLIC)).hex() == SHARED
+
+
+def test_inprocess_keys():
+    backend = keygen.InProcessBackend()
+    private_key, public_key = backend.generate_keypair()
+    assert len(base64.b64decode(private_key)) == 32
+    assert backend.generate_public_key(private_key) == public_key
+
+    psks = backend.generate_psks(5)
+    assert len(psks) == 5
+    assert len(set(psks)) == 5
+    assert all(len(base64.b64decode(psk)) == 32 for psk in psks)
+
+    assert len(backend.generate_keypairs(3)) == 3
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        keygen.create_backend("does-not-exist")
+
+
+@pytest.mark.skipif(
+    not (shutil.which("wg") and os.path.exists("/usr/bin/wg")),
+    reason="WireGuard tools are not installed",
+)
+def test_backends_agree():
+    inprocess = keygen.InProcessBackend()
+    external = keygen.SubprocessBackend()
+
+    private_keys = [inprocess.generate_private_key(), external.generate_private_key()]
+    assert inprocess.generate_public_keys(
+        private_keys
+    ) == external.generate_public_keys(private_keys)
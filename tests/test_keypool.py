@@ -0,0 +1,69 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import socket
+import stat
+
+import pytest
+
+from wgadmin import daemon, util
+from wgadmin.keypool import KeyPool, use_pool_for
+from wgadmin.subcommands.keypool import keypool_fill
+
+
+def test_keypool(tmp_path):
+    config = tmp_path / "wg0.yml"
+    pool = KeyPool(KeyPool.path_for(config), capacity=4)
+    assert pool.fill(10) == (4, 4)
+    pool.save()
+    assert stat.S_IMODE(pool.path.stat().st_mode) == 0o600
+
+    with use_pool_for(config) as active:
+        keypairs = util.generate_keypairs(5)
+        psk = util.generate_psk()
+        assert active.stats()["hits"] == 5
+        assert active.stats()["misses"] == 1
+
+    assert len(set(keypairs)) == 5
+    assert psk in pool.psks
+
+    stats = KeyPool.load(pool.path).stats()
+    assert stats["keypairs"] == 0
+    assert stats["psks"] == 3
+    assert stats["hits"] == 5
+    assert stats["misses"] == 1
+
+
+def test_keypool_fill(tmp_path):
+    config = tmp_path / "wg0.yml"
+    path = KeyPool.path_for(config)
+    # a leftover temporary file must not pass on its permissions
+    leftover = path.with_name(path.name + ".tmp")
+    leftover.write_text("")
+    leftover.chmod(0o644)
+
+    args = argparse.Namespace(config=config, count=2, capacity=None)
+    keypool_fill(args)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert KeyPool.load(path).stats()["keypairs"] == 2
+
+    # the daemon keeps the pool in memory and would hand out keys twice
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(str(daemon.socket_path(config)))
+        sock.listen()
+        with pytest.raises(RuntimeError, match="served"):
+            keypool_fill(args)
+    assert KeyPool.load(path).stats()["keypairs"] == 2
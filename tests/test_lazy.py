@@ -0,0 +1,85 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from wgadmin import yaml_scan
+from wgadmin.lazy import LazyNetwork
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+
+from .conftest import add_peer
+
+
+def create_network() -> Network:
+    net = Network(ipv4_reserved=["10.0.0.1"])
+    for name in ["d", "a", "c", "b", "e"]:
+        add_peer(net, name, port=51900, tags=["tag-" + name])
+    net.add_connection("a", "b", "psk-ab")
+    net.add_connection("c", "a", "psk-ca")
+    net.add_connection("d", "e", "psk-de")
+    net.add_connection("a", "e", "psk-ae")
+    return net
+
+
+def neighborhood(peer: Peer):
+    return [
+        (view.peer_b.name, view.psk, Network.peer_to_dict(view.peer_b))
+        for view in peer.connections
+    ]
+
+
+@pytest.mark.parametrize("suffix", [".yml", ".json", ".wgnet", ".db"])
+def test_lazy_network(tmp_path, suffix):
+    path = tmp_path / ("wg0" + suffix)
+    create_network().to_file(path)
+    full = Network.from_file(path)
+
+    lazy = LazyNetwork(path)
+    assert lazy.peer_names() == list(full.peers)
+    for name in full.peers:
+        peer = lazy.peer(name)
+        assert Network.peer_to_dict(peer) == Network.peer_to_dict(full.peers[name])
+        assert neighborhood(peer) == neighborhood(full.peers[name])
+    assert lazy.network is None or suffix == ".wgnet"
+
+    with pytest.raises(RuntimeError):
+        lazy.peer("x")
+
+
+def test_lazy_network_journal(tmp_path):
+    path = tmp_path / "wg0.yml"
+    net = create_network()
+    net.journal = True
+    net.to_file(path)
+
+    net = Network.from_file(path)
+    net.remove_peer("b")
+    net.add_connection("c", "e", "psk-ce")
+    net.to_file(path)
+
+    lazy = LazyNetwork(path)
+    assert lazy.peer_names() == ["a", "c", "d", "e"]
+    assert [view.peer_b.name for view in lazy.peer("c").connections] == ["a", "e"]
+
+
+def test_yaml_scan(tmp_path):
+    path = tmp_path / "wg0.yml"
+    create_network().to_file(path)
+
+    document = yaml_scan.scan(path, "d")
+    assert document["connections"] == [{"peer_a": "d", "peer_b": "e", "psk": "psk-de"}]
+    assert sorted(document["peers"]) == ["d", "e"]
+    assert document["settings"]["ipv4_reserved"] == ["10.0.0.1"]
@@ -0,0 +1,191 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import csv
+import io
+import json
+
+import pytest
+
+from wgadmin import journal
+from wgadmin.lazy import LazyNetwork
+from wgadmin.network import Network
+from wgadmin.subcommands.list_peers import create_parser, list_peers
+
+from .conftest import build_network
+
+
+def create_network() -> Network:
+    net = build_network(["hub", "a1", "a2", "b1", "b2"], port=51900)
+    net.update_peer("hub", endpoint_address="vpn.example.com")
+    net.update_peer("b1", endpoint_address="192.0.2.1")
+    for name in ["a1", "a2", "b1", "b2"]:
+        net.add_connection("hub", name, "psk-" + name)
+    net.add_connection("a1", "a2", "psk-a")
+    return net
+
+
+def list_args(config, **kwargs) -> argparse.Namespace:
+    args = argparse.Namespace(
+        config=config,
+        verbose=False,
+        format=None,
+        endpoint_only=False,
+        min_degree=0,
+        name=None,
+        limit=None,
+        offset=0,
+    )
+    for key, value in kwargs.items():
+        setattr(args, key, value)
+    return args
+
+
+@pytest.mark.parametrize("suffix", [".json", ".yml", ".db", ".wgnet"])
+def test_peer_entries(tmp_path, suffix):
+    config = tmp_path / ("wg0" + suffix)
+    net = create_network()
+    net.to_file(config)
+
+    entries = list(LazyNetwork(config).iter_peer_entries())
+    # in the order of the file, YAML files are sorted
+    assert [name for name, _, _ in entries] == list(Network.from_file(config).peers)
+    assert {name: degree for name, _, degree in entries} == {
+        "hub": 4,
+        "a1": 2,
+        "a2": 2,
+        "b1": 1,
+        "b2": 1,
+    }
+    for name, entry, _ in entries:
+        assert Network.peer_from_dict(name, entry).endpoint_address == (
+            net.peers[name].endpoint_address
+        )
+
+
+def test_peer_entries_journal(tmp_path):
+    config = tmp_path / "wg0.yml"
+    net = create_network()
+    net.journal = True
+    net.to_file(config)
+    net.remove_connection("a1", "a2")
+    net.to_file(config)
+    assert journal.journal_path(config).exists()
+
+    degrees = {
+        name: degree for name, _, degree in LazyNetwork(config).iter_peer_entries()
+    }
+    assert degrees["a1"] == 1
+
+
+def test_peer_entries_yaml_fallback(tmp_path):
+    # anchors are not supported by the scanner, the peers before them have
+    # already been produced when it gives up
+    config = tmp_path / "wg0.yml"
+    create_network().to_file(config)
+    content = config.read_text()
+    content = content.replace("  b1:\n", "  b1: &b1\n", 1)
+    config.write_text(content)
+
+    names = [name for name, _, _ in LazyNetwork(config).iter_peer_entries()]
+    assert names == ["a1", "a2", "b1", "b2", "hub"]
+
+
+def test_filters(tmp_path, capsys):
+    config = tmp_path / "wg0.json"
+    create_network().to_file(config)
+
+    list_peers(list_args(config, min_degree=2))
+    assert capsys.readouterr().out == "hub\na1\na2\n"
+    list_peers(list_args(config, endpoint_only=True))
+    assert capsys.readouterr().out == "hub\nb1\n"
+    list_peers(list_args(config, name="?1"))
+    assert capsys.readouterr().out == "a1\nb1\n"
+    list_peers(list_args(config, offset=1, limit=2))
+    assert capsys.readouterr().out == "a1\na2\n"
+    list_peers(list_args(config, name="a*", offset=1))
+    assert capsys.readouterr().out == "a2\n"
+
+    parser = argparse.ArgumentParser()
+    create_parser(parser.add_subparsers())
+    for option in ["--limit", "--offset"]:
+        with pytest.raises(SystemExit):
+            parser.parse_args(["list-peers", option, "-1"])
+    assert "invalid count: -1" in capsys.readouterr().err
+
+
+def test_formats(tmp_path, capsys):
+    config = tmp_path / "wg0.db"
+    create_network().to_file(config)
+
+    list_peers(list_args(config, format="jsonl", limit=1))
+    assert json.loads(capsys.readouterr().out) == {
+        "name": "hub",
+        "interface": "wg0",
+        "ipv4": "10.0.0.1",
+        "ipv6": "fdc9:281f:4d7:9ee9::1",
+        "port": 51900,
+        "endpoint": "vpn.example.com",
+        "degree": 4,
+        "public_key": "public-hub",
+    }
+
+    list_peers(list_args(config, format="csv", endpoint_only=True))
+    rows = list(csv.DictReader(io.StringIO(capsys.readouterr().out)))
+    assert [(row["name"], row["endpoint"]) for row in rows] == [
+        ("hub", "vpn.example.com"),
+        ("b1", "192.0.2.1"),
+    ]
+
+    list_peers(list_args(config, verbose=True))
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == [
+        "name",
+        "interface",
+        "ipv4",
+        "ipv6",
+        "port",
+        "endpoint",
+        "degree",
+        "public_key",
+    ]
+    assert lines[4].split() == [
+        "b1",
+        "wg0",
+        "10.0.0.4",
+        "fdc9:281f:4d7:9ee9::4",
+        "51900",
+        "192.0.2.1",
+        "1",
+        "public-b1",
+    ]
+
+
+def test_peer_entries_yaml_unsorted(tmp_path):
+    # the peers come before the connections, which takes a second pass
+    import yaml
+
+    config = tmp_path / "wg0.yml"
+    config.write_text(yaml.safe_dump(create_network().to_dict(), sort_keys=False))
+
+    entries = list(LazyNetwork(config).iter_peer_entries())
+    assert [(name, degree) for name, _, degree in entries] == [
+        ("hub", 4),
+        ("a1", 2),
+        ("a2", 2),
+        ("b1", 1),
+        ("b2", 1),
+    ]
@@ -0,0 +1,166 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import json
+import sys
+
+from wgadmin import live
+from wgadmin.network import Network
+from wgadmin.subcommands.apply import apply
+
+from .conftest import add_peer, build_network
+
+STUB = """#!{python}
+import json, os, sys
+
+directory = os.path.dirname(os.path.abspath(__file__))
+if sys.argv[1] == "show":
+    with open(os.path.join(directory, "dump")) as fptr:
+        sys.stdout.write(fptr.read())
+    sys.exit(0)
+
+# replace key files by their content so the test can check them
+arguments = []
+for argument in sys.argv[1:]:
+    if "wgadmin-" in argument and os.path.isfile(argument):
+        with open(argument) as fptr:
+            argument = "file:" + fptr.read().strip()
+    arguments.append(argument)
+with open(os.path.join(directory, "calls"), "a") as fptr:
+    fptr.write(json.dumps(arguments) + "\\n")
+"""
+
+
+def create_network():
+    net = Network()
+    for name, endpoint in [("a", ""), ("b", "b.example.org"), ("c", "10.1.0.3")]:
+        add_peer(net, name, endpoint_address=endpoint)
+    add_peer(net, "d", ipv4="10.0.0.9", ipv6=False)
+    return build_network([], [("a", "b"), ("a", "c"), ("a", "d")], net=net)
+
+
+def dump(net):
+    b = net.peers["b"]
+    c = net.peers["c"]
+    return "\n".join(
+        [
+            "private-a\tpublic-a\t51902\toff",
+            "\t".join(
+                [
+                    "public-b",
+                    "psk-ab",
+                    "192.0.2.7:51902",
+                    "{}/32,{}/128".format(b.address_ipv4, b.address_ipv6),
+                    "0",
+                    "0",
+                    "0",
+                    "off",
+                ]
+            ),
+            "\t".join(
+                [
+                    "public-c",
+                    "old-psk",
+                    "10.1.0.3:51902",
+                    "{}/32,{}/128".format(c.address_ipv4, c.address_ipv6),
+                    "0",
+                    "0",
+                    "0",
+                    "off",
+                ]
+            ),
+            "public-e\t(none)\t(none)\t10.0.0.99/32\t0\t0\t0\toff",
+            "",
+        ]
+    )
+
+
+def test_diff():
+    net = create_network()
+    delta = live.diff(live.parse_dump(dump(net)), live.desired_state(net.peers["a"]))
+    assert delta.private_key is None
+    assert delta.listen_port is None
+    assert delta.remove == ["public-e"]
+    assert [peer.public_key for peer in delta.add] == ["public-d"]
+    assert [(peer.public_key, fields) for peer, fields in delta.update] == [
+        ("public-c", ["psk"])
+    ]
+
+    calls = live.commands("wg0", delta, lambda value: "<" + value + ">", "wg", 2)
+    assert calls == [
+        [
+            "wg",
+            "set",
+            "wg0",
+            "peer",
+            "public-e",
+            "remove",
+            "peer",
+            "public-d",
+            "preshared-key",
+            "<psk-ad>",
+            "allowed-ips",
+            "10.0.0.9/32",
+        ],
+        ["wg", "set", "wg0", "peer", "public-c", "preshared-key", "<psk-ac>"],
+    ]
+
+    # an unchanged interface needs no calls at all
+    state = live.desired_state(net.peers["a"])
+    assert not live.diff(state, state)
+
+
+def test_apply(tmp_path, capsys):
+    config = tmp_path / "wg0.yml"
+    net = create_network()
+    net.to_file(config)
+
+    stub = tmp_path / "wg"
+    stub.write_text(STUB.format(python=sys.executable))
+    stub.chmod(0o755)
+    (tmp_path / "dump").write_text(dump(net))
+
+    args = argparse.Namespace(
+        config=config, name="a", interface="", wg=str(stub), dry_run=True
+    )
+    apply(args)
+    output = capsys.readouterr().out
+    assert "preshared-key '<secret>'" in output
+    assert "1 peers added, 1 updated, 1 removed" in output
+    assert not (tmp_path / "calls").exists()
+
+    args.dry_run = False
+    apply(args)
+    calls = [json.loads(line) for line in (tmp_path / "calls").read_text().splitlines()]
+    assert calls == [
+        [
+            "set",
+            "wg0",
+            "peer",
+            "public-e",
+            "remove",
+            "peer",
+            "public-d",
+            "preshared-key",
+            "file:psk-ad",
+            "allowed-ips",
+            "10.0.0.9/32",
+            "peer",
+            "public-c",
+            "preshared-key",
+            "file:psk-ac",
+        ]
+    ]
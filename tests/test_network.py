@@ -0,0 +1,88 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+from pathlib import Path
+
+import pytest
+import yaml
+
+from wgadmin.network import Network
+
+from .conftest import build_network
+
+GOLDEN = Path(__file__).parent / "golden"
+
+
+def test_connections():
+    net = build_network(["a", "b", "c"], ipv6=False)
+    first = net.add_connection("b", "a", "psk1")
+    net.add_connection("a", "c", "psk2")
+
+    assert net.has_connection("a", "b")
+    assert net.has_connection("b", "a")
+    assert not net.has_connection("b", "c")
+    with pytest.raises(RuntimeError):
+        net.add_connection("a", "b")
+    assert net.add_connection("a", "b", "psk3", force=True) is first
+    assert first.psk == "psk3"
+
+    assert [
+        (view.peer_a.name, view.peer_b.name) for view in net.peers["a"].connections
+    ] == [
+        ("a", "b"),
+        ("a", "c"),
+    ]
+    assert [view.psk for view in net.peers["b"].connections] == ["psk3"]
+    assert len(list(net.iter_connections())) == 2
+
+    net.remove_connection("c", "a")
+    assert not net.has_connection("a", "c")
+    assert net.peers["c"].connections == []
+
+    net.remove_peer("b")
+    assert net.peers["a"].connections == []
+
+
+def test_serialization_round_trip():
+    net = build_network(["server", "laptop", "phone"], ipv6=False)
+    net.peers["server"].endpoint_address = "vpn.example.org"
+    net.peers["phone"].tags = ["mobile"]
+    net.reserve_ipv4("10.0.0.200/30")
+    net.add_connection("laptop", "server", "psk1")
+    net.add_connection("server", "phone", "psk2")
+    document = net.to_dict()
+
+    assert Network.from_yaml(net.to_yaml()).to_dict() == document
+    assert Network.from_json(net.to_json()).to_dict() == document
+    assert document["connections"] == [
+        {"peer_a": "laptop", "peer_b": "server", "psk": "psk1"},
+        {"peer_a": "phone", "peer_b": "server", "psk": "psk2"},
+    ]
+
+
+def test_serialization_baseline():
+    net = build_network(["server", "laptop", "phone"])
+    net.update_peer("server", endpoint_address="vpn.example.org", port=51820)
+    net.add_connection("laptop", "server", "psk1")
+    net.add_connection("server", "phone", "psk2")
+
+    # written by the separate json/yaml code paths that the builder replaced
+    baseline_yaml = (GOLDEN / "baseline.yml").read_text()
+    baseline_json = (GOLDEN / "baseline.json").read_text()
+    assert yaml.safe_load(net.to_yaml()) == yaml.safe_load(baseline_yaml)
+    assert json.loads(net.to_json()) == json.loads(baseline_json)
+    assert Network.from_yaml(baseline_yaml).to_dict() == net.to_dict()
+    assert Network.from_json(baseline_json).to_dict() == net.to_dict()
@@ -0,0 +1,49 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+
+import pytest
+
+from wgadmin import render
+from wgadmin.network import Network
+
+GOLDEN = Path(__file__).parent / "golden"
+
+
+@pytest.mark.parametrize(
+    "config_format,suffix", [("nm-connection", ".nmconnection"), ("wg-quick", ".conf")]
+)
+def test_native_renderer(config_format, suffix):
+    net = Network.from_file(GOLDEN / "wg0.yml")
+    native = render.get_renderer(config_format)
+    template = render.create_environment().get_template(config_format)
+
+    for name, peer in net.peers.items():
+        expected = (GOLDEN / (name + suffix)).read_text()
+        assert native.render(peer) == expected
+        assert template.render(peer=peer) == expected
+
+
+def test_template_renderer(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    path = tmp_path / "custom"
+    path.write_text("{{ peer.name }} {{ peer.endpoint_address }}")
+    net = Network.from_file(GOLDEN / "wg0.yml")
+
+    for _ in range(2):
+        renderer = render.get_template_renderer(path)
+        assert renderer.render(net.peers["odd"]) == "odd a&amp;b&lt;c&gt;.example.org"
+    assert list((tmp_path / "cache" / "wgadmin" / "jinja").iterdir())
@@ -0,0 +1,200 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from ipaddress import ip_address, ip_network
+
+import pytest
+
+from wgadmin.lazy import LazyNetwork
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+from wgadmin.subcommands import add_peer as add_peer_command
+from wgadmin.subcommands.add_peers import add_peers
+
+from .conftest import add_peer
+
+
+def create_network(tmp_path):
+    config = tmp_path / "wg0.wgshards"
+    Network(ipv4_range="10.0.0.0/16").to_file(config)
+
+    net = Network.from_file(config)
+    assert net.sharding is not None
+    net.sharding.add_shard(net, "berlin", ipv4_prefixlen=24)
+    net.sharding.add_shard(net, "paris", ipv4_range="10.0.9.0/24", file="p.json")
+    for name in ["b1", "b2"]:
+        add_peer(net, name, "berlin")
+    for name in ["p1", "p2"]:
+        add_peer(net, name, "paris")
+    net.add_connection("b1", "b2", "psk-b")
+    net.add_connection("p1", "p2", "psk-p")
+    net.add_connection("b1", "p1", "psk-bp")
+    net.to_file(config)
+    return config
+
+
+def test_layout(tmp_path):
+    config = create_network(tmp_path)
+
+    berlin = Network.from_file(tmp_path / "berlin.yml")
+    assert list(berlin.peers) == ["b1", "b2"]
+    assert berlin.ipv4_range == "10.0.0.0/24"
+    assert [c.peer_b.name for c in berlin.peers["b1"].connections] == ["b2"]
+    paris = Network.from_file(tmp_path / "p.json")
+    assert paris.ipv4_range == "10.0.9.0/24"
+    assert paris.peers["p1"].address_ipv4 == "10.0.9.1"
+
+    net = Network.from_file(config)
+    assert sorted(net.peers) == ["b1", "b2", "p1", "p2"]
+    assert net.has_connection("b1", "p1")
+    assert net.peers["b1"].adjacency["p1"].psk == "psk-bp"
+    for name, shard in [("b1", "berlin"), ("p2", "paris")]:
+        entry = net.sharding.shards[shard]
+        assert ip_address(net.peers[name].address_ipv4) in ip_network(entry.ipv4_range)
+        assert ip_address(net.peers[name].address_ipv6) in ip_network(entry.ipv6_range)
+
+    # other formats hold the whole network
+    net.to_file(tmp_path / "flat.json")
+    assert Network.from_file(tmp_path / "flat.json").to_dict() == net.to_dict()
+
+
+def test_partial(tmp_path):
+    config = create_network(tmp_path)
+    berlin = (tmp_path / "berlin.yml").read_text()
+
+    net = Network.from_file_for(config, ["p2"], ["paris"])
+    assert net.sharding.loaded == {"paris"}
+    assert sorted(net.peers) == ["p1", "p2"]
+    add_peer(net, "p3", "paris")
+    assert net.peers["p3"].address_ipv4 == "10.0.9.3"
+    net.add_connection("p3", "p1", "psk-p3")
+    net.remove_peer("p1")
+    with pytest.raises(RuntimeError, match="not loaded"):
+        add_peer(net, "b3", "berlin")
+    with pytest.raises(RuntimeError, match="belongs to shard"):
+        net.add_peer(Peer("b1", private_key="x", public_key="y"), "paris")
+    net.to_file(config)
+
+    # berlin is untouched and loses its connection to the removed peer
+    assert (tmp_path / "berlin.yml").read_text() == berlin
+    net = Network.from_file(config)
+    assert sorted(net.peers) == ["b1", "b2", "p2", "p3"]
+    assert list(net.peers["b1"].adjacency) == ["b2"]
+    assert net.sharding.connections == []
+
+    net = Network.from_file_for(config, ["b1"])
+    net.reserve_ipv4("10.0.0.100")
+    with pytest.raises(RuntimeError, match="all shards"):
+        net.to_file(config)
+
+
+def test_cross_shard_connections(tmp_path):
+    config = create_network(tmp_path)
+
+    # a connection to a peer in an unloaded shard survives a save
+    net = Network.from_file_for(config, ["b2"])
+    assert list(net.peers["b1"].adjacency) == ["b2"]
+    net.update_peer("b2", port=1234)
+    net.to_file(config)
+    assert Network.from_file(config).has_connection("b1", "p1")
+
+    net = Network.from_file_for(config, ["b2", "p2"])
+    net.add_connection("b2", "p2", "psk-bp2")
+    net.to_file(config)
+    net = Network.from_file(config)
+    assert net.has_connection("b1", "p1")
+    assert net.has_connection("b2", "p2")
+    assert net.peers["b2"].port == 1234
+
+
+def test_sub_ranges(tmp_path):
+    config = create_network(tmp_path)
+    net = Network.from_file_for(config, [])
+    with pytest.raises(RuntimeError, match="overlaps"):
+        net.sharding.add_shard(net, "rome", ipv4_range="10.0.9.128/25")
+    with pytest.raises(RuntimeError, match="not inside"):
+        net.sharding.add_shard(net, "rome", ipv4_range="10.1.0.0/24")
+    with pytest.raises(RuntimeError, match="already exists"):
+        net.sharding.add_shard(net, "paris")
+    shard = net.sharding.add_shard(net, "rome")
+    assert shard.ipv4_range == "10.0.16.0/20"
+    assert shard.ipv6_range == "fdc9:281f:4d7:9ee9:2::/80"
+    net.to_file(config)
+    assert (tmp_path / "rome.yml").exists()
+
+    with pytest.raises(RuntimeError, match="choose one of the shards"):
+        Network.from_file(config).get_next_ipv4_address()
+
+    # the default ranges leave room for more shards
+    Network().to_file(tmp_path / "small.wgshards")
+    net = Network.from_file(tmp_path / "small.wgshards")
+    assert net.sharding.add_shard(net, "a").ipv4_range == "10.0.0.0/28"
+    assert net.sharding.add_shard(net, "b").ipv4_range == "10.0.0.16/28"
+
+
+def test_explicit_addresses(tmp_path, capsys):
+    config = create_network(tmp_path)
+
+    net = Network.from_file(config)
+    args = argparse.Namespace(
+        config=config,
+        name="p3",
+        ipv4="10.0.0.1",
+        ipv6="",
+        port=51902,
+        endpoint_address="",
+        interface="wg0",
+        tags=[],
+        shard="paris",
+        force=False,
+    )
+    with pytest.raises(RuntimeError, match="outside the range 10.0.9.0/24"):
+        add_peer_command.apply(net, args)
+    args.ipv4 = "10.0.9.100"
+    add_peer_command.apply(net, args)
+    assert net.peers["p3"].address_ipv4 == "10.0.9.100"
+
+    peers = tmp_path / "peers.csv"
+    peers.write_text("\n".join(["name,ipv4", "p4,10.0.0.1", "p5,10.0.9.50"]))
+    args = argparse.Namespace(
+        config=config, input=str(peers), format=None, jobs=1, shard="paris", force=False
+    )
+    with pytest.raises(SystemExit):
+        add_peers(args)
+    captured = capsys.readouterr()
+    assert "added 1 peers, 1 errors" in captured.out
+    assert 'peer "p4": address 10.0.0.1 is outside the range' in captured.err
+    assert Network.from_file(config).peers["p5"].address_ipv4 == "10.0.9.50"
+
+
+def test_lazy(tmp_path):
+    config = create_network(tmp_path)
+    lazy = LazyNetwork(config)
+    assert sorted(lazy.peer_names()) == ["b1", "b2", "p1", "p2"]
+    assert {name: degree for name, _, degree in lazy.iter_peer_entries()} == {
+        "b1": 2,
+        "b2": 1,
+        "p1": 2,
+        "p2": 1,
+    }
+
+    peer = lazy.peer("p1")
+    assert sorted(connection.peer_b.name for connection in peer.connections) == [
+        "b1",
+        "p2",
+    ]
+    with pytest.raises(RuntimeError, match="does not exist"):
+        lazy.peer("x")
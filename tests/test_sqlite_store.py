@@ -0,0 +1,59 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+
+
+def normalized(net: Network):
+    document = net.to_dict()
+    document["connections"] = sorted(
+        (entry["peer_a"], entry["peer_b"], entry["psk"])
+        for entry in document["connections"]
+    )
+    return document
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = tmp_path / "wg0.db"
+    net = Network(ipv4_reserved=["10.0.0.1"])
+    for i, name in enumerate(["a", "b", "c"]):
+        net.add_peer(
+            Peer(
+                name,
+                ipv4="10.0.0.{}".format(i + 2),
+                private_key="k",
+                public_key="p",
+                tags=[name],
+            )
+        )
+    net.add_connection("a", "b", "psk1")
+    net.add_connection("c", "b", "psk2")
+    net.to_file(path)
+
+    loaded = Network.from_file(path)
+    assert normalized(loaded) == normalized(net)
+
+    # incremental updates of the database written above
+    loaded.add_peer(Peer("d", ipv4="10.0.0.5", private_key="k", public_key="p"))
+    loaded.add_connection("d", "a", "psk3")
+    loaded.add_connection("a", "b", "psk4", force=True)
+    loaded.remove_peer("c")
+    loaded.add_peer(Peer("b", ipv4="10.0.0.3", private_key="other", public_key="p"))
+    loaded.add_connection("b", "d", "psk5")
+    loaded.reserve_ipv4("10.0.0.100")
+    loaded.to_file(path)
+
+    assert normalized(Network.from_file(path)) == normalized(loaded)
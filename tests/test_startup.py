@@ -0,0 +1,84 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Set
+
+import pytest
+
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+
+ROOT = Path(__file__).parent.parent
+
+
+def imported_modules(arguments: List[str]) -> Set[str]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "wgadmin"] + arguments,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+        cwd=str(ROOT),
+    )
+    return {
+        line.split("|")[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        ["--help"],
+        ["list-peers", "-c", "{config}"],
+        ["generate-config", "-c", "{config}", "--wq", "a"],
+    ],
+)
+def test_startup_imports(tmp_path, arguments):
+    config = tmp_path / "wg0.json"
+    net = Network()
+    net.add_peer(Peer("a", private_key="private-a", public_key="public-a"))
+    net.add_peer(Peer("b", private_key="private-b", public_key="public-b"))
+    net.add_connection("a", "b", "psk")
+    net.to_file(config)
+
+    modules = imported_modules(
+        [argument.format(config=config) for argument in arguments]
+    )
+    assert "wgadmin.main" in modules
+    for module in [
+        "argcomplete",
+        "asyncio",
+        "concurrent.futures.process",
+        "jinja2",
+        "yaml",
+    ]:
+        assert module not in modules
+    if arguments == ["--help"]:
+        assert not any(module.startswith("wgadmin.subcommands.") for module in modules)
+
+
+def test_subcommand_registry():
+    from wgadmin import main
+
+    for name in main.SUBCOMMANDS:
+        parser = main.create_parser(name)
+        # the module registered its own parser with the same name
+        subparsers = parser._subparsers._group_actions[0]
+        assert len(subparsers.choices[name]._actions) > 1
@@ -0,0 +1,107 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from wgadmin import timing
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+from wgadmin.subcommands.connect import connect
+
+from .conftest import build_network
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_disabled():
+    assert timing.get_timings() is None
+    with timing.span("load"):
+        pass
+    assert timing.get_timings() is None
+
+
+def test_collect(tmp_path):
+    with timing.collect() as timings:
+        net = build_network(["a", "b", "c"], [("a", "b")], ipv6=False)
+        # replacing a peer removes the old one from within add_peer
+        net.add_peer(Peer("c", private_key="private-c", public_key="public-c"))
+        net.to_file(tmp_path / "wg0.json")
+        Network.from_file(tmp_path / "wg0.json")
+    assert timing.get_timings() is None
+
+    phases = timings.to_dict()["phases"]
+    assert list(phases) == ["allocate", "mutate", "save", "load"]
+    assert phases["allocate"]["calls"] == 3
+    assert phases["mutate"]["calls"] == 5
+    assert phases["save"]["calls"] == 1
+    assert phases["load"]["calls"] == 1
+    assert timings.total() >= sum(phase["seconds"] for phase in phases.values())
+
+
+def test_span_exception():
+    with timing.collect() as timings:
+        try:
+            with timing.span("render"):
+                raise ValueError()
+        except ValueError:
+            pass
+        with timing.span("render"):
+            pass
+    assert timings.phases["render"].calls == 2
+    assert not timings.active
+
+
+def test_command_line(tmp_path):
+    config = tmp_path / "wg0.json"
+    net = Network()
+    net.add_peer(Peer("a", private_key="private-a", public_key="public-a"))
+    net.to_file(config)
+
+    subprocess.run(
+        [sys.executable, "-m", "wgadmin", "--timings", "--timings-file"]
+        + [str(tmp_path / "timings.json"), "--profile", str(tmp_path / "profile")]
+        + ["add-peer", "-c", str(config), "b"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+        cwd=str(ROOT),
+    )
+    assert "b" in Network.from_file(config).peers
+
+    timings = json.loads((tmp_path / "timings.json").read_text())
+    assert {"load", "keygen", "allocate", "mutate", "save"} <= set(timings["phases"])
+    assert timings["peak_rss"]["self"] > 0
+
+    import pstats
+
+    stats = pstats.Stats(str(tmp_path / "profile"))
+    assert stats.total_calls > 0
+
+
+def test_connect(tmp_path, capsys):
+    config = tmp_path / "wg0.json"
+    build_network(["a", "b", "c"], [("a", "b")]).to_file(config)
+
+    args = argparse.Namespace(
+        config=config, mesh=True, hub=None, group_mesh=None, k_nearest=None
+    )
+    with timing.collect() as timings:
+        connect(args)
+    assert capsys.readouterr().out == "created 2 edges, skipped 1 existing\n"
+    assert {"load", "topology", "keygen", "mutate", "save"} <= set(timings.phases)
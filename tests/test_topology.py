@@ -0,0 +1,54 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from wgadmin import topology
+from wgadmin.peer import Peer
+
+
+def make_peers(count: int):
+    return [
+        Peer(
+            "p{}".format(i),
+            ipv4="10.0.0.{}".format(i + 1),
+            private_key="x",
+            public_key="y",
+            tags=["even" if i % 2 == 0 else "odd"],
+        )
+        for i in range(count)
+    ]
+
+
+def test_topologies():
+    peers = make_peers(6)
+    assert len(list(topology.mesh(peers))) == 15
+    assert sorted(topology.hub(peers[2], peers)) == [
+        ("p0", "p2"),
+        ("p1", "p2"),
+        ("p2", "p3"),
+        ("p2", "p4"),
+        ("p2", "p5"),
+    ]
+    assert sorted(topology.group_mesh(peers, "even")) == [
+        ("p0", "p2"),
+        ("p0", "p4"),
+        ("p2", "p4"),
+    ]
+    assert sorted(topology.k_nearest(peers, 1)) == [
+        ("p0", "p1"),
+        ("p1", "p2"),
+        ("p2", "p3"),
+        ("p3", "p4"),
+        ("p4", "p5"),
+    ]
@@ -0,0 +1,44 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from wgadmin import keygen, wgnet
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+
+
+def test_wgnet_round_trip(tmp_path):
+    backend = keygen.InProcessBackend()
+    net = Network(ipv6_mode="public-key", ipv4_reserved=["10.0.0.1"])
+    net.add_peer(Peer("server", ipv4="10.0.0.2", endpoint_address="vpn.example.org"))
+    net.add_peer(Peer("laptop", ipv4="10.0.0.3/24", ipv6="fd00::3", tags=["a", "b"]))
+    net.add_peer(Peer("odd", private_key="not-a-key", public_key="unknown"))
+    net.add_connection("server", "laptop", backend.generate_psk())
+    net.add_connection("server", "odd", backend.generate_psk())
+
+    path = tmp_path / "wg0.wgnet"
+    net.to_file(path)
+    assert Network.from_file(path).to_dict() == net.to_dict()
+
+    net.add_connection("laptop", "odd", "plain text psk")
+    assert wgnet.loads(wgnet.dumps(net)).to_dict() == net.to_dict()
+
+
+def test_wgnet_rejects_garbage():
+    with pytest.raises(wgnet.FormatError):
+        wgnet.loads(b"not a network")
+    with pytest.raises(wgnet.FormatError):
+        wgnet.loads(wgnet.dumps(Network())[:-1])
@@ -0,0 +1,158 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+import heapq
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
+from typing import Iterable, List, Set, Tuple, Union
+
+
+class IPv4Allocator:
+    def __init__(self, network: Union[str, IPv4Network], reserved: Iterable[str] = ()):
+        self.network = IPv4Network(network)
+        self._first = int(self.network.network_address)
+        # one byte per address keeps lookups of the next free slot in C (bytearray.find)
+        self._used = bytearray(self.network.num_addresses)
+        self._cursor = 0
+        self._reserved: List[Tuple[int, int]] = []
+
+        # mirror IPv4Network.hosts(): network and broadcast address are not usable
+        if self.network.prefixlen < 31:
+            self._reserve_slots(0, 1)
+            self._reserve_slots(len(self._used) - 1, len(self._used))
+
+        for entry in reserved:
+            self.reserve(entry)
+
+    def _index(self, address: Union[str, int, IPv4Address]) -> int:
+        index = int(IPv4Address(address)) - self._first
+        if (index < 0) or (index >= len(self._used)):
+            return -1
+        return index
+
+    def reserve(self, entry: str):
+        reservation = IPv4Network(entry, strict=False)
+        start = max(int(reservation.network_address) - self._first, 0)
+        stop = min(
+            int(reservation.broadcast_address) - self._first + 1, len(self._used)
+        )
+        if start < stop:
+            self._reserve_slots(start, stop)
+
+    def _reserve_slots(self, start: int, stop: int):
+        self._used[start:stop] = b"\x01" * (stop - start)
+        self._reserved.append((start, stop))
+
+    def _is_reserved(self, index: int) -> bool:
+        for start, stop in self._reserved:
+            if start <= index < stop:
+                return True
+        return False
+
+    def mark_used(self, address: Union[str, int, IPv4Address]):
+        index = self._index(address)
+        if index >= 0:
+            self._used[index] = 1
+
+    def release(self, address: Union[str, int, IPv4Address]):
+        index = self._index(address)
+        if (index >= 0) and not self._is_reserved(index):
+            self._used[index] = 0
+            self._cursor = min(self._cursor, index)
+
+    def is_used(self, address: Union[str, int, IPv4Address]) -> bool:
+        index = self._index(address)
+        return (index >= 0) and bool(self._used[index])
+
+    def next_free(self) -> IPv4Address:
+        index = self._used.find(0, self._cursor)
+        if index < 0:
+            raise RuntimeError("No more IPv4 addresses available")
+        # everything before the first free slot is used, skip it next time
+        self._cursor = index
+        return IPv4Address(self._first + index)
+
+    def allocate(self) -> IPv4Address:
+        address = self.next_free()
+        self._used[self._cursor] = 1
+        return address
+
+    def num_free(self) -> int:
+        return self._used.count(0)
+
+
+class IPv6Allocator:
+    def __init__(self, network: Union[str, IPv6Network], max_probes: int = 64):
+        self.network = IPv6Network(network)
+        self.max_probes = max_probes
+        self._first = int(self.network.network_address)
+        self._size = self.network.num_addresses
+        self._used: Set[int] = set()
+        self._released: List[int] = []
+        self._cursor = 0
+
+        # mirror IPv6Network.hosts(): the subnet-router anycast address is skipped
+        if self.network.prefixlen < 127:
+            self._used.add(0)
+
+    def _index(self, address: Union[str, int, IPv6Address]) -> int:
+        index = int(IPv6Address(address)) - self._first
+        if (index < 0) or (index >= self._size):
+            return -1
+        return index
+
+    def mark_used(self, address: Union[str, int, IPv6Address]):
+        index = self._index(address)
+        if index >= 0:
+            self._used.add(index)
+
+    def release(self, address: Union[str, int, IPv6Address]):
+        index = self._index(address)
+        if (index > 0) and (index in self._used):
+            self._used.discard(index)
+            if index < self._cursor:
+                heapq.heappush(self._released, index)
+
+    def is_used(self, address: Union[str, int, IPv6Address]) -> bool:
+        index = self._index(address)
+        return (index >= 0) and (index in self._used)
+
+    def next_free(self) -> IPv6Address:
+        # gaps left behind the cursor by released addresses are filled first
+        while self._released:
+            if self._released[0] not in self._used:
+                return IPv6Address(self._first + self._released[0])
+            heapq.heappop(self._released)
+
+        while self._cursor in self._used:
+            self._cursor += 1
+        if self._cursor >= self._size:
+            raise RuntimeError("No more IPv6 addresses available")
+        return IPv6Address(self._first + self._cursor)
+
+    def allocate(self) -> IPv6Address:
+        address = self.next_free()
+        self._used.add(int(address) - self._first)
+        return address
+
+    def derive(self, public_key: str) -> IPv6Address:
+        # hash the key into the host part of the range and probe on collisions
+        digest = hashlib.sha256(public_key.encode()).digest()
+        for _ in range(self.max_probes):
+            index = int.from_bytes(digest, "big") % self._size
+            if index not in self._used:
+                return IPv6Address(self._first + index)
+            digest = hashlib.sha256(digest).digest()
+        return self.next_free()
@@ -0,0 +1,308 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Validation of a whole network. All structural checks run in a single pass
+# over the peers and connections of the flat document with dict and set
+# lookups, so a broken file (e.g. a connection to a peer that does not exist)
+# is reported instead of failing to load. Deriving the public keys from the
+# private keys is the only expensive check; it is batched and can be spread
+# over several processes.
+
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from wgadmin import journal, keygen, serialization, shards
+from wgadmin.network import SQLITE_SUFFIXES, Network
+
+PEER_FIELDS = [
+    "interface",
+    "ipv4",
+    "ipv6",
+    "port",
+    "private_key",
+    "public_key",
+    "endpoint_address",
+]
+CONNECTION_FIELDS = ["peer_a", "peer_b", "psk"]
+
+
+class Problem:
+    def __init__(self, code: str, message: str, peers: Tuple[str, ...] = ()):
+        self.code = code
+        self.message = message
+        self.peers = peers
+
+    def __str__(self) -> str:
+        return "{}: {}".format(self.code, self.message)
+
+    def __repr__(self) -> str:
+        return "Problem({!r}, {!r}, {!r})".format(self.code, self.message, self.peers)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"code": self.code, "message": self.message, "peers": list(self.peers)}
+
+
+def _parse_range(
+    settings: Dict[str, Any], key: str, version: int, problems: List[Problem]
+) -> Optional[Union[IPv4Network, IPv6Network]]:
+    try:
+        network = ip_network(settings[key])
+    except KeyError:
+        problems.append(Problem("missing-field", 'settings have no "{}"'.format(key)))
+        return None
+    except ValueError:
+        network = None
+    if (network is None) or (network.version != version):
+        problems.append(
+            Problem("invalid-range", "invalid {}: {}".format(key, settings[key]))
+        )
+        return None
+    return network
+
+
+def _is_key(value: Any) -> bool:
+    try:
+        keygen.decode_key(value)
+    except (AttributeError, ValueError):
+        return False
+    return True
+
+
+def check_document(
+    document: Dict[str, Any], keys: bool = True, jobs: int = 1
+) -> List[Problem]:
+    problems: List[Problem] = []
+    for key in ["settings", "peers", "connections"]:
+        if key not in document:
+            problems.append(
+                Problem("missing-field", 'document has no "{}"'.format(key))
+            )
+    settings = document.get("settings", {})
+    peers = document.get("peers", {})
+    ranges = {
+        "ipv4": _parse_range(settings, "ipv4_range", 4, problems),
+        "ipv6": _parse_range(settings, "ipv6_range", 6, problems),
+    }
+
+    # (version, integer address) and public key -> first peer using it
+    addresses: Dict[Tuple[int, int], str] = {}
+    public_keys: Dict[str, str] = {}
+    keypairs: List[Tuple[str, str, str]] = []
+    for name, entry in peers.items():
+        missing = [field for field in PEER_FIELDS if field not in entry]
+        if missing:
+            problems.append(
+                Problem(
+                    "missing-field",
+                    'peer "{}" has no {}'.format(name, ", ".join(missing)),
+                    (name,),
+                )
+            )
+
+        try:
+            port = int(entry.get("port", 0))
+        except (TypeError, ValueError):
+            port = -1
+        if not 0 <= port <= 65535:
+            problems.append(
+                Problem(
+                    "invalid-port",
+                    'peer "{}" has invalid port {}'.format(name, entry["port"]),
+                    (name,),
+                )
+            )
+
+        for field, version in [("ipv4", 4), ("ipv6", 6)]:
+            value = entry.get(field)
+            if not value:
+                continue
+            try:
+                address = ip_address(value)
+            except ValueError:
+                address = None
+            if (address is None) or (address.version != version):
+                problems.append(
+                    Problem(
+                        "invalid-address",
+                        'peer "{}" has invalid {} address {}'.format(
+                            name, field, value
+                        ),
+                        (name,),
+                    )
+                )
+                continue
+
+            network = ranges[field]
+            if (network is not None) and (address not in network):
+                problems.append(
+                    Problem(
+                        "address-out-of-range",
+                        'address {} of peer "{}" is outside of {}'.format(
+                            value, name, network
+                        ),
+                        (name,),
+                    )
+                )
+            other = addresses.setdefault((version, int(address)), name)
+            if other != name:
+                problems.append(
+                    Problem(
+                        "duplicate-address",
+                        'peers "{}" and "{}" share the address {}'.format(
+                            other, name, value
+                        ),
+                        (other, name),
+                    )
+                )
+
+        private_key = entry.get("private_key")
+        public_key = entry.get("public_key")
+        valid_keys = True
+        for field, value in [("private_key", private_key), ("public_key", public_key)]:
+            if (field in entry) and not _is_key(value):
+                valid_keys = False
+                problems.append(
+                    Problem(
+                        "invalid-key",
+                        'peer "{}" has a malformed {}'.format(name, field),
+                        (name,),
+                    )
+                )
+        if public_key:
+            other = public_keys.setdefault(public_key, name)
+            if other != name:
+                problems.append(
+                    Problem(
+                        "duplicate-public-key",
+                        'peers "{}" and "{}" share the public key {}'.format(
+                            other, name, public_key
+                        ),
+                        (other, name),
+                    )
+                )
+        if valid_keys and private_key and public_key:
+            keypairs.append((name, private_key, public_key))
+
+    edges: Set[Tuple[str, str]] = set()
+    for index, entry in enumerate(document.get("connections", [])):
+        missing = [field for field in CONNECTION_FIELDS if field not in entry]
+        if ("peer_a" in missing) or ("peer_b" in missing):
+            problems.append(
+                Problem(
+                    "missing-field",
+                    "connection {} has no {}".format(index, ", ".join(missing)),
+                )
+            )
+            continue
+
+        peer_a, peer_b = entry["peer_a"], entry["peer_b"]
+        unknown = [name for name in (peer_a, peer_b) if name not in peers]
+        if unknown:
+            problems.append(
+                Problem(
+                    "unknown-peer",
+                    'connection between "{}" and "{}" refers to unknown '
+                    'peer "{}"'.format(peer_a, peer_b, unknown[0]),
+                    (peer_a, peer_b),
+                )
+            )
+        if peer_a == peer_b:
+            problems.append(
+                Problem(
+                    "self-connection",
+                    'peer "{}" is connected to itself'.format(peer_a),
+                    (peer_a,),
+                )
+            )
+            continue
+
+        edge = (peer_a, peer_b) if peer_a < peer_b else (peer_b, peer_a)
+        if edge in edges:
+            problems.append(
+                Problem(
+                    "duplicate-connection",
+                    'peers "{}" and "{}" are connected more than once'.format(*edge),
+                    edge,
+                )
+            )
+        edges.add(edge)
+
+        if missing:
+            problems.append(
+                Problem(
+                    "missing-field",
+                    'connection between "{}" and "{}" has no psk'.format(*edge),
+                    edge,
+                )
+            )
+        elif entry["psk"] and not _is_key(entry["psk"]):
+            problems.append(
+                Problem(
+                    "invalid-key",
+                    'connection between "{}" and "{}" has a malformed psk'.format(
+                        *edge
+                    ),
+                    edge,
+                )
+            )
+
+    if keys and keypairs:
+        derived = keygen.generate_public_keys(
+            [private_key for _, private_key, _ in keypairs], jobs
+        )
+        for (name, _, public_key), expected in zip(keypairs, derived):
+            if public_key != expected:
+                problems.append(
+                    Problem(
+                        "key-mismatch",
+                        'public key of peer "{}" does not belong to its '
+                        "private key".format(name),
+                        (name,),
+                    )
+                )
+
+    return problems
+
+
+def check_network(net: Network, keys: bool = True, jobs: int = 1) -> List[Problem]:
+    return check_document(net.to_dict(), keys, jobs)
+
+
+def load_document(path: Union[str, Path]) -> Dict[str, Any]:
+    # JSON and YAML files are checked as they are, the other formats (and files
+    # with a journal) can only be read by loading the network
+    path = Path(path)
+    if (
+        (path.suffix not in [".wgnet", shards.SUFFIX])
+        and (path.suffix not in SQLITE_SUFFIXES)
+        and not journal.journal_path(path).exists()
+    ):
+        with open(path, "rb") as fptr:
+            content = fptr.read()
+        if path.suffix == ".json":
+            return serialization.load_json(content)
+        return serialization.load_yaml(content)
+    return Network.from_file(path).to_dict()
+
+
+def validate(net: Network, keys: bool = False):
+    # for Network.pre_save_hooks, refuses to save an invalid network
+    problems = check_network(net, keys)
+    if problems:
+        raise RuntimeError(
+            "refusing to save an invalid network:\n"
+            + "\n".join(str(problem) for problem in problems)
+        )
@@ -22,6 +22,9 @@ if TYPE_CHECKING:
 
 
 class Connection:
+    # one record per undirected edge, shared by the adjacency of both peers
+    __slots__ = ("peer_a", "peer_b", "psk")
+
     def __init__(self, peer_a: "Peer", peer_b: "Peer", psk: str = ""):
         self.peer_a = peer_a
         self.peer_b = peer_b
@@ -30,3 +33,28 @@ class Connection:
             self.psk = psk
         else:
             self.psk = util.generate_psk()
+
+    def other(self, peer: "Peer") -> "Peer":
+        if peer is self.peer_a:
+            return self.peer_b
+        return self.peer_a
+
+    def view(self, peer: "Peer") -> "ConnectionView":
+        return ConnectionView(peer, self)
+
+
+class ConnectionView:
+    # the connection as seen from one of its peers: peer_b is always the other side
+    __slots__ = ("peer_a", "connection")
+
+    def __init__(self, peer_a: "Peer", connection: Connection):
+        self.peer_a = peer_a
+        self.connection = connection
+
+    @property
+    def peer_b(self) -> "Peer":
+        return self.connection.other(self.peer_a)
+
+    @property
+    def psk(self) -> str:
+        return self.connection.psk
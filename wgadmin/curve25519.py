@@ -0,0 +1,71 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# X25519 as specified in RFC 7748, section 5.
+
+P = 2**255 - 19
+A24 = 121665
+BASE_POINT = (9).to_bytes(32, "little")
+
+
+def clamp(scalar: bytes) -> bytes:
+    clamped = bytearray(scalar)
+    clamped[0] &= 248
+    clamped[31] &= 127
+    clamped[31] |= 64
+    return bytes(clamped)
+
+
+def x25519(scalar: bytes, u_coordinate: bytes) -> bytes:
+    if len(scalar) != 32 or len(u_coordinate) != 32:
+        raise ValueError("X25519 inputs must be 32 bytes long")
+
+    k = int.from_bytes(clamp(scalar), "little")
+    x_1 = int.from_bytes(u_coordinate, "little") & ((1 << 255) - 1)
+    x_2, z_2 = 1, 0
+    x_3, z_3 = x_1, 1
+    swap = 0
+
+    for t in range(254, -1, -1):
+        k_t = (k >> t) & 1
+        swap ^= k_t
+        if swap:
+            x_2, x_3 = x_3, x_2
+            z_2, z_3 = z_3, z_2
+        swap = k_t
+
+        a = x_2 + z_2
+        aa = a * a % P
+        b = x_2 - z_2
+        bb = b * b % P
+        e = aa - bb
+        c = x_3 + z_3
+        d = x_3 - z_3
+        da = d * a % P
+        cb = c * b % P
+        x_3 = (da + cb) ** 2 % P
+        z_3 = x_1 * (da - cb) ** 2 % P
+        x_2 = aa * bb % P
+        z_2 = e * (aa + A24 * e) % P
+
+    if swap:
+        x_2, x_3 = x_3, x_2
+        z_2, z_3 = z_3, z_2
+
+    return (x_2 * pow(z_2, P - 2, P) % P).to_bytes(32, "little")
+
+
+def x25519_base(scalar: bytes) -> bytes:
+    return x25519(scalar, BASE_POINT)
@@ -0,0 +1,106 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Client side of "wgadmin serve" (see wgadmin.server): requests are JSON-RPC 2.0
+# objects, one per line, on the Unix socket <config>.sock. The CLI forwards the
+# supported subcommands when a daemon serves the network, commands that only read
+# the file have the daemon save it first and everything else refuses to touch the
+# file until the daemon is stopped.
+
+import argparse
+import json
+import socket
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+
+def socket_path(config: Union[str, Path]) -> Path:
+    config = Path(config)
+    return config.with_name(config.name + ".sock")
+
+
+def encode_arguments(args: argparse.Namespace) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    for key, value in vars(args).items():
+        if callable(value) or key == "config":
+            continue
+        if isinstance(value, Path):
+            value = str(value.resolve())
+        params[key] = value
+    return params
+
+
+class Client:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        self.next_id = 0
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def call(self, method: str, params: Union[argparse.Namespace, Dict[str, Any]]):
+        if isinstance(params, argparse.Namespace):
+            params = encode_arguments(params)
+        self.next_id += 1
+        request = {"jsonrpc": "2.0", "id": self.next_id, "method": method}
+        request["params"] = params
+        self.sock.sendall((json.dumps(request) + "\n").encode())
+
+        line = self.reader.readline()
+        if not line:
+            raise RuntimeError("the wgadmin daemon closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(response["error"]["message"])
+        return response["result"]
+
+
+def connect(config: Union[str, Path]) -> Optional[Client]:
+    path = socket_path(config)
+    if not path.exists():
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        # stale socket of a daemon that did not shut down cleanly
+        sock.close()
+        return None
+    return Client(sock)
+
+
+def sync(config: Union[str, Path]):
+    # commands that read the file directly get the pending changes written first
+    client = connect(config)
+    if client is not None:
+        with client:
+            client.call("save", {})
+
+
+def is_serving(config: Union[str, Path]) -> bool:
+    client = connect(config)
+    if client is None:
+        return False
+    client.close()
+    return True
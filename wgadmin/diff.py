@@ -0,0 +1,208 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Structural comparison of two networks. Peers are matched by name, peers that
+# only changed their name are recognized by their public key. Everything is
+# done with dict lookups, so the cost is linear in the number of peers and
+# connections of both networks. Connections are reported with the new names.
+
+from typing import Any, Dict, List, Set, Tuple
+
+from wgadmin.network import PEER_PROPERTIES, Network
+from wgadmin.peer import Peer
+from wgadmin.topology import Edge, normalize
+
+# properties that never appear in diff output
+SECRET_PROPERTIES = ["private_key"]
+
+# properties used by the configs of the peer itself and of its neighbors
+OWN_CONFIG_PROPERTIES = [
+    "interface",
+    "address_ipv4",
+    "address_ipv6",
+    "port",
+    "private_key",
+]
+NEIGHBOR_CONFIG_PROPERTIES = [
+    "address_ipv4",
+    "address_ipv6",
+    "port",
+    "public_key",
+    "endpoint_address",
+]
+
+
+class NetworkDiff:
+    def __init__(self):
+        self.settings: Dict[str, Tuple[Any, Any]] = {}
+        self.added_peers: List[str] = []
+        self.removed_peers: List[str] = []
+        self.renamed_peers: Dict[str, str] = {}
+        self.changed_peers: Dict[str, Dict[str, Tuple[Any, Any]]] = {}
+        self.added_connections: List[Edge] = []
+        self.removed_connections: List[Edge] = []
+        self.changed_connections: List[Edge] = []
+        self.affected_peers: List[str] = []
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.settings
+            or self.added_peers
+            or self.removed_peers
+            or self.renamed_peers
+            or self.changed_peers
+            or self.added_connections
+            or self.removed_connections
+            or self.changed_connections
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "settings": {
+                key: {"old": old, "new": new}
+                for key, (old, new) in self.settings.items()
+            },
+            "added_peers": self.added_peers,
+            "removed_peers": self.removed_peers,
+            "renamed_peers": self.renamed_peers,
+            "changed_peers": {
+                name: {
+                    key: (
+                        {"changed": True}
+                        if key in SECRET_PROPERTIES
+                        else {"old": old, "new": new}
+                    )
+                    for key, (old, new) in changes.items()
+                }
+                for name, changes in self.changed_peers.items()
+            },
+            "added_connections": [list(edge) for edge in self.added_connections],
+            "removed_connections": [list(edge) for edge in self.removed_connections],
+            "changed_connections": [list(edge) for edge in self.changed_connections],
+            "affected_peers": self.affected_peers,
+        }
+
+    def to_text(self) -> str:
+        lines: List[str] = []
+        for key, (old, new) in self.settings.items():
+            lines.append("~ setting {}: {!r} -> {!r}".format(key, old, new))
+        for name in self.added_peers:
+            lines.append("+ peer {}".format(name))
+        for name in self.removed_peers:
+            lines.append("- peer {}".format(name))
+        for old_name, new_name in self.renamed_peers.items():
+            lines.append("~ peer {} renamed to {}".format(old_name, new_name))
+        for name, changes in self.changed_peers.items():
+            for key, (old, new) in changes.items():
+                if key in SECRET_PROPERTIES:
+                    lines.append("~ peer {}: {} changed".format(name, key))
+                else:
+                    lines.append(
+                        "~ peer {}: {} {!r} -> {!r}".format(name, key, old, new)
+                    )
+        for peer_a, peer_b in self.added_connections:
+            lines.append("+ connection {} <-> {}".format(peer_a, peer_b))
+        for peer_a, peer_b in self.removed_connections:
+            lines.append("- connection {} <-> {}".format(peer_a, peer_b))
+        for peer_a, peer_b in self.changed_connections:
+            lines.append("~ connection {} <-> {}: psk changed".format(peer_a, peer_b))
+        if self.affected_peers:
+            lines.append(
+                "configs to regenerate: {}".format(", ".join(self.affected_peers))
+            )
+        return "\n".join(lines)
+
+
+def _peer_changes(old: Peer, new: Peer) -> Dict[str, Tuple[Any, Any]]:
+    changes: Dict[str, Tuple[Any, Any]] = {}
+    for key in PEER_PROPERTIES:
+        old_value = getattr(old, key)
+        new_value = getattr(new, key)
+        if old_value != new_value:
+            changes[key] = (old_value, new_value)
+    return changes
+
+
+def _edges(net: Network, rename: Dict[str, str]) -> Dict[Edge, str]:
+    edges: Dict[Edge, str] = {}
+    for connection in net.iter_connections():
+        edge = normalize(
+            rename.get(connection.peer_a.name, connection.peer_a.name),
+            rename.get(connection.peer_b.name, connection.peer_b.name),
+        )
+        edges[edge] = connection.psk
+    return edges
+
+
+def diff(old: Network, new: Network) -> NetworkDiff:
+    result = NetworkDiff()
+
+    old_settings = old.settings_dict()
+    new_settings = new.settings_dict()
+    for key in dict.fromkeys(list(old_settings) + list(new_settings)):
+        if old_settings.get(key) != new_settings.get(key):
+            result.settings[key] = (old_settings.get(key), new_settings.get(key))
+
+    # peers that disappeared under one name and appeared under another one
+    added = {
+        new.peers[name].public_key: name for name in new.peers if name not in old.peers
+    }
+    for name in old.peers:
+        if name in new.peers:
+            continue
+        new_name = added.pop(old.peers[name].public_key, None)
+        if new_name is None:
+            result.removed_peers.append(name)
+        else:
+            result.renamed_peers[name] = new_name
+    added_names = set(added.values())
+    result.added_peers = [name for name in new.peers if name in added_names]
+    old_names = {new_name: name for name, new_name in result.renamed_peers.items()}
+
+    affected: Set[str] = set(result.added_peers)
+    neighbors_affected: Set[str] = set()
+    for name, peer in new.peers.items():
+        old_peer = old.peers.get(old_names.get(name, name))
+        if old_peer is None:
+            continue
+
+        changes = _peer_changes(old_peer, peer)
+        if changes:
+            result.changed_peers[name] = changes
+            if any(key in changes for key in OWN_CONFIG_PROPERTIES):
+                affected.add(name)
+            if any(key in changes for key in NEIGHBOR_CONFIG_PROPERTIES):
+                neighbors_affected.add(name)
+
+    old_edges = _edges(old, result.renamed_peers)
+    new_edges = _edges(new, {})
+    for edge, psk in new_edges.items():
+        old_psk = old_edges.get(edge)
+        if old_psk is None:
+            result.added_connections.append(edge)
+        elif old_psk != psk:
+            result.changed_connections.append(edge)
+        else:
+            continue
+        affected.update(edge)
+    for edge in old_edges:
+        if edge not in new_edges:
+            result.removed_connections.append(edge)
+            affected.update(name for name in edge if name in new.peers)
+
+    for name in neighbors_affected:
+        affected.update(new.peers[name].adjacency)
+    result.affected_peers = [name for name in new.peers if name in affected]
+    return result
@@ -0,0 +1,116 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Secondary indexes of the peers of a network. Addresses are kept as sorted
+# lists of (integer address, peer name), so a lookup of a single address or of
+# all addresses in a subnet is a binary search.
+
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from ipaddress import IPv4Address, IPv6Address, ip_address, ip_network
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from wgadmin.peer import Peer
+
+# properties of a peer that the index depends on
+INDEXED_PROPERTIES = ["address_ipv4", "address_ipv6", "public_key", "endpoint_address"]
+
+
+def normalize_endpoint(endpoint: str) -> str:
+    try:
+        return str(ip_address(endpoint.strip("[]")))
+    except ValueError:
+        return endpoint.lower().rstrip(".")
+
+
+def _add(index: Dict[str, Set[str]], key: str, name: str):
+    names = index.get(key)
+    if names is None:
+        names = index[key] = set()
+    names.add(name)
+
+
+def _discard(index: Dict[str, Set[str]], key: str, name: str):
+    names = index.get(key)
+    if names is not None:
+        names.discard(name)
+        if not names:
+            del index[key]
+
+
+class PeerIndex:
+    def __init__(self, peers: Iterable[Peer] = ()):
+        self.public_keys: Dict[str, Set[str]] = {}
+        self.endpoints: Dict[str, Set[str]] = {}
+        self.ipv4: List[Tuple[int, str]] = []
+        self.ipv6: List[Tuple[int, str]] = []
+
+        # sort once instead of inserting one by one
+        for peer in peers:
+            self._add_keys(peer)
+            if peer.address_ipv4:
+                self.ipv4.append((int(IPv4Address(peer.address_ipv4)), peer.name))
+            if peer.address_ipv6:
+                self.ipv6.append((int(IPv6Address(peer.address_ipv6)), peer.name))
+        self.ipv4.sort()
+        self.ipv6.sort()
+
+    def _add_keys(self, peer: Peer):
+        _add(self.public_keys, peer.public_key, peer.name)
+        if peer.endpoint_address:
+            _add(self.endpoints, normalize_endpoint(peer.endpoint_address), peer.name)
+
+    def add(self, peer: Peer):
+        self._add_keys(peer)
+        if peer.address_ipv4:
+            insort(self.ipv4, (int(IPv4Address(peer.address_ipv4)), peer.name))
+        if peer.address_ipv6:
+            insort(self.ipv6, (int(IPv6Address(peer.address_ipv6)), peer.name))
+
+    @staticmethod
+    def _remove_address(entries: List[Tuple[int, str]], entry: Tuple[int, str]):
+        position = bisect_left(entries, entry)
+        if (position < len(entries)) and (entries[position] == entry):
+            del entries[position]
+
+    def remove(self, peer: Peer):
+        _discard(self.public_keys, peer.public_key, peer.name)
+        if peer.endpoint_address:
+            _discard(
+                self.endpoints, normalize_endpoint(peer.endpoint_address), peer.name
+            )
+        if peer.address_ipv4:
+            self._remove_address(
+                self.ipv4, (int(IPv4Address(peer.address_ipv4)), peer.name)
+            )
+        if peer.address_ipv6:
+            self._remove_address(
+                self.ipv6, (int(IPv6Address(peer.address_ipv6)), peer.name)
+            )
+
+    def by_public_key(self, public_key: str) -> List[str]:
+        return sorted(self.public_keys.get(public_key, ()))
+
+    def by_endpoint(self, endpoint: str) -> List[str]:
+        return sorted(self.endpoints.get(normalize_endpoint(endpoint), ()))
+
+    def by_address(self, query: Union[str, IPv4Address, IPv6Address]) -> List[str]:
+        # a single address or all addresses in a subnet, e.g. 10.0.3.16/28
+        network = ip_network(query, strict=False)
+        entries = self.ipv4 if network.version == 4 else self.ipv6
+        start = bisect_left(entries, (int(network.network_address),))
+        stop = bisect_left(entries, (int(network.broadcast_address) + 1,))
+        return [name for _, name in entries[start:stop]]
@@ -0,0 +1,162 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Journaled networks append every mutation as one JSON line to <config>.journal
+# instead of rewriting the snapshot. Replaying records is idempotent, so a journal
+# that was already folded into the snapshot by an interrupted compaction is harmless.
+
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, List, Union
+
+if TYPE_CHECKING:
+    from wgadmin.network import Network
+
+
+def journal_path(path: Union[str, Path]) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".journal")
+
+
+def records(net: "Network") -> List[Dict[str, Any]]:
+    from wgadmin.network import Network
+
+    result: List[Dict[str, Any]] = []
+    for change in net.changes:
+        if change[0] == "settings":
+            result.append({"op": "settings", "settings": net.settings_dict()})
+        elif change[0] in ("add_peer", "update_peer"):
+            # the peer may have been removed again by a later change
+            if change[1] in net.peers:
+                result.append(
+                    {
+                        "op": "add_peer",
+                        "peer": Network.peer_to_dict(net.peers[change[1]]),
+                    }
+                )
+        elif change[0] == "remove_peer":
+            result.append({"op": "remove_peer", "name": change[1]})
+        elif change[0] == "add_connection":
+            peer_a = net.peers.get(change[1])
+            if (peer_a is not None) and peer_a.has_connection(change[2]):
+                result.append(
+                    {
+                        "op": "add_connection",
+                        "peer_a": change[1],
+                        "peer_b": change[2],
+                        "psk": peer_a.adjacency[change[2]].psk,
+                    }
+                )
+        elif change[0] == "remove_connection":
+            result.append(
+                {"op": "remove_connection", "peer_a": change[1], "peer_b": change[2]}
+            )
+    return result
+
+
+def _truncate_torn_record(fptr: BinaryIO):
+    size = fptr.seek(0, os.SEEK_END)
+    if size == 0:
+        return
+    fptr.seek(size - 1)
+    if fptr.read(1) == b"\n":
+        return
+
+    # drop the incomplete last line left behind by a crashed invocation
+    fptr.seek(0)
+    content = fptr.read()
+    fptr.truncate(content.rfind(b"\n") + 1)
+    fptr.seek(0, os.SEEK_END)
+
+
+def append(net: "Network", path: Union[str, Path]) -> int:
+    content = "".join(json.dumps(record) + "\n" for record in records(net))
+    if not content:
+        return 0
+
+    # the journal holds private keys just like the snapshot, use the same mode
+    journal = journal_path(path)
+    if not journal.exists():
+        mode = Path(path).stat().st_mode & 0o777
+        os.close(os.open(journal, os.O_WRONLY | os.O_CREAT, mode))
+
+    # one write and fsync for all mutations of this invocation
+    with open(journal, "a+b") as fptr:
+        _truncate_torn_record(fptr)
+        fptr.write(content.encode())
+        fptr.flush()
+        os.fsync(fptr.fileno())
+    return len(content)
+
+
+def apply(net: "Network", record: Dict[str, Any]):
+    from wgadmin.network import PEER_PROPERTIES, Network
+
+    op = record["op"]
+    if op == "settings":
+        net.apply_settings(record["settings"])
+    elif op == "add_peer":
+        peer = Network.peer_from_dict(record["peer"]["name"], record["peer"])
+        existing = net.peers.get(peer.name)
+        if existing is None:
+            net.add_peer(peer)
+        else:
+            # keep the connections of the peer, only update its properties
+            net.update_peer(
+                peer.name,
+                **{key: getattr(peer, key) for key in PEER_PROPERTIES},
+            )
+    elif op == "remove_peer":
+        if record["name"] in net.peers:
+            net.remove_peer(record["name"])
+    elif op == "add_connection":
+        net.add_connection(
+            record["peer_a"], record["peer_b"], record["psk"], force=True
+        )
+    elif op == "remove_connection":
+        if net.has_connection(record["peer_a"], record["peer_b"]):
+            net.remove_connection(record["peer_a"], record["peer_b"])
+    else:
+        raise ValueError('unknown journal operation "{}"'.format(op))
+
+
+def replay(net: "Network", path: Union[str, Path]) -> int:
+    journal = journal_path(path)
+    if not journal.exists():
+        return 0
+
+    count = 0
+    with open(journal, "r") as fptr:
+        for line in fptr:
+            if not line.endswith("\n"):
+                # torn write of a crashed invocation, it never completed
+                break
+            apply(net, json.loads(line))
+            count += 1
+    return count
+
+
+def needs_compaction(path: Union[str, Path]) -> bool:
+    journal = journal_path(path)
+    if not journal.exists():
+        return False
+    return journal.stat().st_size > max(Path(path).stat().st_size, 64 * 1024)
+
+
+def discard(path: Union[str, Path]):
+    journal = journal_path(path)
+    if journal.exists():
+        journal.unlink()
@@ -0,0 +1,204 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import base64
+import os
+from typing import List, Optional, Tuple, Union
+
+from wgadmin import curve25519, timing
+
+KEY_LENGTH = 32
+
+
+def encode_key(key: bytes) -> str:
+    return base64.standard_b64encode(key).decode()
+
+
+def decode_key(key: str) -> bytes:
+    decoded = base64.standard_b64decode(key.encode())
+    if len(decoded) != KEY_LENGTH:
+        raise ValueError("invalid key length: {}".format(len(decoded)))
+    return decoded
+
+
+class KeyBackend:
+    name = ""
+
+    def generate_private_key(self) -> str:
+        raise NotImplementedError()
+
+    def generate_public_key(self, private_key: str) -> str:
+        raise NotImplementedError()
+
+    def generate_psk(self) -> str:
+        raise NotImplementedError()
+
+    def generate_keypair(self) -> Tuple[str, str]:
+        private_key = self.generate_private_key()
+        return private_key, self.generate_public_key(private_key)
+
+    def generate_keypairs(self, count: int) -> List[Tuple[str, str]]:
+        return [self.generate_keypair() for _ in range(count)]
+
+    def generate_public_keys(self, private_keys: List[str]) -> List[str]:
+        return [self.generate_public_key(key) for key in private_keys]
+
+    def generate_psks(self, count: int) -> List[str]:
+        return [self.generate_psk() for _ in range(count)]
+
+
+class InProcessBackend(KeyBackend):
+    name = "inprocess"
+
+    def generate_private_key(self) -> str:
+        return encode_key(curve25519.clamp(os.urandom(KEY_LENGTH)))
+
+    def generate_public_key(self, private_key: str) -> str:
+        return encode_key(curve25519.x25519_base(decode_key(private_key)))
+
+    def generate_psk(self) -> str:
+        return encode_key(os.urandom(KEY_LENGTH))
+
+    def generate_psks(self, count: int) -> List[str]:
+        # draw all randomness with a single syscall
+        data = os.urandom(KEY_LENGTH * count)
+        return [
+            encode_key(data[i : i + KEY_LENGTH])
+            for i in range(0, KEY_LENGTH * count, KEY_LENGTH)
+        ]
+
+
+class SubprocessBackend(KeyBackend):
+    name = "subprocess"
+
+    def __init__(self, binary: str = "/usr/bin/wg"):
+        self.binary = binary
+
+    def run(self, command: str, stdin: Optional[str] = None) -> str:
+        import subprocess
+
+        return (
+            subprocess.check_output(
+                [self.binary, command],
+                input=stdin.encode() if stdin is not None else None,
+            )
+            .decode()
+            .strip()
+        )
+
+    def generate_private_key(self) -> str:
+        return self.run("genkey")
+
+    def generate_public_key(self, private_key: str) -> str:
+        return self.run("pubkey", private_key)
+
+    def generate_psk(self) -> str:
+        return self.run("genpsk")
+
+
+BACKENDS = {
+    InProcessBackend.name: InProcessBackend,
+    SubprocessBackend.name: SubprocessBackend,
+}
+
+_backend: Optional[KeyBackend] = None
+
+
+def create_backend(name: str) -> KeyBackend:
+    if name not in BACKENDS:
+        raise ValueError(
+            'unknown key backend "{}", choose one of: {}'.format(
+                name, ", ".join(BACKENDS)
+            )
+        )
+    return BACKENDS[name]()
+
+
+def get_backend() -> KeyBackend:
+    global _backend
+    if _backend is None:
+        _backend = create_backend(
+            os.environ.get("WGADMIN_KEY_BACKEND", InProcessBackend.name)
+        )
+    return _backend
+
+
+def set_backend(backend: Union[str, KeyBackend]) -> KeyBackend:
+    global _backend
+    if isinstance(backend, str):
+        backend = create_backend(backend)
+    _backend = backend
+    return _backend
+
+
+def _generate_keypairs_chunk(backend_name: str, count: int) -> List[Tuple[str, str]]:
+    return create_backend(backend_name).generate_keypairs(count)
+
+
+@timing.timed("keygen")
+def generate_keypairs(count: int, jobs: int = 1) -> List[Tuple[str, str]]:
+    backend = get_backend()
+    if (jobs <= 1) or (count < 2 * jobs):
+        return backend.generate_keypairs(count)
+
+    from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+    chunks = [count // jobs + (1 if i < count % jobs else 0) for i in range(jobs)]
+    executor: Executor
+    if isinstance(backend, InProcessBackend):
+        # X25519 in pure Python is CPU bound, spread it over processes
+        executor = ProcessPoolExecutor(jobs)
+        with executor:
+            results = executor.map(
+                _generate_keypairs_chunk, [backend.name] * jobs, chunks
+            )
+            return [keypair for result in results for keypair in result]
+
+    # other backends wait for subprocesses, threads are sufficient
+    executor = ThreadPoolExecutor(jobs)
+    with executor:
+        results = executor.map(backend.generate_keypairs, chunks)
+        return [keypair for result in results for keypair in result]
+
+
+def _generate_public_keys_chunk(
+    backend_name: str, private_keys: List[str]
+) -> List[str]:
+    return create_backend(backend_name).generate_public_keys(private_keys)
+
+
+@timing.timed("keygen")
+def generate_public_keys(private_keys: List[str], jobs: int = 1) -> List[str]:
+    backend = get_backend()
+    if (jobs <= 1) or (len(private_keys) < 2 * jobs):
+        return backend.generate_public_keys(private_keys)
+
+    from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+    size = -(-len(private_keys) // jobs)
+    chunks = [private_keys[i : i + size] for i in range(0, len(private_keys), size)]
+    executor: Executor
+    if isinstance(backend, InProcessBackend):
+        executor = ProcessPoolExecutor(jobs)
+        with executor:
+            results = executor.map(
+                _generate_public_keys_chunk, [backend.name] * len(chunks), chunks
+            )
+            return [key for result in results for key in result]
+
+    executor = ThreadPoolExecutor(jobs)
+    with executor:
+        results = executor.map(backend.generate_public_keys, chunks)
+        return [key for result in results for key in result]
@@ -0,0 +1,198 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+from wgadmin import keygen
+
+_active: Optional["KeyPool"] = None
+
+
+class KeyPool:
+    def __init__(self, path: Union[str, Path], capacity: int = 1024):
+        self.path = Path(path)
+        self.capacity = capacity
+        self.keypairs: Deque[Tuple[str, str]] = deque()
+        self.psks: Deque[str] = deque()
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._refill_stop = threading.Event()
+        self._refill_thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def path_for(config: Union[str, Path]) -> Path:
+        config = Path(config)
+        return config.with_name(config.name + ".keypool")
+
+    @staticmethod
+    def load(path: Union[str, Path]) -> "KeyPool":
+        pool = KeyPool(path)
+        if not pool.path.exists():
+            return pool
+
+        with open(pool.path, "r") as fptr:
+            decoded = json.load(fptr)
+        pool.capacity = decoded["capacity"]
+        pool.keypairs.extend(tuple(entry) for entry in decoded["keypairs"])
+        pool.psks.extend(decoded["psks"])
+        pool.hits = decoded["hits"]
+        pool.misses = decoded["misses"]
+        return pool
+
+    def save(self):
+        with self._lock:
+            content = json.dumps(
+                {
+                    "capacity": self.capacity,
+                    "keypairs": list(self.keypairs),
+                    "psks": list(self.psks),
+                    "hits": self.hits,
+                    "misses": self.misses,
+                }
+            )
+
+        # the pool contains private keys: never let it be readable by others,
+        # the mode only applies to a new file, so a leftover one is removed
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as fptr:
+            fptr.write(content)
+        os.replace(tmp_path, self.path)
+
+    def fill(self, count: Optional[int] = None) -> Tuple[int, int]:
+        backend = keygen.get_backend()
+        with self._lock:
+            num_keypairs = self.capacity - len(self.keypairs)
+            num_psks = self.capacity - len(self.psks)
+        if count is not None:
+            num_keypairs = min(count, num_keypairs)
+            num_psks = min(count, num_psks)
+
+        keypairs = backend.generate_keypairs(max(num_keypairs, 0))
+        psks = backend.generate_psks(max(num_psks, 0))
+        with self._lock:
+            self.keypairs.extend(keypairs)
+            self.psks.extend(psks)
+        return len(keypairs), len(psks)
+
+    def take_keypair(self) -> Tuple[str, str]:
+        with self._lock:
+            if self.keypairs:
+                self.hits += 1
+                return self.keypairs.popleft()
+            self.misses += 1
+        return keygen.get_backend().generate_keypair()
+
+    def take_psk(self) -> str:
+        with self._lock:
+            if self.psks:
+                self.hits += 1
+                return self.psks.popleft()
+            self.misses += 1
+        return keygen.get_backend().generate_psk()
+
+    def take_keypairs(self, count: int, jobs: int = 1) -> List[Tuple[str, str]]:
+        with self._lock:
+            num_hits = min(count, len(self.keypairs))
+            keypairs = [self.keypairs.popleft() for _ in range(num_hits)]
+            self.hits += num_hits
+            self.misses += count - num_hits
+        return keypairs + keygen.generate_keypairs(count - num_hits, jobs)
+
+    def take_psks(self, count: int) -> List[str]:
+        with self._lock:
+            num_hits = min(count, len(self.psks))
+            psks = [self.psks.popleft() for _ in range(num_hits)]
+            self.hits += num_hits
+            self.misses += count - num_hits
+        return psks + keygen.get_backend().generate_psks(count - num_hits)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "keypairs": len(self.keypairs),
+                "psks": len(self.psks),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def start_refill(self, low_watermark: int = 0, interval: float = 1.0):
+        if self._refill_thread is not None:
+            return
+
+        def worker():
+            while not self._refill_stop.is_set():
+                with self._lock:
+                    low = min(len(self.keypairs), len(self.psks)) <= low_watermark
+                if low:
+                    self.fill()
+                self._refill_stop.wait(interval)
+
+        self._refill_stop.clear()
+        self._refill_thread = threading.Thread(
+            target=worker, name="wgadmin-keypool", daemon=True
+        )
+        self._refill_thread.start()
+
+    def stop_refill(self):
+        if self._refill_thread is None:
+            return
+        self._refill_stop.set()
+        self._refill_thread.join()
+        self._refill_thread = None
+
+
+def get_active() -> Optional[KeyPool]:
+    return _active
+
+
+def set_active(pool: Optional[KeyPool]):
+    global _active
+    _active = pool
+
+
+@contextmanager
+def use_pool_for(config: Union[str, Path]) -> Iterator[Optional[KeyPool]]:
+    # only networks that have a pool file next to them use a key pool
+    path = KeyPool.path_for(config)
+    previous = get_active()
+    if (previous is not None) and (previous.path == path):
+        # a long-running process already owns the pool of this network
+        yield previous
+        return
+    if not path.exists():
+        yield None
+        return
+
+    pool = KeyPool.load(path)
+    set_active(pool)
+    try:
+        yield pool
+    finally:
+        set_active(previous)
+        pool.save()
@@ -0,0 +1,169 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Read-only commands rarely need the whole connection graph. LazyNetwork answers
+# "which peers exist" and "one peer with its neighbors" without constructing Peer
+# objects for the rest of the network. Formats and situations without a cheaper
+# path (wgnet snapshots, pending journal records) fall back to a full load.
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from wgadmin import journal, serialization, shards, sqlite_store, timing
+from wgadmin.network import SQLITE_SUFFIXES, Network
+from wgadmin.peer import Peer
+
+
+def _neighborhood(document: Dict[str, Any], name: str) -> Dict[str, Any]:
+    connections = [
+        entry
+        for entry in document["connections"]
+        if name in (entry["peer_a"], entry["peer_b"])
+    ]
+    names = {name}
+    for entry in connections:
+        names.add(entry["peer_a"])
+        names.add(entry["peer_b"])
+
+    return {
+        "settings": document["settings"],
+        "peers": {
+            peer_name: entry
+            for peer_name, entry in document["peers"].items()
+            if peer_name in names
+        },
+        "connections": connections,
+    }
+
+
+# (name, entry as in the document, number of connections)
+PeerEntry = Tuple[str, Dict[str, Any], int]
+
+
+def network_peer_entries(net: Network) -> Iterator[PeerEntry]:
+    for name, peer in net.peers.items():
+        yield name, Network.peer_to_dict(peer), len(peer.adjacency)
+
+
+def document_peer_entries(document: Dict[str, Any]) -> Iterator[PeerEntry]:
+    degrees: Dict[str, int] = {}
+    for entry in document["connections"]:
+        for name in (entry["peer_a"], entry["peer_b"]):
+            degrees[name] = degrees.get(name, 0) + 1
+    for name, entry in document["peers"].items():
+        yield name, entry, degrees.get(name, 0)
+
+
+class LazyNetwork:
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.network: Optional[Network] = None
+
+    def _needs_full_load(self) -> bool:
+        if self.network is not None:
+            return True
+        if self.path.suffix == ".wgnet":
+            return True
+        if self.path.suffix in SQLITE_SUFFIXES + [shards.SUFFIX]:
+            return False
+        return journal.journal_path(self.path).exists()
+
+    def load(self) -> Network:
+        if self.network is None:
+            self.network = Network.from_file(self.path)
+        return self.network
+
+    @timing.timed("load")
+    def peer_names(self) -> List[str]:
+        if self._needs_full_load():
+            return list(self.load().peers)
+
+        suffix = self.path.suffix
+        if suffix == shards.SUFFIX:
+            return shards.peer_names(self.path)
+        if suffix in SQLITE_SUFFIXES:
+            return sqlite_store.load_peer_names(self.path)
+        if suffix == ".json":
+            with open(self.path, "rb") as fptr:
+                return list(serialization.load_json(fptr.read())["peers"])
+        from wgadmin import yaml_scan
+
+        try:
+            return list(yaml_scan.scan(self.path, None)["peers"])
+        except yaml_scan.Unsupported:
+            return list(self.load().peers)
+
+    def iter_peer_entries(self) -> Iterator[PeerEntry]:
+        # peers are produced one by one in file order, only their degrees are
+        # collected up front
+        if self._needs_full_load():
+            yield from network_peer_entries(self.load())
+            return
+
+        suffix = self.path.suffix
+        if suffix == shards.SUFFIX:
+            yield from shards.iter_peer_entries(self.path)
+            return
+        if suffix in SQLITE_SUFFIXES:
+            yield from sqlite_store.iter_peer_entries(self.path)
+            return
+        if suffix == ".json":
+            with open(self.path, "rb") as fptr:
+                document = serialization.load_json(fptr.read())
+            yield from document_peer_entries(document)
+            return
+        from wgadmin import yaml_scan
+
+        num_done = 0
+        try:
+            for peer_entry in yaml_scan.iter_peer_entries(self.path):
+                yield peer_entry
+                num_done += 1
+        except yaml_scan.Unsupported:
+            # continue where the scan stopped
+            entries = network_peer_entries(self.load())
+            for _ in range(num_done):
+                next(entries)
+            yield from entries
+
+    def _neighborhood(self, name: str) -> Optional[Dict[str, Any]]:
+        suffix = self.path.suffix
+        if suffix in SQLITE_SUFFIXES:
+            return sqlite_store.load_neighborhood(self.path, name)
+        if suffix == ".json":
+            with open(self.path, "rb") as fptr:
+                return _neighborhood(serialization.load_json(fptr.read()), name)
+        from wgadmin import yaml_scan
+
+        try:
+            return _neighborhood(yaml_scan.scan(self.path, name), name)
+        except yaml_scan.Unsupported:
+            return None
+
+    @timing.timed("load")
+    def peer(self, name: str) -> Peer:
+        if (self.path.suffix == shards.SUFFIX) and (self.network is None):
+            # the shard of the peer and the shards of its neighbors
+            peers = Network.from_file_for(self.path, [name], neighbors=True).peers
+        else:
+            document = None if self._needs_full_load() else self._neighborhood(name)
+            if document is None:
+                peers = self.load().peers
+            else:
+                peers = Network.from_dict(document).peers
+
+        if name not in peers:
+            raise RuntimeError('peer "{}" does not exist'.format(name))
+        return peers[name]
@@ -0,0 +1,277 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Apply the configuration of a peer to its running interface like "wg syncconf":
+# the current state is read from "wg show <interface> dump" and only the peers
+# that differ are changed with batched "wg set" calls, so established sessions
+# of unchanged peers survive.
+
+import os
+import shlex
+import subprocess
+import tempfile
+from ipaddress import ip_address, ip_network
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from wgadmin.peer import Peer
+
+NONE = "(none)"
+PEERS_PER_CALL = 256
+
+
+class PeerState:
+    __slots__ = ("public_key", "psk", "endpoint", "allowed_ips")
+
+    def __init__(
+        self,
+        public_key: str,
+        psk: str = "",
+        endpoint: str = "",
+        allowed_ips: FrozenSet[str] = frozenset(),
+    ):
+        self.public_key = public_key
+        self.psk = psk
+        self.endpoint = endpoint
+        self.allowed_ips = allowed_ips
+
+
+class InterfaceState:
+    def __init__(
+        self,
+        private_key: str = "",
+        listen_port: int = 0,
+        peers: Optional[Dict[str, PeerState]] = None,
+    ):
+        self.private_key = private_key
+        self.listen_port = listen_port
+        self.peers: Dict[str, PeerState] = peers if peers is not None else {}
+
+
+class Delta:
+    def __init__(self):
+        self.private_key: Optional[str] = None
+        self.listen_port: Optional[int] = None
+        self.remove: List[str] = []
+        self.add: List[PeerState] = []
+        # desired state and the names of the fields that have to change
+        self.update: List[Tuple[PeerState, List[str]]] = []
+
+    def __bool__(self) -> bool:
+        return bool(
+            (self.private_key is not None)
+            or (self.listen_port is not None)
+            or self.remove
+            or self.add
+            or self.update
+        )
+
+
+def normalize_allowed_ips(addresses: Iterable[str]) -> FrozenSet[str]:
+    return frozenset(str(ip_network(address, strict=False)) for address in addresses)
+
+
+def parse_dump(output: str) -> InterfaceState:
+    lines = output.splitlines()
+    if not lines:
+        raise RuntimeError("empty output of wg show dump")
+
+    fields = lines[0].split("\t")
+    state = InterfaceState(fields[0], int(fields[2]) if fields[2] != "off" else 0)
+    for line in lines[1:]:
+        fields = line.split("\t")
+        if len(fields) < 4:
+            raise RuntimeError("cannot parse wg show dump line: {}".format(line))
+        state.peers[fields[0]] = PeerState(
+            fields[0],
+            psk="" if fields[1] == NONE else fields[1],
+            endpoint="" if fields[2] == NONE else fields[2],
+            allowed_ips=(
+                frozenset()
+                if fields[3] == NONE
+                else normalize_allowed_ips(fields[3].split(","))
+            ),
+        )
+    return state
+
+
+def format_endpoint(address: str, port: int) -> str:
+    try:
+        if ip_address(address).version == 6:
+            return "[{}]:{}".format(address, port)
+    except ValueError:
+        pass
+    return "{}:{}".format(address, port)
+
+
+def desired_state(peer: Peer) -> InterfaceState:
+    state = InterfaceState(peer.private_key, peer.port)
+    for connection in peer.connections:
+        other = connection.peer_b
+        state.peers[other.public_key] = PeerState(
+            other.public_key,
+            psk=connection.psk,
+            endpoint=(
+                format_endpoint(other.endpoint_address, other.port)
+                if other.endpoint_address
+                else ""
+            ),
+            allowed_ips=normalize_allowed_ips(
+                address
+                for address in (other.address_ipv4, other.address_ipv6)
+                if address
+            ),
+        )
+    return state
+
+
+def endpoint_differs(current: str, desired: str) -> bool:
+    if not desired:
+        # wg cannot unset an endpoint and roaming peers update it anyway
+        return False
+    if not current:
+        return True
+
+    host, _, port = desired.rpartition(":")
+    try:
+        ip_address(host.strip("[]"))
+    except ValueError:
+        # the kernel only knows the resolved address of a host name
+        return current.rpartition(":")[2] != port
+    return current != desired
+
+
+def diff(current: InterfaceState, desired: InterfaceState) -> Delta:
+    delta = Delta()
+    if current.private_key != desired.private_key:
+        delta.private_key = desired.private_key
+    if current.listen_port != desired.listen_port:
+        delta.listen_port = desired.listen_port
+
+    for public_key in current.peers:
+        if public_key not in desired.peers:
+            delta.remove.append(public_key)
+
+    for public_key, peer in desired.peers.items():
+        existing = current.peers.get(public_key)
+        if existing is None:
+            delta.add.append(peer)
+            continue
+
+        changed = []
+        if existing.psk != peer.psk:
+            changed.append("psk")
+        if endpoint_differs(existing.endpoint, peer.endpoint):
+            changed.append("endpoint")
+        if existing.allowed_ips != peer.allowed_ips:
+            changed.append("allowed_ips")
+        if changed:
+            delta.update.append((peer, changed))
+
+    return delta
+
+
+def _peer_arguments(
+    peer: PeerState, fields: List[str], secret: Callable[[str], str]
+) -> List[str]:
+    arguments = ["peer", peer.public_key]
+    if "psk" in fields:
+        arguments += ["preshared-key", secret(peer.psk) if peer.psk else "/dev/null"]
+    if ("endpoint" in fields) and peer.endpoint:
+        arguments += ["endpoint", peer.endpoint]
+    if "allowed_ips" in fields:
+        arguments += ["allowed-ips", ",".join(sorted(peer.allowed_ips))]
+    return arguments
+
+
+def commands(
+    interface: str,
+    delta: Delta,
+    secret: Callable[[str], str],
+    wg: str = "wg",
+    peers_per_call: int = PEERS_PER_CALL,
+) -> List[List[str]]:
+    head: List[str] = []
+    if delta.private_key is not None:
+        head += ["private-key", secret(delta.private_key)]
+    if delta.listen_port is not None:
+        head += ["listen-port", str(delta.listen_port)]
+
+    peers: List[List[str]] = [
+        ["peer", public_key, "remove"] for public_key in delta.remove
+    ]
+    peers += [
+        _peer_arguments(peer, ["psk", "endpoint", "allowed_ips"], secret)
+        for peer in delta.add
+    ]
+    peers += [_peer_arguments(peer, fields, secret) for peer, fields in delta.update]
+
+    result: List[List[str]] = []
+    if head and not peers:
+        result.append([wg, "set", interface] + head)
+    for i in range(0, len(peers), peers_per_call):
+        command = [wg, "set", interface] + (head if i == 0 else [])
+        for arguments in peers[i : i + peers_per_call]:
+            command += arguments
+        result.append(command)
+    return result
+
+
+def read_state(interface: str, wg: str = "wg") -> InterfaceState:
+    result = subprocess.run(
+        [wg, "show", interface, "dump"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            'cannot read interface "{}": {}'.format(interface, result.stderr.strip())
+        )
+    return parse_dump(result.stdout)
+
+
+def format_command(command: List[str]) -> str:
+    return " ".join(shlex.quote(argument) for argument in command)
+
+
+def apply(
+    peer: Peer, wg: str = "wg", dry_run: bool = False
+) -> Tuple[Delta, List[List[str]]]:
+    delta = diff(read_state(peer.interface, wg), desired_state(peer))
+    if dry_run:
+        return delta, commands(peer.interface, delta, lambda _: "<secret>", wg)
+
+    # keys are handed to wg in files that only we can read
+    with tempfile.TemporaryDirectory(prefix="wgadmin-") as directory:
+        secrets: List[str] = []
+
+        def secret(value: str) -> str:
+            path = os.path.join(directory, str(len(secrets)))
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as fptr:
+                fptr.write(value + "\n")
+            secrets.append(path)
+            return path
+
+        calls = commands(peer.interface, delta, secret, wg)
+        for command in calls:
+            result = subprocess.run(
+                command, stderr=subprocess.PIPE, universal_newlines=True
+            )
+            if result.returncode != 0:
+                raise RuntimeError(
+                    "{} failed: {}".format(command[:3], result.stderr.strip())
+                )
+    return delta, calls
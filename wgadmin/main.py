@@ -15,37 +15,148 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import argparse
+import importlib
+import os
+import shlex
+import sys
+from typing import List, Optional
 
-import argcomplete
+from wgadmin import keygen, timing
 
-from wgadmin.subcommands import (
-    add_connection,
-    add_peer,
-    generate_all_configs,
-    generate_config,
-    list_peers,
-    new_network,
-)
+# subcommand -> (module in wgadmin.subcommands, help), modules and their
+# dependencies are only imported when the subcommand is selected
+SUBCOMMANDS = {
+    "new-network": ("new_network", "create a new, empty network"),
+    "list-peers": ("list_peers", "list the peers in a network"),
+    "add-peer": ("add_peer", "add a peer to a network"),
+    "add-peers": ("add_peers", "add many peers to a network from a CSV or YAML file"),
+    "remove-peer": (
+        "remove_peer",
+        "remove a peer and all its connections from a network",
+    ),
+    "add-shard": ("add_shard", "add a shard with its own address ranges to a network"),
+    "add-connection": ("add_connection", "add a new connections between two peers"),
+    "connect": ("connect", "connect many peers at once according to a topology"),
+    "find": ("find", "find peers by address, subnet, public key or endpoint"),
+    "generate-config": ("generate_config", "generate a config file for a peer"),
+    "generate-all-configs": (
+        "generate_all_configs",
+        "generate peer configuration files",
+    ),
+    "check": ("check", "check a network for errors"),
+    "convert": (
+        "convert",
+        "convert a config file between the YAML, JSON and wgnet formats",
+    ),
+    "compact": ("compact", "fold the journal of a network back into its config file"),
+    "keypool": ("keypool", "manage the pool of pre-generated keys of a network"),
+    "apply": (
+        "apply",
+        "update the running interface of a peer without restarting it",
+    ),
+    "diff": ("diff", "show the structural differences between two networks"),
+    "serve": ("serve", "keep a network in memory and serve requests for it"),
+}
 
-parser = argparse.ArgumentParser(
-    description="Create and manage WireGuard VPNs", allow_abbrev=False,
-)
-subparsers = parser.add_subparsers(description="subcommand to run", required=True)
+# global options that consume the following word
+GLOBAL_OPTIONS_WITH_VALUE = ["--key-backend", "--timings-file", "--profile"]
 
-new_network.create_parser(subparsers)
-list_peers.create_parser(subparsers)
-add_peer.create_parser(subparsers)
-add_connection.create_parser(subparsers)
-generate_config.create_parser(subparsers)
-generate_all_configs.create_parser(subparsers)
 
+def find_subcommand(words: List[str]) -> Optional[str]:
+    skip = False
+    for word in words:
+        if skip:
+            skip = False
+        elif word in GLOBAL_OPTIONS_WITH_VALUE:
+            skip = True
+        elif not word.startswith("-"):
+            return word if word in SUBCOMMANDS else None
+    return None
 
-argcomplete.autocomplete(parser)
+
+def command_line_words() -> List[str]:
+    if "_ARGCOMPLETE" in os.environ:
+        # shell completion passes the command line through the environment
+        line = os.environ.get("COMP_LINE", "")
+        line = line[: int(os.environ.get("COMP_POINT", len(line)))]
+        try:
+            return shlex.split(line)[1:]
+        except ValueError:
+            return []
+    return sys.argv[1:]
+
+
+def create_parser(subcommand: Optional[str] = None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Create and manage WireGuard VPNs", allow_abbrev=False,
+    )
+    parser.add_argument(
+        "--key-backend",
+        choices=sorted(keygen.BACKENDS),
+        help="how to generate keys (default: inprocess, or $WGADMIN_KEY_BACKEND)",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="print the time spent in each phase and the peak memory to stderr",
+    )
+    parser.add_argument(
+        "--timings-file",
+        type=str,
+        metavar="PATH",
+        help="write the time spent in each phase and the peak memory as JSON",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        metavar="PATH",
+        help="write a cProfile dump of the whole run, e.g. for python -m pstats",
+    )
+    subparsers = parser.add_subparsers(description="subcommand to run", required=True)
+
+    for name, (module_name, help_text) in SUBCOMMANDS.items():
+        if name == subcommand:
+            module = importlib.import_module("wgadmin.subcommands." + module_name)
+            module.create_parser(subparsers)
+        else:
+            subparsers.add_parser(name, help=help_text)
+
+    return parser
 
 
 def main():
+    parser = create_parser(find_subcommand(command_line_words()))
+    if "_ARGCOMPLETE" in os.environ:
+        import argcomplete
+
+        argcomplete.autocomplete(parser)
+
     args = parser.parse_args()
-    args.func(args)
+    if args.key_backend:
+        keygen.set_backend(args.key_backend)
+
+    timings = None
+    if args.timings or args.timings_file:
+        timings = timing.enable()
+    profiler = None
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        args.func(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if timings is not None:
+            timing.disable()
+            if args.timings:
+                timings.report(sys.stderr)
+            if args.timings_file:
+                timings.to_json_file(args.timings_file)
 
 
 if __name__ == "__main__":
@@ -15,14 +15,47 @@
 
 from __future__ import annotations
 
-import json
-from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
+from ipaddress import IPv4Address, IPv6Address
 from pathlib import Path
-from typing import Dict, List, Set, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from wgadmin import journal, serialization, shards, sqlite_store, timing, util, wgnet
+from wgadmin.allocator import IPv4Allocator, IPv6Allocator
+from wgadmin.connection import Connection
+from wgadmin.index import PeerIndex
+from wgadmin.peer import Peer
 
-import yaml
+if TYPE_CHECKING:
+    from wgadmin.shards import Sharding
 
-from wgadmin.peer import Peer
+IPV6_MODES = ["sequential", "public-key"]
+SQLITE_SUFFIXES = [".sqlite", ".db"]
+PEER_PROPERTIES = [
+    "interface",
+    "address_ipv4",
+    "address_ipv6",
+    "port",
+    "private_key",
+    "public_key",
+    "endpoint_address",
+    "tags",
+]
+
+# ("settings",), ("add_peer", name), ("update_peer", name), ("remove_peer", name),
+# ("add_connection", peer_a, peer_b) or ("remove_connection", peer_a, peer_b)
+Change = Tuple[str, ...]
 
 
 class Network:
@@ -32,12 +65,167 @@ class Network:
         ipv6: bool = True,
         ipv4_range: str = "10.0.0.0/24",
         ipv6_range: str = "fdc9:281f:4d7:9ee9::/64",
+        ipv4_reserved: Optional[List[str]] = None,
+        ipv6_mode: str = "sequential",
+        journal: bool = False,
     ):
         self.peers: Dict[str, Peer] = {}
         self.ipv4: bool = ipv4
         self.ipv6: bool = ipv6
         self.ipv4_range: str = ipv4_range
         self.ipv6_range: str = ipv6_range
+        self.ipv4_reserved: List[str] = list(ipv4_reserved or [])
+        if ipv6_mode not in IPV6_MODES:
+            raise ValueError('unknown IPv6 assignment mode "{}"'.format(ipv6_mode))
+        self.ipv6_mode: str = ipv6_mode
+        self.journal: bool = journal
+
+        self._ipv4_allocator: Optional[IPv4Allocator] = None
+        self._ipv6_allocator: Optional[IPv6Allocator] = None
+        self._index: Optional[PeerIndex] = None
+
+        # shards and the shard of every peer, if loaded from a sharded layout
+        self.sharding: Optional[Sharding] = None
+
+        # mutations since the network was loaded from/saved to self.origin, used by
+        # storage backends that can persist changes incrementally
+        self.origin: Optional[Path] = None
+        self.changes: List[Change] = []
+
+        # called with the network before it is written, e.g. wgadmin.check.validate
+        self.pre_save_hooks: List[Callable[[Network], None]] = []
+
+    @property
+    def ipv4_allocator(self) -> IPv4Allocator:
+        if self._ipv4_allocator is None:
+            allocator = IPv4Allocator(self.ipv4_range, self.ipv4_reserved)
+            for peer in self.peers.values():
+                if peer.address_ipv4:
+                    allocator.mark_used(peer.address_ipv4)
+            self._ipv4_allocator = allocator
+        return self._ipv4_allocator
+
+    @property
+    def ipv6_allocator(self) -> IPv6Allocator:
+        if self._ipv6_allocator is None:
+            allocator = IPv6Allocator(self.ipv6_range)
+            for peer in self.peers.values():
+                if peer.address_ipv6:
+                    allocator.mark_used(peer.address_ipv6)
+            self._ipv6_allocator = allocator
+        return self._ipv6_allocator
+
+    @property
+    def index(self) -> PeerIndex:
+        if self._index is None:
+            self._index = PeerIndex(self.peers.values())
+        return self._index
+
+    def reset_allocators(self):
+        self._ipv4_allocator = None
+        self._ipv6_allocator = None
+        if self.sharding is not None:
+            self.sharding.reset_allocators()
+
+    @timing.timed("mutate")
+    def reserve_ipv4(self, entry: str):
+        self.ipv4_reserved.append(entry)
+        if self._ipv4_allocator is not None:
+            self._ipv4_allocator.reserve(entry)
+        if self.sharding is not None:
+            self.sharding.reset_allocators()
+        self.changes.append(("settings",))
+
+    @timing.timed("mutate")
+    def add_peer(self, peer: Peer, shard: Optional[str] = None):
+        if self.sharding is not None:
+            shard = self.sharding.shard_for(peer.name, shard)
+        if peer.name in self.peers:
+            self.remove_peer(peer.name)
+
+        self.peers[peer.name] = peer
+        if peer.address_ipv4 and (self._ipv4_allocator is not None):
+            self._ipv4_allocator.mark_used(peer.address_ipv4)
+        if peer.address_ipv6 and (self._ipv6_allocator is not None):
+            self._ipv6_allocator.mark_used(peer.address_ipv6)
+        if self._index is not None:
+            self._index.add(peer)
+        if self.sharding is not None:
+            assert shard is not None
+            self.sharding.add_peer(peer, shard)
+        self.changes.append(("add_peer", peer.name))
+
+    @timing.timed("mutate")
+    def remove_peer(self, name: str) -> Peer:
+        peer = self.peers.pop(name)
+        for other in list(peer.adjacency):
+            peer.remove_connection(other)
+
+        if peer.address_ipv4 and (self._ipv4_allocator is not None):
+            self._ipv4_allocator.release(peer.address_ipv4)
+        if peer.address_ipv6 and (self._ipv6_allocator is not None):
+            self._ipv6_allocator.release(peer.address_ipv6)
+        if self._index is not None:
+            self._index.remove(peer)
+        if self.sharding is not None:
+            self.sharding.remove_peer(peer)
+        self.changes.append(("remove_peer", name))
+        return peer
+
+    @timing.timed("mutate")
+    def update_peer(self, name: str, **properties: Any):
+        peer = self.peers[name]
+        for key in properties:
+            if key not in PEER_PROPERTIES:
+                raise ValueError('cannot update property "{}" of a peer'.format(key))
+
+        if self._index is not None:
+            self._index.remove(peer)
+        for key in properties:
+            setattr(peer, key, properties[key])
+        if self._index is not None:
+            self._index.add(peer)
+
+        if ("address_ipv4" in properties) or ("address_ipv6" in properties):
+            self.reset_allocators()
+        self.changes.append(("update_peer", name))
+
+    def rotate_keys(self, name: str):
+        private_key, public_key = util.generate_keypair()
+        self.update_peer(name, private_key=private_key, public_key=public_key)
+
+    def has_connection(self, peer_a: str, peer_b: str) -> bool:
+        return self.peers[peer_a].has_connection(peer_b)
+
+    @timing.timed("mutate")
+    def add_connection(
+        self, peer_a: str, peer_b: str, psk: str = "", force: bool = False
+    ) -> Connection:
+        connection = self.peers[peer_a].add_connection(self.peers[peer_b], psk, force)
+        self.changes.append(("add_connection", peer_a, peer_b))
+        return connection
+
+    @timing.timed("mutate")
+    def remove_connection(self, peer_a: str, peer_b: str) -> Connection:
+        connection = self.peers[peer_a].remove_connection(peer_b)
+        self.changes.append(("remove_connection", peer_a, peer_b))
+        return connection
+
+    def find_by_address(self, query: str) -> List[Peer]:
+        return [self.peers[name] for name in self.index.by_address(query)]
+
+    def find_by_public_key(self, public_key: str) -> List[Peer]:
+        return [self.peers[name] for name in self.index.by_public_key(public_key)]
+
+    def find_by_endpoint(self, endpoint: str) -> List[Peer]:
+        return [self.peers[name] for name in self.index.by_endpoint(endpoint)]
+
+    def iter_connections(self) -> Iterator[Connection]:
+        # every edge is visited once, from the peer with the smaller name
+        for peer in self.peers.values():
+            for other, connection in peer.adjacency.items():
+                if peer.name < other:
+                    yield connection
 
     def get_used_ipv4_addresses(self) -> Set[IPv4Address]:
         addresses: Set[IPv4Address] = set()
@@ -53,179 +241,216 @@ class Network:
                 addresses.add(IPv6Address(self.peers[name].address_ipv6))
         return addresses
 
-    def get_next_ipv4_address(self) -> IPv4Address:
-        addresses = self.get_used_ipv4_addresses()
-        for address in IPv4Network(self.ipv4_range).hosts():
-            if address in addresses:
-                continue
-            return address
-
-        raise RuntimeError("No more IPv4 addresses available")
-
-    def get_next_ipv6_address(self) -> IPv6Address:
-        addresses = self.get_used_ipv6_addresses()
-        for address in IPv6Network(self.ipv6_range).hosts():
-            if address in addresses:
-                continue
-            return address
-
-        raise RuntimeError("No more IPv6 addresses available")
+    @timing.timed("allocate")
+    def get_next_ipv4_address(self, shard: Optional[str] = None) -> IPv4Address:
+        if self.sharding is not None:
+            return self.sharding.ipv4_allocator(self, shard).next_free()
+        return self.ipv4_allocator.next_free()
+
+    @timing.timed("allocate")
+    def get_next_ipv6_address(
+        self, public_key: str = "", shard: Optional[str] = None
+    ) -> IPv6Address:
+        if self.sharding is not None:
+            allocator = self.sharding.ipv6_allocator(self, shard)
+        else:
+            allocator = self.ipv6_allocator
+        if public_key and (self.ipv6_mode == "public-key"):
+            return allocator.derive(public_key)
+        return allocator.next_free()
 
-    def to_json(self) -> str:
-        peer_dict: Dict[str, Dict[str, str]] = {}
-        connection_list: List[Dict[str, str]] = []
-        settings = {
+    def settings_dict(self) -> Dict[str, Any]:
+        settings: Dict[str, Any] = {
             "ipv4": self.ipv4,
             "ipv6": self.ipv6,
             "ipv4_range": self.ipv4_range,
             "ipv6_range": self.ipv6_range,
         }
+        if self.ipv4_reserved:
+            settings["ipv4_reserved"] = self.ipv4_reserved
+        if self.ipv6_mode != "sequential":
+            settings["ipv6_mode"] = self.ipv6_mode
+        if self.journal:
+            settings["journal"] = self.journal
+        return settings
+
+    def apply_settings(self, settings: Dict[str, Any]):
+        self.ipv4 = settings["ipv4"]
+        self.ipv6 = settings["ipv6"]
+        self.ipv4_range = settings["ipv4_range"]
+        self.ipv6_range = settings["ipv6_range"]
+        self.ipv4_reserved = list(settings.get("ipv4_reserved", []))
+        self.ipv6_mode = settings.get("ipv6_mode", "sequential")
+        self.journal = settings.get("journal", False)
+        self.reset_allocators()
+        self.changes.append(("settings",))
 
-        for peer_name in self.peers:
-            peer = self.peers[peer_name]
-            peer_dict[peer.name] = {
-                "name": peer.name,
-                "interface": peer.interface,
-                "ipv4": peer.address_ipv4,
-                "ipv6": peer.address_ipv6,
-                "port": str(peer.port),
-                "private_key": peer.private_key,
-                "public_key": peer.public_key,
-                "endpoint_address": peer.endpoint_address,
-            }
-            for connection in peer.connections:
-                if connection.peer_a.name > connection.peer_b.name:
-                    continue
-                connection_list.append(
-                    {
-                        "peer_a": connection.peer_a.name,
-                        "peer_b": connection.peer_b.name,
-                        "psk": connection.psk,
-                    }
-                )
+    @staticmethod
+    def peer_to_dict(peer: Peer) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {
+            "name": peer.name,
+            "interface": peer.interface,
+            "ipv4": peer.address_ipv4,
+            "ipv6": peer.address_ipv6,
+            "port": str(peer.port),
+            "private_key": peer.private_key,
+            "public_key": peer.public_key,
+            "endpoint_address": peer.endpoint_address,
+        }
+        if peer.tags:
+            entry["tags"] = peer.tags
+        return entry
 
-        return json.dumps(
-            {"settings": settings, "peers": peer_dict, "connections": connection_list}
+    @staticmethod
+    def peer_from_dict(name: str, entry: Dict[str, Any]) -> Peer:
+        return Peer(
+            name=name,
+            interface=entry["interface"],
+            ipv4=entry["ipv4"],
+            ipv6=entry["ipv6"],
+            port=int(entry["port"]),
+            private_key=entry["private_key"],
+            public_key=entry["public_key"],
+            endpoint_address=entry["endpoint_address"],
+            tags=entry.get("tags", []),
         )
 
-    def to_yaml(self) -> str:
-        peer_dict: Dict[str, Dict[str, str]] = {}
+    def to_dict(self) -> Dict[str, Any]:
+        peer_dict: Dict[str, Dict[str, Any]] = {}
         connection_list: List[Dict[str, str]] = []
-        settings = {
-            "ipv4": self.ipv4,
-            "ipv6": self.ipv6,
-            "ipv4_range": self.ipv4_range,
-            "ipv6_range": self.ipv6_range,
-        }
+        settings = self.settings_dict()
 
         for peer_name in self.peers:
             peer = self.peers[peer_name]
-            peer_dict[peer.name] = {
-                "name": peer.name,
-                "interface": peer.interface,
-                "ipv4": peer.address_ipv4,
-                "ipv6": peer.address_ipv6,
-                "port": str(peer.port),
-                "private_key": peer.private_key,
-                "public_key": peer.public_key,
-                "endpoint_address": peer.endpoint_address,
-            }
-            for connection in peer.connections:
-                if connection.peer_a.name > connection.peer_b.name:
+            peer_dict[peer.name] = Network.peer_to_dict(peer)
+            for other, connection in peer.adjacency.items():
+                if peer.name > other:
                     continue
                 connection_list.append(
-                    {
-                        "peer_a": connection.peer_a.name,
-                        "peer_b": connection.peer_b.name,
-                        "psk": connection.psk,
-                    }
+                    {"peer_a": peer.name, "peer_b": other, "psk": connection.psk}
                 )
 
-        return yaml.dump(
-            {"settings": settings, "peers": peer_dict, "connections": connection_list}
-        )
+        return {
+            "settings": settings,
+            "peers": peer_dict,
+            "connections": connection_list,
+        }
+
+    def to_json(self) -> str:
+        return serialization.dump_json(self.to_dict())
+
+    def to_yaml(self) -> str:
+        return serialization.dump_yaml(self.to_dict())
 
     def to_json_file(self, path: Union[str, Path]):
-        with open(path, "w") as fptr:
-            fptr.write(self.to_json())
+        util.write_file_atomic(path, self.to_json())
 
     def to_yaml_file(self, path: Union[str, Path]):
-        with open(path, "w") as fptr:
-            fptr.write(self.to_yaml())
+        util.write_file_atomic(path, self.to_yaml())
 
-    def to_file(self, path: Union[str, Path]):
-        if Path(path).suffix == ".json":
+    def to_wgnet_file(self, path: Union[str, Path]):
+        wgnet.dump_file(self, path)
+
+    def to_sqlite_file(self, path: Union[str, Path]):
+        sqlite_store.save(self, path)
+
+    def to_sharded_file(self, path: Union[str, Path]):
+        shards.save(self, path)
+
+    def to_snapshot_file(self, path: Union[str, Path]):
+        suffix = Path(path).suffix
+        if suffix == shards.SUFFIX:
+            self.to_sharded_file(path)
+        elif suffix == ".json":
             self.to_json_file(path)
+        elif suffix == ".wgnet":
+            self.to_wgnet_file(path)
+        elif suffix in SQLITE_SUFFIXES:
+            self.to_sqlite_file(path)
         else:
             self.to_yaml_file(path)
 
-    @staticmethod
-    def from_json(config: str) -> Network:
-        decoded = json.loads(config)
-
-        settings = decoded["settings"]
-        net = Network(
-            ipv4=settings["ipv4"],
-            ipv6=settings["ipv6"],
-            ipv4_range=settings["ipv4_range"],
-            ipv6_range=settings["ipv6_range"],
+    @timing.timed("save")
+    def to_file(self, path: Union[str, Path]):
+        for hook in self.pre_save_hooks:
+            hook(self)
+
+        path = Path(path)
+        appendable = (
+            self.journal
+            and (path.suffix not in SQLITE_SUFFIXES)
+            and (path.suffix != shards.SUFFIX)
+            and (self.origin == path.resolve())
+            and path.exists()
         )
+        if appendable and not journal.needs_compaction(path):
+            journal.append(self, path)
+        else:
+            self.to_snapshot_file(path)
+            journal.discard(path)
 
-        for peer_name in decoded["peers"]:
-            peer_entry = decoded["peers"][peer_name]
-            net.peers[peer_name] = Peer(
-                name=peer_name,
-                interface=peer_entry["interface"],
-                ipv4=peer_entry["ipv4"],
-                ipv6=peer_entry["ipv6"],
-                port=int(peer_entry["port"]),
-                private_key=peer_entry["private_key"],
-                public_key=peer_entry["public_key"],
-                endpoint_address=peer_entry["endpoint_address"],
-            )
+        self.origin = path.resolve()
+        self.changes = []
 
-        for connection_entry in decoded["connections"]:
-            net.peers[connection_entry["peer_a"]].add_connection(
-                net.peers[connection_entry["peer_b"]], connection_entry["psk"]
-            )
+    @timing.timed("save")
+    def compact(self, path: Union[str, Path]):
+        for hook in self.pre_save_hooks:
+            hook(self)
 
-        return net
+        self.to_snapshot_file(path)
+        journal.discard(path)
+        self.origin = Path(path).resolve()
+        self.changes = []
 
     @staticmethod
-    def from_yaml(config: str) -> Network:
-        decoded = yaml.safe_load(config)
+    def locked(path: Union[str, Path]):
+        from wgadmin import daemon
 
+        if daemon.is_serving(path):
+            raise RuntimeError(
+                'network "{}" is served by "wgadmin serve", '
+                "stop the daemon to modify it directly".format(path)
+            )
+        return util.file_lock(path)
+
+    @staticmethod
+    def from_dict(decoded: Dict[str, Any]) -> Network:
         settings = decoded["settings"]
         net = Network(
             ipv4=settings["ipv4"],
             ipv6=settings["ipv6"],
             ipv4_range=settings["ipv4_range"],
             ipv6_range=settings["ipv6_range"],
+            ipv4_reserved=settings.get("ipv4_reserved", []),
+            ipv6_mode=settings.get("ipv6_mode", "sequential"),
+            journal=settings.get("journal", False),
         )
 
         for peer_name in decoded["peers"]:
-            peer_entry = decoded["peers"][peer_name]
-            net.peers[peer_name] = Peer(
-                name=peer_name,
-                interface=peer_entry["interface"],
-                ipv4=peer_entry["ipv4"],
-                ipv6=peer_entry["ipv6"],
-                port=int(peer_entry["port"]),
-                private_key=peer_entry["private_key"],
-                public_key=peer_entry["public_key"],
-                endpoint_address=peer_entry["endpoint_address"],
+            net.peers[peer_name] = Network.peer_from_dict(
+                peer_name, decoded["peers"][peer_name]
             )
 
         for connection_entry in decoded["connections"]:
             net.peers[connection_entry["peer_a"]].add_connection(
-                net.peers[connection_entry["peer_b"]], connection_entry["psk"]
+                net.peers[connection_entry["peer_b"]],
+                connection_entry["psk"],
+                force=True,
             )
 
         return net
 
+    @staticmethod
+    def from_json(config: Union[str, bytes]) -> Network:
+        return Network.from_dict(serialization.load_json(config))
+
+    @staticmethod
+    def from_yaml(config: str) -> Network:
+        return Network.from_dict(serialization.load_yaml(config))
+
     @staticmethod
     def from_json_file(path: Union[Path, str]) -> Network:
-        with open(path, "r") as fptr:
+        with open(path, "rb") as fptr:
             return Network.from_json(fptr.read())
 
     @staticmethod
@@ -234,7 +459,53 @@ class Network:
             return Network.from_yaml(fptr.read())
 
     @staticmethod
+    def from_wgnet_file(path: Union[Path, str]) -> Network:
+        return wgnet.load_file(path)
+
+    @staticmethod
+    def from_sqlite_file(path: Union[Path, str]) -> Network:
+        return sqlite_store.load(path)
+
+    @staticmethod
+    def from_sharded_file(
+        path: Union[Path, str], shard_names: Optional[Iterable[str]] = None
+    ) -> Network:
+        return shards.load(path, shard_names)
+
+    @staticmethod
+    @timing.timed("load")
     def from_file(path: Union[Path, str]) -> Network:
-        if Path(path).suffix == ".json":
-            return Network.from_json_file(path)
-        return Network.from_yaml_file(path)
+        suffix = Path(path).suffix
+        if suffix == ".json":
+            net = Network.from_json_file(path)
+        elif suffix == ".wgnet":
+            net = Network.from_wgnet_file(path)
+        elif suffix in SQLITE_SUFFIXES:
+            net = Network.from_sqlite_file(path)
+        elif suffix == shards.SUFFIX:
+            net = Network.from_sharded_file(path)
+        else:
+            net = Network.from_yaml_file(path)
+
+        if suffix not in SQLITE_SUFFIXES + [shards.SUFFIX]:
+            journal.replay(net, path)
+        net.origin = Path(path).resolve()
+        net.changes = []
+        return net
+
+    @staticmethod
+    @timing.timed("load")
+    def from_file_for(
+        path: Union[Path, str],
+        peer_names: Iterable[str],
+        shard_names: Iterable[str] = (),
+        neighbors: bool = False,
+    ) -> Network:
+        # only the shards of these peers (and of their neighbors) of a sharded
+        # network, other formats are loaded completely
+        if Path(path).suffix != shards.SUFFIX:
+            return Network.from_file(path)
+
+        net = shards.load_for(path, peer_names, shard_names, neighbors)
+        net.changes = []
+        return net
@@ -15,10 +15,10 @@
 
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from wgadmin import util
-from wgadmin.connection import Connection
+from wgadmin.connection import Connection, ConnectionView
 
 
 class Peer:
@@ -32,6 +32,7 @@ class Peer:
         private_key: Optional[str] = None,
         public_key: Optional[str] = None,
         endpoint_address: str = "",
+        tags: Optional[List[str]] = None,
     ):
         self.name = name
         self.interface = interface
@@ -41,20 +42,47 @@ class Peer:
 
         if private_key:
             self.private_key = private_key
+            if public_key:
+                self.public_key = public_key
+            else:
+                self.public_key = util.generate_public_key(private_key)
         else:
-            self.private_key = util.generate_private_key()
-
-        if public_key:
-            self.public_key = public_key
-        else:
-            self.public_key = util.generate_public_key(self.private_key)
+            self.private_key, self.public_key = util.generate_keypair()
 
         self.endpoint_address = endpoint_address
+        self.tags: List[str] = list(tags or [])
+
+        self.adjacency: Dict[str, Connection] = {}
+
+    @property
+    def connections(self) -> List[ConnectionView]:
+        return [connection.view(self) for connection in self.adjacency.values()]
+
+    def has_connection(self, name: str) -> bool:
+        return name in self.adjacency
+
+    def add_connection(
+        self, peer_b: Peer, psk: str = "", force: bool = False
+    ) -> Connection:
+        if peer_b is self:
+            raise RuntimeError('cannot connect peer "{}" to itself'.format(self.name))
 
-        self.connections: List[Connection] = []
+        connection = self.adjacency.get(peer_b.name)
+        if connection is not None:
+            if not force:
+                raise RuntimeError(
+                    'peers "{}" and "{}" are already connected, '
+                    "add -f flag to overwrite".format(self.name, peer_b.name)
+                )
+            connection.psk = psk or util.generate_psk()
+            return connection
 
-    def add_connection(self, peer_b: Peer, psk: str = ""):
         connection = Connection(self, peer_b, psk)
-        self.connections.append(connection)
+        self.adjacency[peer_b.name] = connection
+        peer_b.adjacency[self.name] = connection
+        return connection
 
-        peer_b.connections.append(Connection(peer_b, self, connection.psk))
+    def remove_connection(self, name: str) -> Connection:
+        connection = self.adjacency.pop(name)
+        del connection.other(self).adjacency[self.name]
+        return connection
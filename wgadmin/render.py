@@ -0,0 +1,192 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Native renderers for the built-in formats. They produce exactly the output of
+# the templates in wgadmin/templates (autoescaping included), but build the
+# section of every peer only once and reuse it for all peers connected to it.
+# Custom templates are rendered by Jinja with a persistent bytecode cache.
+
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from wgadmin import timing
+from wgadmin.peer import Peer
+
+BUILTIN_FORMATS = ["nm-connection", "wg-quick"]
+
+
+def escape(value: Any) -> str:
+    # the same characters as Jinja's autoescape (markupsafe)
+    return (
+        str(value)
+        .replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&#34;")
+        .replace("'", "&#39;")
+    )
+
+
+def allowed_ips(peer: Peer, separator: str) -> str:
+    return separator.join(
+        escape(address) for address in (peer.address_ipv4, peer.address_ipv6) if address
+    )
+
+
+class NativeRenderer:
+    def __init__(self):
+        # peer name -> text before and after the PSK of a connection to the peer
+        self.blocks: Dict[str, Tuple[str, str]] = {}
+
+    def header(self, peer: Peer) -> str:
+        raise NotImplementedError()
+
+    def peer_block(self, peer: Peer) -> Tuple[str, str]:
+        raise NotImplementedError()
+
+    @timing.timed("render")
+    def render(self, peer: Peer) -> str:
+        parts = [self.header(peer)]
+        for connection in peer.adjacency.values():
+            other = connection.other(peer)
+            block = self.blocks.get(other.name)
+            if block is None:
+                block = self.blocks[other.name] = self.peer_block(other)
+            parts.append(block[0])
+            parts.append(escape(connection.psk))
+            parts.append(block[1])
+        return "".join(parts)
+
+
+class WgQuickRenderer(NativeRenderer):
+    def header(self, peer: Peer) -> str:
+        return (
+            "# vim: set ft=dosini:\n"
+            "[Interface]\n"
+            "Address = {}\n"
+            "ListenPort = {}\n"
+            "PrivateKey = {}".format(
+                allowed_ips(peer, ", "), escape(peer.port), escape(peer.private_key)
+            )
+        )
+
+    def peer_block(self, peer: Peer) -> Tuple[str, str]:
+        suffix = "\nAllowedIPs = " + allowed_ips(peer, ", ")
+        if peer.endpoint_address:
+            suffix += "\nEndpoint={}:{}".format(
+                escape(peer.endpoint_address), escape(peer.port)
+            )
+        return (
+            "\n[Peer]\nPublicKey = {}\nPresharedKey = ".format(escape(peer.public_key)),
+            suffix + "\n",
+        )
+
+
+class NetworkManagerRenderer(NativeRenderer):
+    def header(self, peer: Peer) -> str:
+        parts = [
+            "# vim: set ft=dosini:\n"
+            "[connection]\n"
+            "id={interface}\n"
+            "type=wireguard\n"
+            "interface-name={interface}\n"
+            "\n"
+            "[wireguard]\n"
+            "listen-port={port}\n"
+            "private-key={private_key}\n"
+            "private-key-flags=0\n"
+            "\n".format(
+                interface=escape(peer.interface),
+                port=escape(peer.port),
+                private_key=escape(peer.private_key),
+            )
+        ]
+        if peer.address_ipv4:
+            parts.append(
+                "[ipv4]\naddress1={}\nmethod=manual\n".format(escape(peer.address_ipv4))
+            )
+        if peer.address_ipv6:
+            parts.append(
+                "\n[ipv6]\naddress1={}\nmethod=manual\n".format(
+                    escape(peer.address_ipv6)
+                )
+            )
+        return "".join(parts)
+
+    def peer_block(self, peer: Peer) -> Tuple[str, str]:
+        prefix = "\n[wireguard-peer.{}]".format(escape(peer.public_key))
+        if peer.endpoint_address:
+            prefix += "\nendpoint={}:{}".format(
+                escape(peer.endpoint_address), escape(peer.port)
+            )
+        return (
+            prefix + "\npreshared-key=",
+            "\npreshared-key-flags=0\nallowed-ips={}\n".format(allowed_ips(peer, ";")),
+        )
+
+
+class TemplateRenderer:
+    def __init__(self, template: Any):
+        self.template = template
+
+    @timing.timed("render")
+    def render(self, peer: Peer) -> str:
+        return self.template.render(peer=peer)
+
+
+def bytecode_cache_directory() -> Optional[Path]:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    directory = Path(cache_home) / "wgadmin" / "jinja"
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    return directory
+
+
+def create_environment(search_path: Optional[Union[str, Path]] = None) -> Any:
+    import jinja2
+
+    loader: jinja2.BaseLoader
+    if search_path is None:
+        loader = jinja2.PackageLoader("wgadmin", "templates")
+    else:
+        loader = jinja2.FileSystemLoader(str(search_path))
+
+    directory = bytecode_cache_directory()
+    return jinja2.Environment(
+        loader=loader,
+        autoescape=True,
+        bytecode_cache=(
+            jinja2.FileSystemBytecodeCache(str(directory))
+            if directory is not None
+            else None
+        ),
+    )
+
+
+def get_renderer(config_format: str) -> Union[NativeRenderer, TemplateRenderer]:
+    if config_format == "wg-quick":
+        return WgQuickRenderer()
+    if config_format == "nm-connection":
+        return NetworkManagerRenderer()
+    raise ValueError('unknown config format "{}"'.format(config_format))
+
+
+def get_template_renderer(path: Union[str, Path]) -> TemplateRenderer:
+    path = Path(path)
+    environment = create_environment(path.parent)
+    return TemplateRenderer(environment.get_template(path.name))
@@ -0,0 +1,70 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+from functools import lru_cache
+from typing import Any, TextIO, Union
+
+# yaml and orjson are imported on first use, many invocations need neither
+
+
+@lru_cache(maxsize=None)
+def _orjson() -> Any:
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+@lru_cache(maxsize=None)
+def yaml_loader() -> Any:
+    import yaml
+
+    # use the libyaml bindings when PyYAML was built with them
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@lru_cache(maxsize=None)
+def yaml_dumper() -> Any:
+    import yaml
+
+    return getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+def dump_json(document: Any) -> str:
+    orjson = _orjson()
+    if orjson is not None:
+        return orjson.dumps(document).decode()
+    return json.dumps(document)
+
+
+def load_json(content: Union[str, bytes]) -> Any:
+    orjson = _orjson()
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dump_yaml(document: Any) -> str:
+    import yaml
+
+    return yaml.dump(document, Dumper=yaml_dumper())
+
+
+def load_yaml(content: Union[str, bytes, TextIO]) -> Any:
+    import yaml
+
+    return yaml.load(content, Loader=yaml_loader())
@@ -0,0 +1,224 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# "wgadmin serve" keeps a network in memory and answers requests from
+# wgadmin.daemon clients. Mutations are persisted in batches: the first change
+# after a save schedules the next save a short delay later.
+
+import argparse
+import asyncio
+import json
+import signal
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+from wgadmin import keypool, render
+from wgadmin.daemon import is_serving, socket_path
+from wgadmin.network import Network
+
+PARSE_ERROR = -32700
+METHOD_NOT_FOUND = -32601
+SERVER_ERROR = -32000
+
+
+class Server:
+    def __init__(self, config: Union[str, Path], save_delay: float = 1.0):
+        from wgadmin.subcommands import add_connection, add_peer, remove_peer
+
+        self.config = Path(config)
+        self.save_delay = save_delay
+        self.net: Optional[Network] = None
+        self.pool: Optional[keypool.KeyPool] = None
+        self.renderers: Dict[str, Any] = {}
+        self.save_handle: Optional[asyncio.TimerHandle] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stopped: Optional[asyncio.Event] = None
+
+        self.mutations: Dict[str, Callable[[Network, argparse.Namespace], None]] = {
+            "add-peer": add_peer.apply,
+            "remove-peer": remove_peer.apply,
+            "add-connection": add_connection.apply,
+        }
+        self.queries: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "list-peers": self.list_peers,
+            "find": self.find,
+            "generate-config": self.generate_config,
+            "status": self.status,
+            "save": self.save_now,
+            "shutdown": self.shutdown,
+        }
+
+    def load(self):
+        self.net = Network.from_file(self.config)
+        pool_path = keypool.KeyPool.path_for(self.config)
+        if pool_path.exists():
+            self.pool = keypool.KeyPool.load(pool_path)
+            keypool.set_active(self.pool)
+
+    def list_peers(self, params: Dict[str, Any]) -> Any:
+        from wgadmin.lazy import network_peer_entries
+        from wgadmin.subcommands import list_peers
+
+        assert self.net is not None
+        args = argparse.Namespace(**params)
+        if list_peers.needs_rows(args):
+            return list(list_peers.select_rows(network_peer_entries(self.net), args))
+        return list(self.net.peers)
+
+    def find(self, params: Dict[str, Any]) -> Any:
+        from wgadmin.subcommands import find
+
+        assert self.net is not None
+        return find.search(self.net, argparse.Namespace(**params))
+
+    def generate_config(self, params: Dict[str, Any]) -> str:
+        assert self.net is not None
+        peer = self.net.peers.get(params["name"])
+        if peer is None:
+            raise RuntimeError('peer "{}" does not exist'.format(params["name"]))
+
+        key = params.get("template") or params["config_format"]
+        renderer = self.renderers.get(key)
+        if renderer is None:
+            if params.get("template"):
+                renderer = render.get_template_renderer(params["template"])
+            else:
+                renderer = render.get_renderer(params["config_format"])
+            self.renderers[key] = renderer
+        return renderer.render(peer)
+
+    def status(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        assert self.net is not None
+        return {
+            "config": str(self.config),
+            "peers": len(self.net.peers),
+            "pending_changes": len(self.net.changes),
+        }
+
+    def save_now(self, params: Dict[str, Any]) -> int:
+        assert self.net is not None
+        if self.save_handle is not None:
+            self.save_handle.cancel()
+            self.save_handle = None
+
+        # keys leave the pool before they are stored in the network, a crash in
+        # between loses keys instead of handing them out twice
+        if self.pool is not None:
+            self.pool.save()
+        num_changes = len(self.net.changes)
+        if num_changes:
+            self.net.to_file(self.config)
+        return num_changes
+
+    def shutdown(self, params: Dict[str, Any]) -> bool:
+        if self.stopped is not None:
+            self.stopped.set()
+        return True
+
+    def schedule_save(self):
+        if (self.save_handle is None) and (self.loop is not None):
+            self.save_handle = self.loop.call_later(self.save_delay, self.save_now, {})
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        response: Dict[str, Any] = {"jsonrpc": "2.0", "id": request.get("id")}
+        method = request.get("method")
+        params = request.get("params") or {}
+        try:
+            if method in self.mutations:
+                self.mutations[method](
+                    self.net, argparse.Namespace(**params, config=self.config)
+                )
+                # cached [Peer] sections may be outdated now
+                self.renderers = {
+                    key: renderer
+                    for key, renderer in self.renderers.items()
+                    if isinstance(renderer, render.TemplateRenderer)
+                }
+                self.schedule_save()
+                response["result"] = None
+            elif method in self.queries:
+                response["result"] = self.queries[method](params)
+            else:
+                response["error"] = {
+                    "code": METHOD_NOT_FOUND,
+                    "message": 'unknown method "{}"'.format(method),
+                }
+        except Exception as error:
+            response["error"] = {"code": SERVER_ERROR, "message": str(error)}
+        return response
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self.dispatch(json.loads(line))
+                except ValueError as error:
+                    response = {
+                        "jsonrpc": "2.0",
+                        "id": None,
+                        "error": {"code": PARSE_ERROR, "message": str(error)},
+                    }
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        except (asyncio.CancelledError, ConnectionError):
+            # the daemon shuts down or the client went away
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, ready: Optional[Callable[[], None]] = None):
+        self.loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+
+        path = socket_path(self.config)
+        if is_serving(self.config):
+            raise RuntimeError('network "{}" is already served'.format(self.config))
+        if path.exists():
+            path.unlink()
+
+        server = await asyncio.start_unix_server(self.handle, path=str(path))
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(signum, self.stopped.set)
+            except (RuntimeError, ValueError):
+                # not the main thread
+                pass
+        if self.pool is not None:
+            self.pool.start_refill()
+
+        try:
+            if ready is not None:
+                ready()
+            await self.stopped.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            if path.exists():
+                path.unlink()
+            if self.pool is not None:
+                self.pool.stop_refill()
+            self.save_now({})
+            keypool.set_active(None)
+
+
+def serve(config: Union[str, Path], save_delay: float = 1.0):
+    # the daemon is the only writer while it runs
+    with Network.locked(config):
+        server = Server(config, save_delay)
+        server.load()
+        asyncio.run(server.run())
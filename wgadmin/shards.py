@@ -0,0 +1,458 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Sharded networks: a small JSON manifest (.wgshards) lists the shards, the
+# shard of every peer and the connections between peers of different shards.
+# Every shard is stored in a network file of its own with the peers of the
+# shard and the connections among them. Each shard owns disjoint IPv4 and IPv6
+# sub-ranges of the network, so addresses can be allocated with only the shard
+# in question loaded. Saving rewrites the manifest and the shards that changed.
+
+from __future__ import annotations
+
+import json
+import re
+from ipaddress import IPv4Network, IPv6Network, ip_interface, ip_network
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from wgadmin import serialization, util
+from wgadmin.allocator import IPv4Allocator, IPv6Allocator
+from wgadmin.peer import Peer
+
+if TYPE_CHECKING:
+    from wgadmin.network import Network
+
+SUFFIX = ".wgshards"
+MANIFEST_VERSION = 1
+SHARD_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+# automatically chosen ranges split the network into 16 IPv4 and 2^16 IPv6 ranges
+SUBNET_BITS = {4: 4, 6: 16}
+
+
+def is_sharded(path: Union[str, Path]) -> bool:
+    return Path(path).suffix == SUFFIX
+
+
+class Shard:
+    def __init__(self, name: str, file: str, ipv4_range: str, ipv6_range: str):
+        self.name = name
+        # relative to the directory of the manifest
+        self.file = file
+        self.ipv4_range = ipv4_range
+        self.ipv6_range = ipv6_range
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "file": self.file,
+            "ipv4_range": self.ipv4_range,
+            "ipv6_range": self.ipv6_range,
+        }
+
+    @staticmethod
+    def from_dict(name: str, entry: Dict[str, Any]) -> Shard:
+        return Shard(name, entry["file"], entry["ipv4_range"], entry["ipv6_range"])
+
+
+class Sharding:
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.shards: Dict[str, Shard] = {}
+        # peer name -> shard name, for all peers including unloaded shards
+        self.peers: Dict[str, str] = {}
+        # connections between shards as stored in the manifest
+        self.connections: List[Dict[str, str]] = []
+        self.loaded: Set[str] = set()
+        # shards without a file yet, and removed peers with their shard
+        self.created: Set[str] = set()
+        self.removed: Dict[str, str] = {}
+
+        self._ipv4_allocators: Dict[str, IPv4Allocator] = {}
+        self._ipv6_allocators: Dict[str, IPv6Allocator] = {}
+
+    def shard_path(self, shard: str) -> Path:
+        return self.directory / self.shards[shard].file
+
+    def shards_of(self, peer_names: Iterable[str], neighbors: bool = False) -> Set[str]:
+        names = set(peer_names)
+        if neighbors:
+            for entry in self.connections:
+                if entry["peer_a"] in names or entry["peer_b"] in names:
+                    names.update((entry["peer_a"], entry["peer_b"]))
+        return {self.peers[name] for name in names if name in self.peers}
+
+    def _get_shard(self, shard: Optional[str]) -> Shard:
+        if shard is None:
+            raise RuntimeError(
+                "the network is sharded, choose one of the shards: {}".format(
+                    ", ".join(self.shards)
+                )
+            )
+        if shard not in self.shards:
+            raise RuntimeError('shard "{}" does not exist'.format(shard))
+        if shard not in self.loaded:
+            raise RuntimeError('shard "{}" is not loaded'.format(shard))
+        return self.shards[shard]
+
+    def ipv4_allocator(self, net: Network, shard: Optional[str]) -> IPv4Allocator:
+        entry = self._get_shard(shard)
+        allocator = self._ipv4_allocators.get(entry.name)
+        if allocator is None:
+            allocator = IPv4Allocator(entry.ipv4_range, net.ipv4_reserved)
+            for name, peer in net.peers.items():
+                if peer.address_ipv4 and (self.peers.get(name) == entry.name):
+                    allocator.mark_used(peer.address_ipv4)
+            self._ipv4_allocators[entry.name] = allocator
+        return allocator
+
+    def ipv6_allocator(self, net: Network, shard: Optional[str]) -> IPv6Allocator:
+        entry = self._get_shard(shard)
+        allocator = self._ipv6_allocators.get(entry.name)
+        if allocator is None:
+            allocator = IPv6Allocator(entry.ipv6_range)
+            for name, peer in net.peers.items():
+                if peer.address_ipv6 and (self.peers.get(name) == entry.name):
+                    allocator.mark_used(peer.address_ipv6)
+            self._ipv6_allocators[entry.name] = allocator
+        return allocator
+
+    def check_address(self, shard: Optional[str], address: str):
+        # other shards allocate their addresses without this one loaded
+        entry = self._get_shard(shard)
+        parsed = ip_interface(address).ip
+        network = ip_network(
+            entry.ipv4_range if parsed.version == 4 else entry.ipv6_range
+        )
+        if parsed not in network:
+            raise RuntimeError(
+                'address {} is outside the range {} of shard "{}"'.format(
+                    address, network, entry.name
+                )
+            )
+
+    def reset_allocators(self):
+        self._ipv4_allocators = {}
+        self._ipv6_allocators = {}
+
+    def shard_for(self, name: str, shard: Optional[str]) -> str:
+        # peers that are added again stay in their shard unless told otherwise
+        current = self.peers.get(name)
+        if (current is not None) and (current not in self.loaded):
+            raise RuntimeError(
+                'peer "{}" belongs to shard "{}", which is not loaded'.format(
+                    name, current
+                )
+            )
+        return self._get_shard(shard or current).name
+
+    def add_peer(self, peer: Peer, shard: str):
+        self.peers[peer.name] = shard
+        if peer.address_ipv4 and (shard in self._ipv4_allocators):
+            self._ipv4_allocators[shard].mark_used(peer.address_ipv4)
+        if peer.address_ipv6 and (shard in self._ipv6_allocators):
+            self._ipv6_allocators[shard].mark_used(peer.address_ipv6)
+
+    def remove_peer(self, peer: Peer):
+        shard = self.peers.pop(peer.name)
+        self.removed[peer.name] = shard
+        if peer.address_ipv4 and (shard in self._ipv4_allocators):
+            self._ipv4_allocators[shard].release(peer.address_ipv4)
+        if peer.address_ipv6 and (shard in self._ipv6_allocators):
+            self._ipv6_allocators[shard].release(peer.address_ipv6)
+
+    def add_shard(
+        self,
+        net: Network,
+        name: str,
+        ipv4_range: Optional[str] = None,
+        ipv6_range: Optional[str] = None,
+        ipv4_prefixlen: Optional[int] = None,
+        ipv6_prefixlen: Optional[int] = None,
+        file: Optional[str] = None,
+    ) -> Shard:
+        if not SHARD_NAME.match(name):
+            raise RuntimeError('invalid shard name "{}"'.format(name))
+        if name in self.shards:
+            raise RuntimeError('shard "{}" already exists'.format(name))
+
+        ranges = []
+        for version, network_range, requested, prefixlen in [
+            (4, net.ipv4_range, ipv4_range, ipv4_prefixlen),
+            (6, net.ipv6_range, ipv6_range, ipv6_prefixlen),
+        ]:
+            used = [
+                ip_network(shard.ipv4_range if version == 4 else shard.ipv6_range)
+                for shard in self.shards.values()
+            ]
+            ranges.append(
+                str(_sub_range(ip_network(network_range), used, requested, prefixlen))
+            )
+
+        shard = Shard(name, file or "{}.yml".format(name), ranges[0], ranges[1])
+        self.shards[name] = shard
+        self.loaded.add(name)
+        self.created.add(name)
+        return shard
+
+    def manifest(self, net: Network) -> Dict[str, Any]:
+        return {
+            "version": MANIFEST_VERSION,
+            "settings": net.settings_dict(),
+            "shards": {name: shard.to_dict() for name, shard in self.shards.items()},
+            "peers": self.peers,
+            "connections": self.connections,
+        }
+
+
+def _sub_range(
+    network: Union[IPv4Network, IPv6Network],
+    used: List[Union[IPv4Network, IPv6Network]],
+    requested: Optional[str],
+    prefixlen: Optional[int],
+) -> Union[IPv4Network, IPv6Network]:
+    if requested:
+        candidate = ip_network(requested)
+        if (candidate.version != network.version) or not candidate.subnet_of(
+            network  # type: ignore
+        ):
+            raise RuntimeError("{} is not inside {}".format(candidate, network))
+        for other in used:
+            if candidate.overlaps(other):
+                raise RuntimeError(
+                    "{} overlaps the range {} of another shard".format(candidate, other)
+                )
+        return candidate
+
+    if prefixlen is None:
+        prefixlen = min(
+            network.prefixlen + SUBNET_BITS[network.version], network.max_prefixlen
+        )
+    if prefixlen < network.prefixlen:
+        raise RuntimeError("{} has no /{} subnets".format(network, prefixlen))
+    for candidate in network.subnets(new_prefix=prefixlen):
+        if not any(candidate.overlaps(other) for other in used):
+            return candidate
+    raise RuntimeError("no free /{} left in {}".format(prefixlen, network))
+
+
+def read_manifest(path: Union[str, Path]) -> Dict[str, Any]:
+    with open(path, "rb") as fptr:
+        manifest = serialization.load_json(fptr.read())
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise RuntimeError(
+            'unsupported version of the shard manifest "{}"'.format(path)
+        )
+    return manifest
+
+
+def _sharding(path: Union[str, Path], manifest: Dict[str, Any]) -> Sharding:
+    sharding = Sharding(Path(path).parent)
+    sharding.shards = {
+        name: Shard.from_dict(name, entry) for name, entry in manifest["shards"].items()
+    }
+    sharding.peers = dict(manifest["peers"])
+    sharding.connections = list(manifest["connections"])
+    return sharding
+
+
+def _load_shard(sharding: Sharding, shard: str) -> Network:
+    from wgadmin.network import Network
+
+    return Network.from_file(sharding.shard_path(shard))
+
+
+def load(path: Union[str, Path], shards: Optional[Iterable[str]] = None) -> Network:
+    from wgadmin.network import Network
+
+    manifest = read_manifest(path)
+    sharding = _sharding(path, manifest)
+    settings = dict(manifest["settings"], journal=False)
+    net = Network.from_dict({"settings": settings, "peers": {}, "connections": []})
+
+    selected = set(sharding.shards if shards is None else shards)
+    for shard in sharding.shards:
+        if shard not in selected:
+            continue
+        # the peers and their connections within the shard move over as they are
+        for name, peer in _load_shard(sharding, shard).peers.items():
+            net.peers[name] = peer
+            sharding.peers[name] = shard
+        sharding.loaded.add(shard)
+
+    for entry in sharding.connections:
+        if (entry["peer_a"] in net.peers) and (entry["peer_b"] in net.peers):
+            net.peers[entry["peer_a"]].add_connection(
+                net.peers[entry["peer_b"]], entry["psk"], force=True
+            )
+
+    net.sharding = sharding
+    net.origin = Path(path).resolve()
+    return net
+
+
+def load_for(
+    path: Union[str, Path],
+    peer_names: Iterable[str],
+    shards: Iterable[str] = (),
+    neighbors: bool = False,
+) -> Network:
+    sharding = _sharding(path, read_manifest(path))
+    selected = sharding.shards_of(peer_names, neighbors)
+    selected.update(shard for shard in shards if shard in sharding.shards)
+    return load(path, selected)
+
+
+def _dirty_shards(net: Network, sharding: Sharding) -> Set[str]:
+    def shard_of(name: str) -> Optional[str]:
+        return sharding.peers.get(name) or sharding.removed.get(name)
+
+    dirty = set(sharding.created)
+    for change in net.changes:
+        if change[0] == "settings":
+            return set(sharding.shards)
+        if change[0] == "remove_peer":
+            dirty.add(sharding.removed[change[1]])
+        elif change[0] in ("add_peer", "update_peer"):
+            dirty.add(shard_of(change[1]))  # type: ignore
+        elif shard_of(change[1]) == shard_of(change[2]):
+            # connections between shards are stored in the manifest
+            dirty.add(shard_of(change[1]))  # type: ignore
+    dirty.discard(None)  # type: ignore
+    return dirty
+
+
+def _connections(net: Network, sharding: Sharding) -> List[Dict[str, str]]:
+    def loaded(name: str) -> bool:
+        return (sharding.peers.get(name) in sharding.loaded) or (
+            name in sharding.removed
+        )
+
+    # connections among loaded peers are taken from the network, those that
+    # leave the loaded shards are kept unless their loaded peer was removed
+    connections = [
+        entry
+        for entry in sharding.connections
+        if not (loaded(entry["peer_a"]) or loaded(entry["peer_b"]))
+        or (
+            (loaded(entry["peer_a"]) != loaded(entry["peer_b"]))
+            and (entry["peer_a"] not in sharding.removed)
+            and (entry["peer_b"] not in sharding.removed)
+        )
+    ]
+    for peer in net.peers.values():
+        shard = sharding.peers[peer.name]
+        for other, connection in peer.adjacency.items():
+            if (peer.name < other) and (sharding.peers[other] != shard):
+                connections.append(
+                    {"peer_a": peer.name, "peer_b": other, "psk": connection.psk}
+                )
+    return connections
+
+
+def _shard_document(net: Network, sharding: Sharding, shard: str) -> Dict[str, Any]:
+    from wgadmin.network import Network
+
+    entry = sharding.shards[shard]
+    settings = dict(
+        net.settings_dict(), ipv4_range=entry.ipv4_range, ipv6_range=entry.ipv6_range
+    )
+    settings.pop("journal", None)
+    peers: Dict[str, Dict[str, Any]] = {}
+    connections: List[Dict[str, str]] = []
+    for name, peer in net.peers.items():
+        if sharding.peers[name] != shard:
+            continue
+        peers[name] = Network.peer_to_dict(peer)
+        for other, connection in peer.adjacency.items():
+            if (name < other) and (sharding.peers[other] == shard):
+                connections.append(
+                    {"peer_a": name, "peer_b": other, "psk": connection.psk}
+                )
+    return {"settings": settings, "peers": peers, "connections": connections}
+
+
+def save(net: Network, path: Union[str, Path]):
+    from wgadmin.network import Network
+
+    path = Path(path)
+    sharding = net.sharding
+    if sharding is None:
+        if net.peers:
+            raise RuntimeError(
+                'cannot store a network without shards as "{}", create it with '
+                "new-network and add-shard".format(path)
+            )
+        sharding = net.sharding = Sharding(path.parent)
+
+    if (net.origin is not None) and (net.origin != path.resolve()):
+        if sharding.loaded != set(sharding.shards):
+            raise RuntimeError("cannot copy a partially loaded sharded network")
+        sharding.directory = path.parent
+        dirty = set(sharding.shards)
+    else:
+        dirty = _dirty_shards(net, sharding)
+    if dirty - sharding.loaded:
+        raise RuntimeError(
+            "the settings of a sharded network can only be changed "
+            "with all shards loaded"
+        )
+
+    # shards first, a manifest never refers to shard files that are not written
+    for shard in sharding.shards:
+        if shard in dirty:
+            shard_path = sharding.shard_path(shard)
+            shard_path.parent.mkdir(parents=True, exist_ok=True)
+            Network.from_dict(_shard_document(net, sharding, shard)).to_file(shard_path)
+    sharding.connections = _connections(net, sharding)
+    util.write_file_atomic(
+        path, json.dumps(sharding.manifest(net), indent=2, sort_keys=True) + "\n"
+    )
+    sharding.created = set()
+    sharding.removed = {}
+
+
+def peer_names(path: Union[str, Path]) -> List[str]:
+    return list(read_manifest(path)["peers"])
+
+
+def iter_peer_entries(
+    path: Union[str, Path]
+) -> Iterator[Tuple[str, Dict[str, Any], int]]:
+    from wgadmin.network import Network
+
+    # one shard at a time, connections between shards are counted up front
+    manifest = read_manifest(path)
+    sharding = _sharding(path, manifest)
+    degrees: Dict[str, int] = {}
+    for entry in sharding.connections:
+        for name in (entry["peer_a"], entry["peer_b"]):
+            degrees[name] = degrees.get(name, 0) + 1
+
+    for shard in sharding.shards:
+        for name, peer in _load_shard(sharding, shard).peers.items():
+            yield name, Network.peer_to_dict(peer), len(peer.adjacency) + degrees.get(
+                name, 0
+            )
@@ -0,0 +1,339 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from __future__ import annotations
+
+import json
+from contextlib import closing
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from wgadmin.peer import Peer
+
+if TYPE_CHECKING:
+    import sqlite3
+
+    from wgadmin.network import Network
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS peers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    interface TEXT NOT NULL,
+    ipv4 TEXT NOT NULL,
+    ipv6 TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    private_key TEXT NOT NULL,
+    public_key TEXT NOT NULL,
+    endpoint_address TEXT NOT NULL,
+    tags TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS peers_ipv4 ON peers (ipv4);
+CREATE INDEX IF NOT EXISTS peers_ipv6 ON peers (ipv6);
+CREATE INDEX IF NOT EXISTS peers_public_key ON peers (public_key);
+CREATE TABLE IF NOT EXISTS connections (
+    peer_a INTEGER NOT NULL REFERENCES peers (id) ON DELETE CASCADE,
+    peer_b INTEGER NOT NULL REFERENCES peers (id) ON DELETE CASCADE,
+    psk TEXT NOT NULL,
+    UNIQUE (peer_a, peer_b)
+);
+CREATE INDEX IF NOT EXISTS connections_peer_b ON connections (peer_b);
+"""
+
+PEER_COLUMNS = (
+    "name, interface, ipv4, ipv6, port, private_key, public_key, endpoint_address, "
+    "tags"
+)
+
+
+def connect(path: Union[str, Path]) -> sqlite3.Connection:
+    import sqlite3
+
+    db = sqlite3.connect(str(path))
+    db.execute("PRAGMA foreign_keys = ON")
+    db.executescript(SCHEMA)
+    return db
+
+
+def _peer_row(peer: Peer) -> Tuple:
+    return (
+        peer.name,
+        peer.interface,
+        peer.address_ipv4,
+        peer.address_ipv6,
+        peer.port,
+        peer.private_key,
+        peer.public_key,
+        peer.endpoint_address,
+        json.dumps(peer.tags),
+    )
+
+
+def _edge(peer_a: str, peer_b: str) -> Tuple[str, str]:
+    # connections are stored once, ordered by peer name
+    if peer_a > peer_b:
+        return peer_b, peer_a
+    return peer_a, peer_b
+
+
+def _peer_id(db: sqlite3.Connection, name: str) -> Optional[int]:
+    row = db.execute("SELECT id FROM peers WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+    return row[0]
+
+
+def _write_settings(db: sqlite3.Connection, net: "Network"):
+    db.execute("DELETE FROM settings")
+    settings = net.settings_dict()
+    db.executemany(
+        "INSERT INTO settings (key, value) VALUES (?, ?)",
+        [(key, json.dumps(value)) for key, value in settings.items()],
+    )
+
+
+def _write_peer(db: sqlite3.Connection, peer: Peer):
+    row = _peer_row(peer)
+    cursor = db.execute(
+        "UPDATE peers SET interface = ?, ipv4 = ?, ipv6 = ?, port = ?, "
+        "private_key = ?, public_key = ?, endpoint_address = ?, tags = ? "
+        "WHERE name = ?",
+        row[1:] + row[:1],
+    )
+    if cursor.rowcount == 0:
+        db.execute(
+            "INSERT INTO peers ({}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)".format(
+                PEER_COLUMNS
+            ),
+            row,
+        )
+
+
+def _write_connection(db: sqlite3.Connection, net: "Network", edge: Tuple[str, str]):
+    id_a = _peer_id(db, edge[0])
+    id_b = _peer_id(db, edge[1])
+    if (id_a is None) or (id_b is None):
+        return
+
+    peer_a = net.peers.get(edge[0])
+    if (peer_a is None) or not peer_a.has_connection(edge[1]):
+        db.execute(
+            "DELETE FROM connections WHERE peer_a = ? AND peer_b = ?", (id_a, id_b)
+        )
+        return
+
+    psk = peer_a.adjacency[edge[1]].psk
+    cursor = db.execute(
+        "UPDATE connections SET psk = ? WHERE peer_a = ? AND peer_b = ?",
+        (psk, id_a, id_b),
+    )
+    if cursor.rowcount == 0:
+        db.execute(
+            "INSERT INTO connections (peer_a, peer_b, psk) VALUES (?, ?, ?)",
+            (id_a, id_b, psk),
+        )
+
+
+def _write_all(db: sqlite3.Connection, net: "Network"):
+    db.execute("DELETE FROM connections")
+    db.execute("DELETE FROM peers")
+    _write_settings(db, net)
+
+    db.executemany(
+        "INSERT INTO peers ({}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)".format(
+            PEER_COLUMNS
+        ),
+        [_peer_row(peer) for peer in net.peers.values()],
+    )
+    ids: Dict[str, int] = {
+        name: peer_id for peer_id, name in db.execute("SELECT id, name FROM peers")
+    }
+
+    rows: List[Tuple[int, int, str]] = []
+    for connection in net.iter_connections():
+        name_a, name_b = _edge(connection.peer_a.name, connection.peer_b.name)
+        rows.append((ids[name_a], ids[name_b], connection.psk))
+    db.executemany(
+        "INSERT INTO connections (peer_a, peer_b, psk) VALUES (?, ?, ?)", rows
+    )
+
+
+def _write_changes(db: sqlite3.Connection, net: "Network"):
+    touched: Dict[str, None] = {}
+    removed: Set[str] = set()
+    edges: Dict[Tuple[str, str], None] = {}
+    settings = False
+    for change in net.changes:
+        if change[0] == "settings":
+            settings = True
+        elif change[0] in ("add_peer", "update_peer"):
+            touched[change[1]] = None
+        elif change[0] == "remove_peer":
+            touched[change[1]] = None
+            removed.add(change[1])
+        else:
+            edges[_edge(change[1], change[2])] = None
+
+    if settings:
+        _write_settings(db, net)
+
+    for name in touched:
+        if name in removed:
+            # also drops all stored connections of the peer
+            db.execute("DELETE FROM peers WHERE name = ?", (name,))
+
+        peer = net.peers.get(name)
+        if peer is None:
+            continue
+        _write_peer(db, peer)
+        if name in removed:
+            for other in peer.adjacency:
+                edges[_edge(name, other)] = None
+
+    for edge in edges:
+        _write_connection(db, net, edge)
+
+
+def save(net: "Network", path: Union[str, Path]):
+    incremental = Path(path).exists() and (net.origin == Path(path).resolve())
+    with closing(connect(path)) as db:
+        with db:
+            if incremental:
+                _write_changes(db, net)
+            else:
+                _write_all(db, net)
+
+
+def load(path: Union[str, Path]) -> "Network":
+    from wgadmin.network import Network
+
+    if not Path(path).exists():
+        raise FileNotFoundError("no such network database: {}".format(path))
+
+    with closing(connect(path)) as db:
+        settings = {
+            key: json.loads(value)
+            for key, value in db.execute("SELECT key, value FROM settings")
+        }
+        net = Network.from_dict({"settings": settings, "peers": {}, "connections": []})
+
+        names: Dict[int, str] = {}
+        for row in db.execute(
+            "SELECT id, {} FROM peers ORDER BY id".format(PEER_COLUMNS)
+        ):
+            names[row[0]] = row[1]
+            net.peers[row[1]] = Peer(
+                name=row[1],
+                interface=row[2],
+                ipv4=row[3],
+                ipv6=row[4],
+                port=row[5],
+                private_key=row[6],
+                public_key=row[7],
+                endpoint_address=row[8],
+                tags=json.loads(row[9]),
+            )
+
+        for id_a, id_b, psk in db.execute(
+            "SELECT peer_a, peer_b, psk FROM connections ORDER BY rowid"
+        ):
+            net.peers[names[id_a]].add_connection(
+                net.peers[names[id_b]], psk, force=True
+            )
+
+    return net
+
+
+def _peer_entry(row: Tuple) -> Dict[str, Any]:
+    return {
+        "interface": row[1],
+        "ipv4": row[2],
+        "ipv6": row[3],
+        "port": row[4],
+        "private_key": row[5],
+        "public_key": row[6],
+        "endpoint_address": row[7],
+        "tags": json.loads(row[8]),
+    }
+
+
+def load_peer_names(path: Union[str, Path]) -> List[str]:
+    if not Path(path).exists():
+        raise FileNotFoundError("no such network database: {}".format(path))
+
+    with closing(connect(path)) as db:
+        return [row[0] for row in db.execute("SELECT name FROM peers ORDER BY id")]
+
+
+def iter_peer_entries(
+    path: Union[str, Path]
+) -> Iterator[Tuple[str, Dict[str, Any], int]]:
+    if not Path(path).exists():
+        raise FileNotFoundError("no such network database: {}".format(path))
+
+    # the degree is counted with the indexes of both connection columns
+    with closing(connect(path)) as db:
+        for row in db.execute(
+            "SELECT {}, "
+            "(SELECT COUNT(*) FROM connections WHERE peer_a = peers.id) + "
+            "(SELECT COUNT(*) FROM connections WHERE peer_b = peers.id) "
+            "FROM peers ORDER BY id".format(PEER_COLUMNS)
+        ):
+            yield row[0], _peer_entry(row), row[-1]
+
+
+def load_neighborhood(path: Union[str, Path], name: str) -> Dict[str, Any]:
+    if not Path(path).exists():
+        raise FileNotFoundError("no such network database: {}".format(path))
+
+    with closing(connect(path)) as db:
+        document: Dict[str, Any] = {
+            "settings": {
+                key: json.loads(value)
+                for key, value in db.execute("SELECT key, value FROM settings")
+            },
+            "peers": {},
+            "connections": [],
+        }
+
+        row = db.execute("SELECT id FROM peers WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return document
+        peer_id = row[0]
+
+        for row in db.execute(
+            "SELECT {} FROM peers WHERE id = :id OR id IN "
+            "(SELECT peer_b FROM connections WHERE peer_a = :id UNION "
+            "SELECT peer_a FROM connections WHERE peer_b = :id) "
+            "ORDER BY id".format(PEER_COLUMNS),
+            {"id": peer_id},
+        ):
+            document["peers"][row[0]] = _peer_entry(row)
+
+        for name_a, name_b, psk in db.execute(
+            "SELECT a.name, b.name, c.psk FROM connections c "
+            "JOIN peers a ON a.id = c.peer_a JOIN peers b ON b.id = c.peer_b "
+            "WHERE c.peer_a = :id OR c.peer_b = :id ORDER BY c.rowid",
+            {"id": peer_id},
+        ):
+            document["connections"].append(
+                {"peer_a": name_a, "peer_b": name_b, "psk": psk}
+            )
+
+    return document
@@ -16,13 +16,26 @@
 import argparse
 from pathlib import Path
 
+from wgadmin import daemon, keypool
 from wgadmin.network import Network
 
 
+def apply(net: Network, args: argparse.Namespace):
+    with keypool.use_pool_for(args.config):
+        net.add_connection(args.peer_a, args.peer_b, force=args.force)
+
+
 def add_connection(args: argparse.Namespace):
-    net = Network.from_file(args.config)
-    net.peers[args.peer_a].add_connection(net.peers[args.peer_b])
-    net.to_file(args.config)
+    client = daemon.connect(args.config)
+    if client is not None:
+        with client:
+            client.call("add-connection", args)
+        return
+
+    with Network.locked(args.config):
+        net = Network.from_file_for(args.config, [args.peer_a, args.peer_b])
+        apply(net, args)
+        net.to_file(args.config)
 
 
 def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
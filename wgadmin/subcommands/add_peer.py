@@ -17,6 +17,7 @@ import argparse
 from pathlib import Path
 from typing import Union
 
+from wgadmin import daemon, keypool, util
 from wgadmin.network import Network
 from wgadmin.peer import Peer
 
@@ -28,30 +29,61 @@ def sanitize_port(value: Union[str, int]) -> int:
     return port
 
 
-def add_peer(args: argparse.Namespace):
-    net = Network.from_file(args.config)
+def apply(net: Network, args: argparse.Namespace):
+    shard = args.shard
+    if net.sharding is not None:
+        shard = net.sharding.shard_for(args.name, shard)
+        for address in (args.ipv4, args.ipv6):
+            if address:
+                net.sharding.check_address(shard, address)
+    elif shard:
+        raise RuntimeError('network "{}" has no shards'.format(args.config))
 
-    if (args.name in net.peers) and not args.force:
-        raise RuntimeError(
-            'peer "{}" already present, add -f flag to overwrite'.format(args.name)
-        )
+    if args.name in net.peers:
+        if not args.force:
+            raise RuntimeError(
+                'peer "{}" already present, add -f flag to overwrite'.format(args.name)
+            )
+        net.remove_peer(args.name)
+
+    with keypool.use_pool_for(args.config):
+        private_key, public_key = util.generate_keypair()
 
     ipv4 = args.ipv4
     if (not ipv4) and net.ipv4:
-        ipv4 = str(net.get_next_ipv4_address())
+        ipv4 = str(net.get_next_ipv4_address(shard))
     ipv6 = args.ipv6
     if (not ipv6) and net.ipv6:
-        ipv6 = str(net.get_next_ipv6_address())
-    net.peers[args.name] = Peer(
-        name=args.name,
-        interface=args.interface,
-        ipv4=ipv4,
-        ipv6=ipv6,
-        port=args.port,
-        endpoint_address=args.endpoint_address,
+        ipv6 = str(net.get_next_ipv6_address(public_key, shard))
+    net.add_peer(
+        Peer(
+            name=args.name,
+            interface=args.interface,
+            ipv4=ipv4,
+            ipv6=ipv6,
+            port=args.port,
+            private_key=private_key,
+            public_key=public_key,
+            endpoint_address=args.endpoint_address,
+            tags=args.tags,
+        ),
+        shard,
     )
 
-    net.to_file(args.config)
+
+def add_peer(args: argparse.Namespace):
+    client = daemon.connect(args.config)
+    if client is not None:
+        with client:
+            client.call("add-peer", args)
+        return
+
+    with Network.locked(args.config):
+        net = Network.from_file_for(
+            args.config, [args.name], [args.shard] if args.shard else []
+        )
+        apply(net, args)
+        net.to_file(args.config)
 
 
 def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
@@ -90,6 +122,21 @@ def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentPa
         default="wg0",
         help="name of the WireGuard network interface that will created",
     )
+    parser.add_argument(
+        "-t",
+        "--tag",
+        type=str,
+        action="append",
+        dest="tags",
+        default=[],
+        help="tag the peer, e.g. with its site (can be given multiple times)",
+    )
+    parser.add_argument(
+        "-s",
+        "--shard",
+        type=str,
+        help="shard of a sharded network to add the peer to",
+    )
     parser.add_argument(
         "-f",
         "--force",
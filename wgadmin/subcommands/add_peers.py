@@ -0,0 +1,235 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import csv
+import sys
+from ipaddress import IPv4Address, IPv6Address
+from pathlib import Path
+from typing import Any, Dict, List, TextIO
+
+from wgadmin import keypool, serialization, util
+from wgadmin.network import Network
+from wgadmin.peer import Peer
+from wgadmin.subcommands.add_peer import sanitize_port
+
+COLUMNS = ["name", "interface", "ipv4", "ipv6", "port", "endpoint_address", "tags"]
+
+
+def read_specs(fptr: TextIO, input_format: str) -> List[Dict[str, Any]]:
+    if input_format == "csv":
+        return [dict(row) for row in csv.DictReader(fptr)]
+
+    decoded = serialization.load_yaml(fptr)
+    if not decoded:
+        return []
+    if isinstance(decoded, dict):
+        # mapping of peer names to their specification
+        return [dict(spec or {}, name=name) for name, spec in decoded.items()]
+    return list(decoded)
+
+
+def detect_format(path: str) -> str:
+    if Path(path).suffix.lower() in (".yml", ".yaml"):
+        return "yaml"
+    return "csv"
+
+
+def parse_spec(spec: Any) -> Dict[str, Any]:
+    if not isinstance(spec, dict):
+        raise ValueError("expected a mapping of peer properties")
+
+    if None in spec:
+        # csv.DictReader collects surplus cells under the key None
+        raise ValueError("more cells than columns in the header")
+    unknown = set(spec) - set(COLUMNS)
+    if unknown:
+        raise ValueError("unknown fields: {}".format(", ".join(sorted(unknown))))
+
+    name = str(spec.get("name") or "").strip()
+    if not name:
+        raise ValueError("missing peer name")
+
+    ipv4 = str(spec.get("ipv4") or "")
+    if ipv4:
+        ipv4 = str(IPv4Address(ipv4))
+    ipv6 = str(spec.get("ipv6") or "")
+    if ipv6:
+        ipv6 = str(IPv6Address(ipv6))
+
+    tags = spec.get("tags") or []
+    if isinstance(tags, str):
+        # CSV cells hold several tags separated by semicolons
+        tags = [tag.strip() for tag in tags.split(";") if tag.strip()]
+
+    return {
+        "name": name,
+        "interface": str(spec.get("interface") or "wg0"),
+        "ipv4": ipv4,
+        "ipv6": ipv6,
+        "port": sanitize_port(spec.get("port") or 51902),
+        "endpoint_address": str(spec.get("endpoint_address") or ""),
+        "tags": [str(tag) for tag in tags],
+    }
+
+
+def add_peers(args: argparse.Namespace):
+    with Network.locked(args.config):
+        net = Network.from_file(args.config)
+
+        input_format = args.format or detect_format(args.input)
+        if args.input == "-":
+            specs = read_specs(sys.stdin, input_format)
+        else:
+            with open(args.input, "r", newline="") as fptr:
+                specs = read_specs(fptr, input_format)
+
+        errors: List[str] = []
+        rows: List[Dict[str, Any]] = []
+        names = set()
+        for number, spec in enumerate(specs, start=1):
+            try:
+                row = parse_spec(spec)
+                if row["name"] in names:
+                    raise ValueError('duplicate peer "{}"'.format(row["name"]))
+                if (row["name"] in net.peers) and not args.force:
+                    raise ValueError(
+                        'peer "{}" already present, add -f flag to overwrite'.format(
+                            row["name"]
+                        )
+                    )
+            except (ValueError, argparse.ArgumentTypeError) as error:
+                errors.append("row {}: {}".format(number, error))
+                continue
+            names.add(row["name"])
+            rows.append(row)
+
+        if net.sharding is not None:
+            ipv4_allocator = net.sharding.ipv4_allocator(net, args.shard)
+            ipv6_allocator = net.sharding.ipv6_allocator(net, args.shard)
+        else:
+            ipv4_allocator = net.ipv4_allocator
+            ipv6_allocator = net.ipv6_allocator
+
+        # explicit addresses are claimed before any address is assigned automatically,
+        # existing peers are only replaced once their row has been accepted
+        accepted: List[Dict[str, Any]] = []
+        for row in rows:
+            if net.sharding is not None:
+                try:
+                    for address in (row["ipv4"], row["ipv6"]):
+                        if address:
+                            net.sharding.check_address(args.shard, address)
+                except RuntimeError as error:
+                    errors.append('peer "{}": {}'.format(row["name"], error))
+                    continue
+            # a replaced peer may keep the addresses it already has
+            old = net.peers.get(row["name"])
+            if (
+                row["ipv4"]
+                and ipv4_allocator.is_used(row["ipv4"])
+                and ((old is None) or (old.address_ipv4 != row["ipv4"]))
+            ):
+                errors.append('peer "{}": IPv4 address in use'.format(row["name"]))
+                continue
+            if (
+                row["ipv6"]
+                and ipv6_allocator.is_used(row["ipv6"])
+                and ((old is None) or (old.address_ipv6 != row["ipv6"]))
+            ):
+                errors.append('peer "{}": IPv6 address in use'.format(row["name"]))
+                continue
+            if row["ipv4"]:
+                ipv4_allocator.mark_used(row["ipv4"])
+            if row["ipv6"]:
+                ipv6_allocator.mark_used(row["ipv6"])
+            accepted.append(row)
+
+        with keypool.use_pool_for(args.config):
+            keypairs = util.generate_keypairs(len(accepted), args.jobs)
+
+        num_added = 0
+        for row, (private_key, public_key) in zip(accepted, keypairs):
+            try:
+                if (not row["ipv4"]) and net.ipv4:
+                    row["ipv4"] = str(net.get_next_ipv4_address(args.shard))
+                if (not row["ipv6"]) and net.ipv6:
+                    row["ipv6"] = str(net.get_next_ipv6_address(public_key, args.shard))
+            except RuntimeError as error:
+                errors.append('peer "{}": {}'.format(row["name"], error))
+                continue
+            # replaces an existing peer of the same name
+            net.add_peer(
+                Peer(private_key=private_key, public_key=public_key, **row), args.shard
+            )
+            num_added += 1
+
+        net.to_file(args.config)
+
+        for error in errors:
+            print(error, file=sys.stderr)
+        print("added {} peers, {} errors".format(num_added, len(errors)))
+        if errors:
+            sys.exit(1)
+
+
+def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "add-peers", help="add many peers to a network from a CSV or YAML file"
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        default=Path("wg0.yml"),
+        help="path of the config file",
+    )
+    parser.add_argument(
+        "--from",
+        dest="input",
+        type=str,
+        required=True,
+        help="file with one peer per row/entry ({}), - for stdin".format(
+            ", ".join(COLUMNS)
+        ),
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "yaml"],
+        default=None,
+        help="input format (default: guess from the file suffix, csv for stdin)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of workers used to generate keys",
+    )
+    parser.add_argument(
+        "-s",
+        "--shard",
+        type=str,
+        help="shard of a sharded network to add the peers to",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="whether to overwrite existing peers",
+    )
+    parser.set_defaults(func=add_peers)
+
+    return parser
@@ -0,0 +1,90 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from pathlib import Path
+
+from wgadmin.network import Network
+
+
+def add_shard(args: argparse.Namespace):
+    with Network.locked(args.config):
+        # only the manifest, no shard needs to be loaded
+        net = Network.from_file_for(args.config, [])
+        if net.sharding is None:
+            raise RuntimeError(
+                'network "{}" has no shards, create a .wgshards network with '
+                "new-network".format(args.config)
+            )
+        shard = net.sharding.add_shard(
+            net,
+            args.name,
+            ipv4_range=args.ipv4_range,
+            ipv6_range=args.ipv6_range,
+            ipv4_prefixlen=args.ipv4_prefixlen,
+            ipv6_prefixlen=args.ipv6_prefixlen,
+            file=args.file,
+        )
+        net.to_file(args.config)
+    print(
+        'added shard "{}" with {} and {} in {}'.format(
+            shard.name, shard.ipv4_range, shard.ipv6_range, shard.file
+        )
+    )
+
+
+def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "add-shard", help="add a shard with its own address ranges to a network"
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        default=Path("wg0.wgshards"),
+        help="path of the shard manifest",
+    )
+    parser.add_argument("name", type=str, help="name of the shard, e.g. a site")
+    parser.add_argument(
+        "--ipv4-range",
+        type=str,
+        help="IPv4 range of the shard (default: first free subnet of the network)",
+    )
+    parser.add_argument(
+        "--ipv6-range",
+        type=str,
+        help="IPv6 range of the shard (default: first free subnet of the network)",
+    )
+    parser.add_argument(
+        "--ipv4-prefixlen",
+        type=int,
+        help="prefix length of automatically chosen IPv4 ranges (default: 4 more "
+        "than the network, i.e. 16 shards)",
+    )
+    parser.add_argument(
+        "--ipv6-prefixlen",
+        type=int,
+        help="prefix length of automatically chosen IPv6 ranges (default: 16 more "
+        "than the network)",
+    )
+    parser.add_argument(
+        "--file",
+        type=str,
+        help="file of the shard relative to the manifest, the suffix selects "
+        "the format (default: NAME.yml)",
+    )
+    parser.set_defaults(func=add_shard)
+
+    return parser
@@ -0,0 +1,77 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from pathlib import Path
+
+from wgadmin import live
+from wgadmin.lazy import LazyNetwork
+
+
+def apply(args: argparse.Namespace):
+    peer = LazyNetwork(args.config).peer(args.name)
+    if args.interface:
+        peer.interface = args.interface
+
+    delta, calls = live.apply(peer, wg=args.wg, dry_run=args.dry_run)
+    if args.dry_run:
+        for command in calls:
+            print(live.format_command(command))
+
+    print(
+        "{} peers added, {} updated, {} removed{}".format(
+            len(delta.add),
+            len(delta.update),
+            len(delta.remove),
+            "" if delta else ", interface up to date",
+        )
+    )
+
+
+def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "apply",
+        help="update the running interface of a peer without restarting it",
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        default=Path("wg0.yml"),
+        help="path of the config file",
+    )
+    parser.add_argument("name", type=str, help="name of the peer")
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="print the wg commands instead of running them",
+    )
+    parser.add_argument(
+        "-i",
+        "--interface",
+        type=str,
+        default="",
+        help="interface to update (default: the interface of the peer)",
+    )
+    parser.add_argument(
+        "--wg",
+        type=str,
+        default="wg",
+        help="path of the wg binary",
+    )
+    parser.set_defaults(func=apply)
+
+    return parser
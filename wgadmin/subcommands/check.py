@@ -0,0 +1,85 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from wgadmin import check as network_check
+from wgadmin import daemon
+
+
+def check(args: argparse.Namespace):
+    daemon.sync(args.config)
+    try:
+        document = network_check.load_document(args.config)
+    except (KeyError, ValueError, RuntimeError) as error:
+        problems = [
+            network_check.Problem(
+                "unreadable", "cannot load {}: {!r}".format(args.config, error)
+            )
+        ]
+    else:
+        problems = network_check.check_document(document, not args.skip_keys, args.jobs)
+
+    if args.format == "json":
+        print(
+            json.dumps(
+                {
+                    "valid": not problems,
+                    "problems": [problem.to_dict() for problem in problems],
+                },
+                indent=2,
+            )
+        )
+    else:
+        for problem in problems:
+            print(problem)
+
+    if problems:
+        sys.exit(1)
+
+
+def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser("check", help="check a network for errors")
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        default=Path("wg0.yml"),
+        help="path of the config file",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json"],
+        default="text",
+        help="output format (default: text)",
+    )
+    parser.add_argument(
+        "--skip-keys",
+        action="store_true",
+        help="do not check that the public keys belong to the private keys",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes used to derive the public keys",
+    )
+    parser.set_defaults(func=check)
+
+    return parser
@@ -0,0 +1,96 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from pathlib import Path
+from typing import Iterable, List
+
+from wgadmin import keypool, timing, topology, util
+from wgadmin.network import Network
+
+
+def compute_edges(net: Network, args: argparse.Namespace) -> Iterable[topology.Edge]:
+    peers = list(net.peers.values())
+    if args.mesh:
+        return topology.mesh(peers)
+    if args.hub:
+        if args.hub not in net.peers:
+            raise RuntimeError('peer "{}" does not exist'.format(args.hub))
+        return topology.hub(net.peers[args.hub], peers)
+    if args.group_mesh:
+        return topology.group_mesh(peers, args.group_mesh)
+    return topology.k_nearest(peers, args.k_nearest)
+
+
+def connect(args: argparse.Namespace):
+    # loading, key generation, the new connections and saving are timed
+    # where they happen, see --timings
+    with Network.locked(args.config):
+        net = Network.from_file(args.config)
+
+        edges: List[topology.Edge] = []
+        num_skipped = 0
+        with timing.span("topology"):
+            for edge in compute_edges(net, args):
+                if net.has_connection(*edge):
+                    num_skipped += 1
+                    continue
+                edges.append(edge)
+
+        with keypool.use_pool_for(args.config):
+            psks = util.generate_psks(len(edges))
+
+        for (peer_a, peer_b), psk in zip(edges, psks):
+            net.add_connection(peer_a, peer_b, psk)
+        if edges:
+            net.to_file(args.config)
+
+        print("created {} edges, skipped {} existing".format(len(edges), num_skipped))
+
+
+def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "connect", help="connect many peers at once according to a topology"
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        default=Path("wg0.yml"),
+        help="path of the config file",
+    )
+
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument(
+        "--mesh", action="store_true", help="connect every peer with every other peer"
+    )
+    group.add_argument(
+        "--hub", type=str, metavar="NAME", help="connect all peers to this peer"
+    )
+    group.add_argument(
+        "--group-mesh",
+        type=str,
+        metavar="TAG",
+        help="connect all peers with this tag with each other",
+    )
+    group.add_argument(
+        "--k-nearest",
+        type=int,
+        metavar="K",
+        help="connect each peer to the K peers with the closest addresses",
+    )
+    parser.set_defaults(func=connect)
+
+    return parser
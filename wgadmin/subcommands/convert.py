@@ -0,0 +1,54 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from pathlib import Path
+
+from wgadmin import daemon
+from wgadmin.network import Network
+
+
+def convert(args: argparse.Namespace):
+    if args.output.exists() and not args.force:
+        raise RuntimeError(
+            'config "{}" already exists, add -f flag to overwrite'.format(args.output)
+        )
+
+    daemon.sync(args.input)
+    Network.from_file(args.input).to_file(args.output)
+
+
+def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "convert",
+        help="convert a config file between the YAML, JSON and wgnet formats",
+    )
+    parser.add_argument(
+        "input", type=Path, help="config file to read, format given by suffix"
+    )
+    parser.add_argument(
+        "output",
+        type=Path,
+        help="config file to write (.yml, .json or .wgnet)",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="whether to overwrite an existing output file",
+    )
+    parser.set_defaults(func=convert)
+
+    return parser
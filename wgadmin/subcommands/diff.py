@@ -0,0 +1,58 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from wgadmin import daemon
+from wgadmin import diff as network_diff
+from wgadmin.network import Network
+
+
+def diff(args: argparse.Namespace):
+    for path in (args.old, args.new):
+        daemon.sync(path)
+    result = network_diff.diff(Network.from_file(args.old), Network.from_file(args.new))
+    if args.format == "json":
+        print(json.dumps(result.to_dict(), indent=2))
+    elif result:
+        print(result.to_text())
+
+    if args.exit_code and result:
+        sys.exit(1)
+
+
+def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "diff", help="show the structural differences between two networks"
+    )
+    parser.add_argument("old", type=Path, help="config file of the old network")
+    parser.add_argument("new", type=Path, help="config file of the new network")
+    parser.add_argument(
+        "--format",
+        choices=["text", "json"],
+        default="text",
+        help="output format (default: text)",
+    )
+    parser.add_argument(
+        "--exit-code",
+        action="store_true",
+        help="exit with 1 if the networks differ, like git diff",
+    )
+    parser.set_defaults(func=diff)
+
+    return parser
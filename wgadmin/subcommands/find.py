@@ -0,0 +1,83 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from ipaddress import ip_network
+from pathlib import Path
+from typing import List
+
+from wgadmin import daemon
+from wgadmin.network import Network
+
+
+def sanitize_address(value: str) -> str:
+    try:
+        return str(ip_network(value, strict=False))
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid address or subnet: {}".format(value))
+
+
+def search(net: Network, args: argparse.Namespace) -> List[str]:
+    results = []
+    if args.address:
+        results.append(net.index.by_address(args.address))
+    if args.pubkey:
+        results.append(net.index.by_public_key(args.pubkey))
+    if args.endpoint:
+        results.append(net.index.by_endpoint(args.endpoint))
+    if not results:
+        raise RuntimeError("give at least one of --address, --pubkey or --endpoint")
+
+    # peers matching all criteria, in the order of the first one
+    matches = set(results[0]).intersection(*results[1:])
+    return [name for name in results[0] if name in matches]
+
+
+def find(args: argparse.Namespace):
+    client = daemon.connect(args.config)
+    if client is not None:
+        with client:
+            names = client.call("find", args)
+    else:
+        names = search(Network.from_file(args.config), args)
+
+    for name in names:
+        print(name)
+
+
+def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "find", help="find peers by address, subnet, public key or endpoint"
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        default=Path("wg0.yml"),
+        help="path of the config file",
+    )
+    parser.add_argument(
+        "-a",
+        "--address",
+        type=sanitize_address,
+        help="IPv4 or IPv6 address or subnet (e.g. 10.0.3.16/28) inside the VPN",
+    )
+    parser.add_argument("-k", "--pubkey", type=str, help="public key of the peer")
+    parser.add_argument(
+        "-e", "--endpoint", type=str, help="address under which the peer is reachable"
+    )
+    parser.set_defaults(func=find)
+
+    return parser
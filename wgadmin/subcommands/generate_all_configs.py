@@ -14,31 +14,184 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import argparse
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
-import jinja2
-
+from wgadmin import daemon, render, timing, util
 from wgadmin.network import Network
 
+MANIFEST = ".manifest.json"
+MANIFEST_VERSION = 1
 
-def generate_all_configs(args: argparse.Namespace):
-    net = Network.from_file(args.config)
-    env = jinja2.Environment(
-        loader=jinja2.PackageLoader("wgadmin", "templates"), autoescape=True
+FORMATS = [("nm-connection", ".nmconnection"), ("wg-quick", ".conf")]
+
+_network: Optional[Network] = None
+_renderers: List[Any] = []
+
+
+def create_renderers() -> List[Any]:
+    return [render.get_renderer(config_format) for config_format, _ in FORMATS]
+
+
+def render_peer(renderers: List[Any], peer) -> List[str]:
+    return [renderer.render(peer) for renderer in renderers]
+
+
+def _init_worker(document: Dict[str, Any], adjacency: Dict[str, List[str]]):
+    global _network, _renderers
+    _network = Network.from_dict(document)
+    # the document lists the connections in canonical order, the peer sections
+    # follow the order of the connections in the parent
+    for name, others in adjacency.items():
+        peer = _network.peers[name]
+        peer.adjacency = {other: peer.adjacency[other] for other in others}
+    _renderers = create_renderers()
+
+
+def _render_chunk(names: List[str]) -> List[List[str]]:
+    assert _network is not None
+    return [render_peer(_renderers, _network.peers[name]) for name in names]
+
+
+@timing.timed("render")
+def render_all(
+    net: Network, names: List[str], jobs: int = 1
+) -> List[Tuple[str, List[str]]]:
+    if (jobs <= 1) or (len(names) < 2 * jobs):
+        renderers = create_renderers()
+        return [(name, render_peer(renderers, net.peers[name])) for name in names]
+
+    # every worker rebuilds the network once from the flat document, which is
+    # much cheaper to pickle than the object graph, and keeps its renderers, so
+    # the peer sections are cached per worker
+    # several chunks per worker balance peers of different degree
+    size = -(-len(names) // (4 * jobs))
+    chunks = [names[i : i + size] for i in range(0, len(names), size)]
+    adjacency = {name: list(peer.adjacency) for name, peer in net.peers.items()}
+    executor = ProcessPoolExecutor(
+        jobs, initializer=_init_worker, initargs=(net.to_dict(), adjacency)
     )
+    with executor:
+        results = executor.map(_render_chunk, chunks)
+        return [
+            (name, configs)
+            for chunk, result in zip(chunks, results)
+            for name, configs in zip(chunk, result)
+        ]
+
+
+def write_config(path: Path, content: str):
+    with open(path, "w") as fptr:
+        fptr.write(content)
+
+
+def templates_hash() -> str:
+    # the output comes from the native renderers, which reproduce the templates,
+    # so a change to either renders all peers again
+    directory = Path(render.__file__).parent / "templates"
+    digest = hashlib.sha256(Path(render.__file__).read_bytes())
+    for template, suffix in FORMATS:
+        source = (directory / template).read_text()
+        digest.update("{}\0{}\0{}\0".format(template, suffix, source).encode())
+    return digest.hexdigest()
+
 
+def peer_hash(peer) -> str:
+    # everything the templates can reach from the peer
+    inputs = [
+        Network.peer_to_dict(peer),
+        [
+            [Network.peer_to_dict(connection.peer_b), connection.psk]
+            for connection in peer.connections
+        ],
+    ]
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
+
+
+def load_manifest(path: Path, templates: str) -> Dict[str, str]:
+    try:
+        manifest = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    if (
+        not isinstance(manifest, dict)
+        or manifest.get("version") != MANIFEST_VERSION
+        or manifest.get("templates") != templates
+    ):
+        return {}
+    return manifest.get("peers", {})
+
+
+def config_paths(output: Path, config_name: str, name: str) -> List[Path]:
+    directory = output / name
+    return [(directory / config_name).with_suffix(suffix) for _, suffix in FORMATS]
+
+
+def remove_configs(output: Path, config_name: str, name: str):
+    for path in config_paths(output, config_name, name):
+        if path.exists():
+            path.unlink()
+    # keep directories that contain files we did not generate
+    try:
+        (output / name).rmdir()
+    except OSError:
+        pass
+
+
+def generate_all_configs(args: argparse.Namespace):
+    daemon.sync(args.config)
+    net = Network.from_file(args.config)
     config_name = Path(args.config).stem
-    for name in net.peers:
-        directory = Path(config_name) / name
+    output = Path(config_name)
+    manifest_path = output / MANIFEST
 
-        template = env.get_template("nm-connection")
-        directory.mkdir(exist_ok=True, parents=True)
-        with open((directory / config_name).with_suffix(".nmconnection"), "w") as fptr:
-            fptr.write(template.render(peer=net.peers[name]))
+    templates = templates_hash()
+    previous = {} if args.force else load_manifest(manifest_path, templates)
+    hashes = {name: peer_hash(peer) for name, peer in net.peers.items()}
 
-        template = env.get_template("wg-quick")
-        with open((directory / config_name).with_suffix(".conf"), "w") as fptr:
-            fptr.write(template.render(peer=net.peers[name]))
+    names = [
+        name
+        for name in net.peers
+        if previous.get(name) != hashes[name]
+        or not all(path.exists() for path in config_paths(output, config_name, name))
+    ]
+    rendered = render_all(net, names, args.jobs)
+
+    files: List[Tuple[Path, str]] = []
+    for name, configs in rendered:
+        (output / name).mkdir(exist_ok=True, parents=True)
+        files.extend(zip(config_paths(output, config_name, name), configs))
+
+    stale = [name for name in previous if name not in net.peers]
+    with timing.span("write"):
+        if args.jobs <= 1:
+            for path, content in files:
+                write_config(path, content)
+        else:
+            with ThreadPoolExecutor(args.jobs) as executor:
+                for _ in executor.map(lambda item: write_config(*item), files):
+                    pass
+
+        for name in stale:
+            remove_configs(output, config_name, name)
+
+        output.mkdir(exist_ok=True, parents=True)
+        util.write_file_atomic(
+            manifest_path,
+            json.dumps(
+                {"version": MANIFEST_VERSION, "templates": templates, "peers": hashes},
+                indent=2,
+                sort_keys=True,
+            ),
+        )
+    print(
+        "rendered {} peers, skipped {} unchanged, deleted {} stale".format(
+            len(names), len(net.peers) - len(names), len(stale)
+        )
+    )
 
 
 def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
@@ -52,6 +205,19 @@ def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentPa
         default=Path("wg0.yml"),
         help="path of the config file",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes used to render the configs",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="render all peers even if their configuration did not change",
+    )
     parser.set_defaults(func=generate_all_configs)
 
     return parser
@@ -16,24 +16,28 @@
 import argparse
 from pathlib import Path
 
-import jinja2
-
-from wgadmin.network import Network
+from wgadmin import daemon, render, timing
+from wgadmin.lazy import LazyNetwork
 
 
 def generate_config(args: argparse.Namespace):
-    net = Network.from_file(args.config)
-    env = jinja2.Environment(
-        loader=jinja2.PackageLoader("wgadmin", "templates"), autoescape=True
-    )
-    template = env.get_template(args.config_format)
+    client = daemon.connect(args.config)
+    if client is not None:
+        with client:
+            config = client.call("generate-config", args)
+    else:
+        peer = LazyNetwork(args.config).peer(args.name)
+        if args.template:
+            renderer = render.get_template_renderer(args.template)
+        else:
+            renderer = render.get_renderer(args.config_format)
+        config = renderer.render(peer)
 
-    config = template.render(peer=net.peers[args.name])
     if not args.output:
         print(config)
         return
 
-    with open(args.output, "w") as fptr:
+    with timing.span("write"), open(args.output, "w") as fptr:
         fptr.write(config)
 
 
@@ -70,5 +74,11 @@ def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentPa
         dest="config_format",
         help="create a configuration file to be used with wg-quick",
     )
+    group.add_argument(
+        "-t",
+        "--template",
+        type=Path,
+        help="render a custom Jinja2 template, the peer is passed as peer",
+    )
 
     return parser
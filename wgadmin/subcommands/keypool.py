@@ -0,0 +1,85 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from pathlib import Path
+
+from wgadmin.keypool import KeyPool
+from wgadmin.network import Network
+
+
+def keypool_fill(args: argparse.Namespace):
+    # writers take keys from the pool under the same lock, the daemon keeps
+    # its pool in memory and is refused
+    with Network.locked(args.config):
+        pool = KeyPool.load(KeyPool.path_for(args.config))
+        if args.capacity is not None:
+            pool.capacity = args.capacity
+        num_keypairs, num_psks = pool.fill(args.count)
+        pool.save()
+    print("added {} keypairs and {} PSKs".format(num_keypairs, num_psks))
+
+
+def keypool_stats(args: argparse.Namespace):
+    path = KeyPool.path_for(args.config)
+    if not path.exists():
+        print("no key pool for {}".format(args.config))
+        return
+
+    stats = KeyPool.load(path).stats()
+    for key in stats:
+        print("{}: {}".format(key, stats[key]))
+
+
+def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "keypool", help="manage the pool of pre-generated keys of a network"
+    )
+    actions = parser.add_subparsers(description="action to perform", required=True)
+
+    fill_parser = actions.add_parser("fill", help="generate keys for the pool")
+    fill_parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        default=Path("wg0.yml"),
+        help="path of the config file",
+    )
+    fill_parser.add_argument(
+        "-n",
+        "--count",
+        type=int,
+        default=None,
+        help="number of keypairs and PSKs to add (default: fill up to capacity)",
+    )
+    fill_parser.add_argument(
+        "--capacity",
+        type=int,
+        default=None,
+        help="maximum number of keypairs and PSKs to keep in the pool",
+    )
+    fill_parser.set_defaults(func=keypool_fill)
+
+    stats_parser = actions.add_parser("stats", help="show pool size and hit counters")
+    stats_parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        default=Path("wg0.yml"),
+        help="path of the config file",
+    )
+    stats_parser.set_defaults(func=keypool_stats)
+
+    return parser
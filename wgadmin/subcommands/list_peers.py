@@ -14,19 +14,122 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import argparse
+import csv
+import json
+import os
+import sys
+from fnmatch import fnmatchcase
+from itertools import islice
 from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator
 
-from wgadmin.network import Network
+from wgadmin import daemon
+from wgadmin.lazy import LazyNetwork, PeerEntry
+
+COLUMNS = [
+    "name",
+    "interface",
+    "ipv4",
+    "ipv6",
+    "port",
+    "endpoint",
+    "degree",
+    "public_key",
+]
+TABLE_ROW = (
+    "{name:<16} {interface:<9} {ipv4:<15} {ipv6:<24} {port:>5} {endpoint:<24} "
+    "{degree:>6} {public_key}"
+)
+
+Row = Dict[str, Any]
+
+
+def to_row(peer_entry: PeerEntry) -> Row:
+    name, entry, degree = peer_entry
+    return {
+        "name": name,
+        "interface": entry["interface"],
+        "ipv4": entry["ipv4"],
+        "ipv6": entry["ipv6"],
+        "port": int(entry["port"]),
+        "endpoint": entry["endpoint_address"],
+        "degree": degree,
+        "public_key": entry["public_key"],
+    }
+
+
+def non_negative(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError("invalid count: {}".format(number))
+    return number
+
+
+def needs_rows(args: argparse.Namespace) -> bool:
+    return (
+        args.verbose
+        or args.endpoint_only
+        or (args.min_degree > 0)
+        or (args.name is not None)
+        or (args.limit is not None)
+        or (args.offset != 0)
+    )
+
+
+def select_rows(
+    peer_entries: Iterable[PeerEntry], args: argparse.Namespace
+) -> Iterator[Row]:
+    rows = (
+        to_row(peer_entry)
+        for peer_entry in peer_entries
+        if (not args.endpoint_only or peer_entry[1]["endpoint_address"])
+        and (peer_entry[2] >= args.min_degree)
+        and (args.name is None or fnmatchcase(peer_entry[0], args.name))
+    )
+    stop = None if args.limit is None else args.offset + args.limit
+    return islice(rows, args.offset, stop)
+
+
+def write_rows(rows: Iterable[Row], output_format: str):
+    if output_format == "names":
+        for row in rows:
+            print(row["name"])
+    elif output_format == "jsonl":
+        for row in rows:
+            print(json.dumps(row))
+    elif output_format == "csv":
+        writer = csv.DictWriter(sys.stdout, COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        print(TABLE_ROW.format(**{column: column for column in COLUMNS}))
+        for row in rows:
+            print(TABLE_ROW.format(**row))
 
 
 def list_peers(args: argparse.Namespace):
-    net = Network.from_file(args.config)
-    if not args.verbose:
-        for peer_name in net.peers:
-            print(peer_name)
-        return
+    if args.format is not None:
+        args.verbose = True
 
-    # TODO: implement verbose version
+    client = daemon.connect(args.config)
+    if client is not None:
+        with client:
+            result = client.call("list-peers", args)
+    elif needs_rows(args):
+        result = select_rows(LazyNetwork(args.config).iter_peer_entries(), args)
+    else:
+        result = LazyNetwork(args.config).peer_names()
+
+    try:
+        if not needs_rows(args):
+            for peer_name in result:
+                print(peer_name)
+        else:
+            write_rows(result, (args.format or "table") if args.verbose else "names")
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # e.g. piped into head, which does not want the remaining rows
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
 
 
 def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
@@ -44,6 +147,36 @@ def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentPa
         action="store_true",
         help="whether to print detailed information about each peer",
     )
+    parser.add_argument(
+        "--format",
+        choices=["table", "csv", "jsonl"],
+        help="format of the detailed information (implies -v, default: table)",
+    )
+    parser.add_argument(
+        "--endpoint-only",
+        action="store_true",
+        help="only list peers that have an endpoint address",
+    )
+    parser.add_argument(
+        "--min-degree",
+        type=int,
+        default=0,
+        help="only list peers with at least this many connections",
+    )
+    parser.add_argument(
+        "--name", type=str, help="only list peers whose name matches this glob"
+    )
+    parser.add_argument(
+        "--limit",
+        type=non_negative,
+        help="list at most this many peers (after filtering)",
+    )
+    parser.add_argument(
+        "--offset",
+        type=non_negative,
+        default=0,
+        help="skip this many peers (after filtering)",
+    )
     parser.set_defaults(func=list_peers)
 
     return parser
@@ -16,25 +16,29 @@
 import argparse
 from pathlib import Path
 
-from wgadmin.network import Network
+from wgadmin.network import IPV6_MODES, Network
 
 
 def new_network(args: argparse.Namespace):
-    if args.config.exists():
-        if not args.force:
-            raise RuntimeError(
-                'config "{}" already exists, add -f flag to overwrite'.format(
-                    args.config
+    with Network.locked(args.config):
+        if args.config.exists():
+            if not args.force:
+                raise RuntimeError(
+                    'config "{}" already exists, add -f flag to overwrite'.format(
+                        args.config
+                    )
                 )
-            )
 
-    net = Network(
-        ipv4=args.ipv4,
-        ipv6=args.ipv6,
-        ipv4_range=args.ipv4_range,
-        ipv6_range=args.ipv6_range,
-    )
-    net.to_file(args.config)
+        net = Network(
+            ipv4=args.ipv4,
+            ipv6=args.ipv6,
+            ipv4_range=args.ipv4_range,
+            ipv6_range=args.ipv6_range,
+            ipv4_reserved=args.ipv4_reserved,
+            ipv6_mode=args.ipv6_mode,
+            journal=args.journal,
+        )
+        net.to_file(args.config)
 
 
 def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
@@ -72,6 +76,14 @@ def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentPa
         default="10.0.0.0/24",
         help="IPv4 address range to use",
     )
+    parser.add_argument(
+        "--ipv4-reserve",
+        type=str,
+        action="append",
+        dest="ipv4_reserved",
+        default=[],
+        help="IPv4 address or range that is never assigned automatically",
+    )
     parser.add_argument(
         "--ipv6",
         action="store_true",
@@ -91,5 +103,16 @@ def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentPa
         default="fdc9:281f:4d7:9ee9::/64",
         help="IPv6 address range to use",
     )
+    parser.add_argument(
+        "--ipv6-mode",
+        choices=IPV6_MODES,
+        default="sequential",
+        help="assign IPv6 addresses in order or derive them from the public key",
+    )
+    parser.add_argument(
+        "--journal",
+        action="store_true",
+        help="append changes to a journal instead of rewriting the config file",
+    )
 
     return parser
@@ -0,0 +1,56 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from pathlib import Path
+
+from wgadmin import daemon
+from wgadmin.network import Network
+
+
+def apply(net: Network, args: argparse.Namespace):
+    if args.name not in net.peers:
+        raise RuntimeError('peer "{}" does not exist'.format(args.name))
+    net.remove_peer(args.name)
+
+
+def remove_peer(args: argparse.Namespace):
+    client = daemon.connect(args.config)
+    if client is not None:
+        with client:
+            client.call("remove-peer", args)
+        return
+
+    with Network.locked(args.config):
+        net = Network.from_file_for(args.config, [args.name])
+        apply(net, args)
+        net.to_file(args.config)
+
+
+def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "remove-peer", help="remove a peer and all its connections from a network"
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        default=Path("wg0.yml"),
+        help="path of the config file",
+    )
+    parser.add_argument("name", type=str, help="name of the peer")
+    parser.set_defaults(func=remove_peer)
+
+    return parser
@@ -0,0 +1,58 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from pathlib import Path
+
+from wgadmin import daemon
+
+
+def serve(args: argparse.Namespace):
+    if args.stop:
+        client = daemon.connect(args.config)
+        if client is None:
+            raise RuntimeError('network "{}" is not served'.format(args.config))
+        with client:
+            client.call("shutdown", {})
+        return
+
+    from wgadmin import server
+
+    server.serve(args.config, args.save_delay)
+
+
+def create_parser(subparsers: argparse._SubParsersAction) -> argparse.ArgumentParser:
+    parser = subparsers.add_parser(
+        "serve", help="keep a network in memory and serve requests for it"
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=Path,
+        default=Path("wg0.yml"),
+        help="path of the config file",
+    )
+    parser.add_argument(
+        "--save-delay",
+        type=float,
+        default=1.0,
+        help="seconds to collect changes before they are written to disk",
+    )
+    parser.add_argument(
+        "--stop", action="store_true", help="stop the daemon serving the network"
+    )
+    parser.set_defaults(func=serve)
+
+    return parser
@@ -0,0 +1,192 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Phase timing. Code wraps its phases (load, allocate, topology, keygen, mutate,
+# render, write, save) in spans, which cost a single check unless timings are being
+# collected:
+#
+#     with timing.collect() as timings:
+#         net = Network.from_file("wg0.yml")
+#         ...
+#     print(timings.to_dict())
+
+import functools
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Set, TextIO, Union
+
+PHASES = ["load", "allocate", "topology", "keygen", "mutate", "render", "write", "save"]
+
+
+class Phase:
+    __slots__ = ("calls", "seconds", "max_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "max_seconds": self.max_seconds,
+        }
+
+
+def peak_rss() -> Dict[str, Optional[int]]:
+    try:
+        import resource
+    except ImportError:
+        return {"self": None, "children": None}
+
+    # kibibytes on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    }
+
+
+class Timings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.phases: Dict[str, Phase] = {}
+        self.active: Set[str] = set()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        # a phase that is entered again from within itself, e.g. a peer
+        # removed while another one is added, is only counted once
+        if name in self.active:
+            yield
+            return
+
+        self.active.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.active.discard(name)
+            phase = self.phases.get(name)
+            if phase is None:
+                phase = self.phases[name] = Phase()
+            phase.calls += 1
+            phase.seconds += seconds
+            phase.max_seconds = max(phase.max_seconds, seconds)
+
+    def stop(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def total(self) -> float:
+        end = time.perf_counter() if self.end is None else self.end
+        return end - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_seconds": self.total(),
+            "peak_rss": peak_rss(),
+            "phases": {name: phase.to_dict() for name, phase in self.phases.items()},
+        }
+
+    def report(self, stream: TextIO = sys.stderr):
+        total = self.total()
+        stream.write(
+            "{:<10} {:>8} {:>10} {:>10} {:>6}\n".format(
+                "phase", "calls", "seconds", "max", "%"
+            )
+        )
+        for name, phase in self.phases.items():
+            stream.write(
+                "{:<10} {:>8} {:>10.4f} {:>10.4f} {:>6.1f}\n".format(
+                    name,
+                    phase.calls,
+                    phase.seconds,
+                    phase.max_seconds,
+                    100 * phase.seconds / total if total else 0.0,
+                )
+            )
+        stream.write("{:<10} {:>8} {:>10.4f}\n".format("total", "", total))
+        for process, size in peak_rss().items():
+            if size is not None:
+                stream.write(
+                    "peak RSS ({}): {:.1f} MiB\n".format(process, size / 2**20)
+                )
+
+    def to_json_file(self, path: Union[str, Path]):
+        with open(path, "w") as fptr:
+            json.dump(self.to_dict(), fptr, indent=2)
+            fptr.write("\n")
+
+
+_timings: Optional[Timings] = None
+_disabled = nullcontext()
+
+
+def span(name: str):
+    if _timings is None:
+        return _disabled
+    return _timings.span(name)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _timings is None:
+                return function(*args, **kwargs)
+            with _timings.span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_timings() -> Optional[Timings]:
+    return _timings
+
+
+def enable() -> Timings:
+    global _timings
+    if _timings is None:
+        _timings = Timings()
+    return _timings
+
+
+def disable() -> Optional[Timings]:
+    global _timings
+    timings, _timings = _timings, None
+    if timings is not None:
+        timings.stop()
+    return timings
+
+
+@contextmanager
+def collect() -> Iterator[Timings]:
+    global _timings
+    previous = _timings
+    timings = _timings = Timings()
+    try:
+        yield timings
+    finally:
+        timings.stop()
+        _timings = previous
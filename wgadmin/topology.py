@@ -0,0 +1,73 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import heapq
+from ipaddress import IPv4Address, IPv6Address
+from typing import Iterator, List, Optional, Sequence, Set, Tuple
+
+from wgadmin.peer import Peer
+
+Edge = Tuple[str, str]
+
+
+def normalize(peer_a: str, peer_b: str) -> Edge:
+    if peer_a > peer_b:
+        return peer_b, peer_a
+    return peer_a, peer_b
+
+
+def mesh(peers: Sequence[Peer]) -> Iterator[Edge]:
+    for i, peer_a in enumerate(peers):
+        for peer_b in peers[i + 1 :]:
+            yield normalize(peer_a.name, peer_b.name)
+
+
+def hub(center: Peer, peers: Sequence[Peer]) -> Iterator[Edge]:
+    for peer in peers:
+        if peer is not center:
+            yield normalize(center.name, peer.name)
+
+
+def group_mesh(peers: Sequence[Peer], tag: str) -> Iterator[Edge]:
+    return mesh([peer for peer in peers if tag in peer.tags])
+
+
+def address_key(peer: Peer) -> Optional[int]:
+    if peer.address_ipv4:
+        return int(IPv4Address(peer.address_ipv4))
+    if peer.address_ipv6:
+        return int(IPv6Address(peer.address_ipv6))
+    return None
+
+
+def k_nearest(peers: Sequence[Peer], k: int) -> Iterator[Edge]:
+    # peers are close to each other when their VPN addresses are
+    keyed: List[Tuple[int, str]] = []
+    for peer in peers:
+        key = address_key(peer)
+        if key is not None:
+            keyed.append((key, peer.name))
+    keyed.sort()
+
+    seen: Set[Edge] = set()
+    for i, (key, name) in enumerate(keyed):
+        window = keyed[max(i - k, 0) : i] + keyed[i + 1 : i + k + 1]
+        for _, other in heapq.nsmallest(
+            k, window, key=lambda entry: abs(entry[0] - key)
+        ):
+            edge = normalize(name, other)
+            if edge not in seen:
+                seen.add(edge)
+                yield edge
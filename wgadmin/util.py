@@ -14,32 +14,88 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import json
-import subprocess
+import os
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Tuple, Union
+from typing import Any, Iterator, List, Tuple, Union
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
+from wgadmin import keygen, keypool, timing
+
+
+@timing.timed("keygen")
 def generate_public_key(private_key: str) -> str:
-    return (
-        subprocess.check_output(["/usr/bin/wg", "pubkey"], input=private_key.encode())
-        .decode()
-        .strip()
-    )
+    return keygen.get_backend().generate_public_key(private_key)
 
 
+@timing.timed("keygen")
 def generate_private_key() -> str:
-    return subprocess.check_output(["/usr/bin/wg", "genkey"]).decode().strip()
+    return keygen.get_backend().generate_private_key()
 
 
+@timing.timed("keygen")
 def generate_keypair() -> Tuple[str, str]:
-    private = generate_private_key()
-    return private, generate_public_key(private)
+    pool = keypool.get_active()
+    if pool is not None:
+        return pool.take_keypair()
+    return keygen.get_backend().generate_keypair()
+
 
+@timing.timed("keygen")
+def generate_keypairs(count: int, jobs: int = 1) -> List[Tuple[str, str]]:
+    pool = keypool.get_active()
+    if pool is not None:
+        return pool.take_keypairs(count, jobs)
+    return keygen.generate_keypairs(count, jobs)
 
+
+@timing.timed("keygen")
 def generate_psk() -> str:
-    return subprocess.check_output(["/usr/bin/wg", "genpsk"]).decode().strip()
+    pool = keypool.get_active()
+    if pool is not None:
+        return pool.take_psk()
+    return keygen.get_backend().generate_psk()
+
+
+@timing.timed("keygen")
+def generate_psks(count: int) -> List[str]:
+    pool = keypool.get_active()
+    if pool is not None:
+        return pool.take_psks(count)
+    return keygen.get_backend().generate_psks(count)
 
 
 def load_config(path: Union[str, Path] = "config.json") -> Any:
     with open(path, "r") as fptr:
         return json.load(fptr)
+
+
+def write_file_atomic(path: Union[str, Path], content: Union[str, bytes]):
+    # readers never see a truncated file and a crash keeps the old version
+    path = Path(path)
+    tmp_path = path.with_name(".{}.tmp".format(path.name))
+    with open(tmp_path, "wb" if isinstance(content, bytes) else "w") as fptr:
+        fptr.write(content)
+        fptr.flush()
+        os.fsync(fptr.fileno())
+    if path.exists():
+        os.chmod(tmp_path, path.stat().st_mode)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def file_lock(path: Union[str, Path]) -> Iterator[None]:
+    # advisory lock on a <path>.lock file, serializes concurrent invocations
+    path = Path(path)
+    with open(path.with_name(path.name + ".lock"), "a") as fptr:
+        if fcntl is not None:
+            fcntl.flock(fptr.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fptr.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,283 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Binary snapshot format for large networks (*.wgnet), all integers little-endian:
+#
+#   header      b"WGNET\0", u16 version
+#   settings    u32 length, JSON document
+#   peers       u32 count, then per peer:
+#                 name, interface, endpoint_address (strings)
+#                 ipv4, ipv6 (addresses), u32 port
+#                 private_key, public_key (keys)
+#                 u16 number of tags, tags (strings)
+#   edges       u32 count, u8 PSK layout, u32 peer_a/u32 peer_b (peer indices) for
+#               every edge, then either all PSKs as raw 32 bytes (layout 0) or one key
+#               per edge (layout 1)
+#
+# strings are a u16 length followed by UTF-8, keys are a u8 tag followed by either
+# the raw 32 bytes (tag 0) or a string (tag 1) for values that are not canonical
+# base64 keys, addresses are a u8 tag: 0 (empty), 4 (4 bytes), 6 (16 bytes) or
+# 255 (string) for values that do not round-trip through the ipaddress module.
+
+import binascii
+import json
+import mmap
+import struct
+from ipaddress import IPv4Address, IPv6Address
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union
+
+from wgadmin import util
+from wgadmin.peer import Peer
+
+if TYPE_CHECKING:
+    from wgadmin.network import Network
+
+MAGIC = b"WGNET\0"
+VERSION = 1
+
+KEY_RAW = 0
+KEY_STRING = 1
+ADDRESS_EMPTY = 0
+ADDRESS_IPV4 = 4
+ADDRESS_IPV6 = 6
+ADDRESS_STRING = 255
+
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_EDGE = struct.Struct("<II")
+_EDGE_HEADER = struct.Struct("<IB")
+
+
+class FormatError(ValueError):
+    pass
+
+
+def _pack_string(out: List[bytes], value: str):
+    encoded = value.encode()
+    out.append(_U16.pack(len(encoded)))
+    out.append(encoded)
+
+
+def _pack_key(out: List[bytes], key: str):
+    try:
+        raw = binascii.a2b_base64(key)
+    except binascii.Error:
+        raw = b""
+    if (len(raw) == 32) and (binascii.b2a_base64(raw, newline=False).decode() == key):
+        out.append(_U8.pack(KEY_RAW))
+        out.append(raw)
+        return
+    out.append(_U8.pack(KEY_STRING))
+    _pack_string(out, key)
+
+
+def _pack_address(out: List[bytes], address: str):
+    if not address:
+        out.append(_U8.pack(ADDRESS_EMPTY))
+        return
+    for tag, cls in ((ADDRESS_IPV4, IPv4Address), (ADDRESS_IPV6, IPv6Address)):
+        try:
+            parsed = cls(address)
+        except ValueError:
+            continue
+        if str(parsed) == address:
+            out.append(_U8.pack(tag))
+            out.append(parsed.packed)
+            return
+    out.append(_U8.pack(ADDRESS_STRING))
+    _pack_string(out, address)
+
+
+def dumps(net: "Network") -> bytes:
+    out: List[bytes] = [MAGIC, _U16.pack(VERSION)]
+
+    settings = json.dumps(net.settings_dict()).encode()
+    out.append(_U32.pack(len(settings)))
+    out.append(settings)
+
+    indices: Dict[str, int] = {}
+    out.append(_U32.pack(len(net.peers)))
+    for index, peer in enumerate(net.peers.values()):
+        indices[peer.name] = index
+        _pack_string(out, peer.name)
+        _pack_string(out, peer.interface)
+        _pack_string(out, peer.endpoint_address)
+        _pack_address(out, peer.address_ipv4)
+        _pack_address(out, peer.address_ipv6)
+        out.append(_U32.pack(peer.port))
+        _pack_key(out, peer.private_key)
+        _pack_key(out, peer.public_key)
+        out.append(_U16.pack(len(peer.tags)))
+        for tag in peer.tags:
+            _pack_string(out, tag)
+
+    connections = list(net.iter_connections())
+    psks: List[bytes] = []
+    for connection in connections:
+        try:
+            raw = binascii.a2b_base64(connection.psk)
+        except binascii.Error:
+            break
+        if (len(raw) != 32) or (
+            binascii.b2a_base64(raw, newline=False).decode() != connection.psk
+        ):
+            break
+        psks.append(raw)
+
+    out.append(_U32.pack(len(connections)))
+    out.append(_U8.pack(KEY_RAW if len(psks) == len(connections) else KEY_STRING))
+    for connection in connections:
+        out.append(
+            _EDGE.pack(indices[connection.peer_a.name], indices[connection.peer_b.name])
+        )
+    if len(psks) == len(connections):
+        out.extend(psks)
+    else:
+        for connection in connections:
+            _pack_key(out, connection.psk)
+
+    return b"".join(out)
+
+
+class _Reader:
+    def __init__(self, data: Union[bytes, mmap.mmap]):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def unpack(self, fmt: struct.Struct) -> Tuple[int, ...]:
+        try:
+            values = fmt.unpack_from(self.data, self.offset)
+        except struct.error as error:
+            raise FormatError("truncated wgnet file") from error
+        self.offset += fmt.size
+        return values
+
+    def read(self, size: int) -> memoryview:
+        if self.offset + size > len(self.data):
+            raise FormatError("truncated wgnet file")
+        chunk = self.data[self.offset : self.offset + size]
+        self.offset += size
+        return chunk
+
+    def string(self) -> str:
+        (length,) = self.unpack(_U16)
+        return str(self.read(length), "utf-8")
+
+    def key(self) -> str:
+        (tag,) = self.unpack(_U8)
+        if tag == KEY_RAW:
+            return binascii.b2a_base64(self.read(32), newline=False).decode()
+        if tag == KEY_STRING:
+            return self.string()
+        raise FormatError("invalid key tag {}".format(tag))
+
+    def address(self) -> str:
+        (tag,) = self.unpack(_U8)
+        if tag == ADDRESS_EMPTY:
+            return ""
+        if tag == ADDRESS_IPV4:
+            return str(IPv4Address(bytes(self.read(4))))
+        if tag == ADDRESS_IPV6:
+            return str(IPv6Address(bytes(self.read(16))))
+        if tag == ADDRESS_STRING:
+            return self.string()
+        raise FormatError("invalid address tag {}".format(tag))
+
+    def release(self):
+        self.data.release()
+
+
+def loads(data: Union[bytes, mmap.mmap]) -> "Network":
+    from wgadmin.network import Network
+
+    reader = _Reader(data)
+    try:
+        if bytes(reader.read(len(MAGIC))) != MAGIC:
+            raise FormatError("not a wgnet file")
+        (version,) = reader.unpack(_U16)
+        if version != VERSION:
+            raise FormatError("unsupported wgnet version {}".format(version))
+
+        (length,) = reader.unpack(_U32)
+        net = Network.from_dict(
+            {
+                "settings": json.loads(bytes(reader.read(length))),
+                "peers": {},
+                "connections": [],
+            }
+        )
+
+        (num_peers,) = reader.unpack(_U32)
+        peers: List[Peer] = []
+        for _ in range(num_peers):
+            name = reader.string()
+            interface = reader.string()
+            endpoint_address = reader.string()
+            ipv4 = reader.address()
+            ipv6 = reader.address()
+            (port,) = reader.unpack(_U32)
+            private_key = reader.key()
+            public_key = reader.key()
+            (num_tags,) = reader.unpack(_U16)
+            tags = [reader.string() for _ in range(num_tags)]
+            peer = Peer(
+                name=name,
+                interface=interface,
+                ipv4=ipv4,
+                ipv6=ipv6,
+                port=port,
+                private_key=private_key,
+                public_key=public_key,
+                endpoint_address=endpoint_address,
+                tags=tags,
+            )
+            net.peers[name] = peer
+            peers.append(peer)
+
+        num_edges, layout = reader.unpack(_EDGE_HEADER)
+        edges = _EDGE.iter_unpack(reader.read(num_edges * _EDGE.size))
+        if layout == KEY_RAW:
+            block = reader.read(num_edges * 32)
+            psks = [
+                binascii.b2a_base64(block[i : i + 32], newline=False).decode()
+                for i in range(0, num_edges * 32, 32)
+            ]
+        elif layout == KEY_STRING:
+            psks = [reader.key() for _ in range(num_edges)]
+        else:
+            raise FormatError("invalid PSK layout {}".format(layout))
+
+        for (index_a, index_b), psk in zip(edges, psks):
+            peers[index_a].add_connection(peers[index_b], psk, force=True)
+    except IndexError as error:
+        raise FormatError("invalid peer index in wgnet file") from error
+    finally:
+        reader.release()
+
+    return net
+
+
+def load_file(path: Union[str, Path]) -> "Network":
+    with open(path, "rb") as fptr:
+        if Path(path).stat().st_size == 0:
+            raise FormatError("empty wgnet file")
+        with mmap.mmap(fptr.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return loads(mapped)
+
+
+def dump_file(net: "Network", path: Union[str, Path]):
+    util.write_file_atomic(path, dumps(net))
@@ -0,0 +1,232 @@
+# Copyright (C) 2020  Fabian Köhler <fabian.koehler@protonmail.ch>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Builds a partial network document from YAML parser events, without
+# constructing the parts of the document that are not needed.
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO, Tuple, Union
+
+import yaml
+
+from wgadmin import serialization
+
+
+class Unsupported(Exception):
+    pass
+
+
+_SCALAR_LOADER = yaml.SafeLoader("")
+
+
+def _scalar(event: yaml.ScalarEvent) -> Any:
+    tag = event.tag
+    if tag is None or tag == "!":
+        tag = _SCALAR_LOADER.resolve(yaml.ScalarNode, event.value, event.implicit)
+    if tag == "tag:yaml.org,2002:str":
+        return event.value
+    return _SCALAR_LOADER.construct_object(
+        yaml.ScalarNode(tag, event.value, style=event.style)
+    )
+
+
+def _construct(events: Iterator[yaml.Event], event: yaml.Event) -> Any:
+    if isinstance(event, yaml.ScalarEvent):
+        return _scalar(event)
+    if event.anchor is not None:
+        raise Unsupported()
+
+    if isinstance(event, yaml.SequenceStartEvent):
+        items = []
+        for event in events:
+            if isinstance(event, yaml.SequenceEndEvent):
+                return items
+            items.append(_construct(events, event))
+
+    if isinstance(event, yaml.MappingStartEvent):
+        mapping = {}
+        for event in events:
+            if isinstance(event, yaml.MappingEndEvent):
+                return mapping
+            key = _construct(events, event)
+            mapping[key] = _construct(events, next(events))
+
+    raise Unsupported()
+
+
+def _skip(events: Iterator[yaml.Event], event: yaml.Event):
+    depth = 0
+    while True:
+        if isinstance(event, yaml.AliasEvent):
+            raise Unsupported()
+        if isinstance(event, (yaml.SequenceStartEvent, yaml.MappingStartEvent)):
+            depth += 1
+        elif isinstance(event, (yaml.SequenceEndEvent, yaml.MappingEndEvent)):
+            depth -= 1
+        if depth == 0:
+            return
+        event = next(events)
+
+
+def _expect(events: Iterator[yaml.Event], event_type: type) -> yaml.Event:
+    event = next(events)
+    if not isinstance(event, event_type):
+        raise Unsupported()
+    return event
+
+
+def _events(fptr: TextIO) -> Iterator[yaml.Event]:
+    # positioned inside the top-level mapping
+    events = yaml.parse(fptr, Loader=serialization.yaml_loader())
+    _expect(events, yaml.StreamStartEvent)
+    _expect(events, yaml.DocumentStartEvent)
+    _expect(events, yaml.MappingStartEvent)
+    return events
+
+
+def _count_degrees(events: Iterator[yaml.Event], event: yaml.Event) -> Dict[str, int]:
+    # only the connections are constructed, one at a time
+    if not isinstance(event, yaml.SequenceStartEvent):
+        raise Unsupported()
+    degrees: Dict[str, int] = {}
+    for event in events:
+        if isinstance(event, yaml.SequenceEndEvent):
+            return degrees
+        entry = _construct(events, event)
+        for peer_name in (entry["peer_a"], entry["peer_b"]):
+            degrees[peer_name] = degrees.get(peer_name, 0) + 1
+    raise Unsupported()
+
+
+def _connections_of(
+    events: Iterator[yaml.Event], event: yaml.Event, name: str
+) -> List[Dict[str, Any]]:
+    # the connections are constructed one at a time, only those of the peer kept
+    if not isinstance(event, yaml.SequenceStartEvent):
+        raise Unsupported()
+    connections = []
+    for event in events:
+        if isinstance(event, yaml.SequenceEndEvent):
+            return connections
+        entry = _construct(events, event)
+        if name in (entry["peer_a"], entry["peer_b"]):
+            connections.append(entry)
+    raise Unsupported()
+
+
+def _iter_peers(
+    events: Iterator[yaml.Event], event: yaml.Event
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    if not isinstance(event, yaml.MappingStartEvent):
+        raise Unsupported()
+    for event in events:
+        if isinstance(event, yaml.MappingEndEvent):
+            return
+        peer_name = _construct(events, event)
+        yield peer_name, _construct(events, next(events))
+
+
+def count_degrees(path: Union[str, Path]) -> Dict[str, int]:
+    with open(path, "r") as fptr:
+        events = _events(fptr)
+        for event in events:
+            if isinstance(event, yaml.MappingEndEvent):
+                break
+            key = _construct(events, event)
+            event = next(events)
+            if key == "connections":
+                return _count_degrees(events, event)
+            _skip(events, event)
+    return {}
+
+
+def iter_peer_entries(
+    path: Union[str, Path]
+) -> Iterator[Tuple[str, Dict[str, Any], int]]:
+    # files written by wgadmin have sorted keys, so the connections come before
+    # the peers and a single pass is enough
+    degrees: Optional[Dict[str, int]] = None
+    with open(path, "r") as fptr:
+        events = _events(fptr)
+        for event in events:
+            if isinstance(event, yaml.MappingEndEvent):
+                break
+            key = _construct(events, event)
+            event = next(events)
+            if key == "connections":
+                degrees = _count_degrees(events, event)
+            elif key == "peers" and degrees is not None:
+                for peer_name, entry in _iter_peers(events, event):
+                    yield peer_name, entry, degrees.get(peer_name, 0)
+                return
+            elif key == "peers":
+                break
+            else:
+                _skip(events, event)
+
+    degrees = count_degrees(path)
+    with open(path, "r") as fptr:
+        events = _events(fptr)
+        for event in events:
+            if isinstance(event, yaml.MappingEndEvent):
+                break
+            key = _construct(events, event)
+            event = next(events)
+            if key == "peers":
+                for peer_name, entry in _iter_peers(events, event):
+                    yield peer_name, entry, degrees.get(peer_name, 0)
+                return
+            _skip(events, event)
+
+
+def scan(path: Union[str, Path], name: Optional[str]) -> Dict[str, Any]:
+    # walk the parser events and only construct the parts of the document that
+    # are needed, the connection list of a mesh dominates the file size
+    document: Dict[str, Any] = {"settings": {}, "peers": {}, "connections": []}
+    neighbors: Optional[Set[str]] = None
+
+    with open(path, "r") as fptr:
+        events = _events(fptr)
+        for event in events:
+            if isinstance(event, yaml.MappingEndEvent):
+                break
+            key = _construct(events, event)
+            event = next(events)
+
+            if key == "peers" and isinstance(event, yaml.MappingStartEvent):
+                for event in events:
+                    if isinstance(event, yaml.MappingEndEvent):
+                        break
+                    peer_name = _construct(events, event)
+                    event = next(events)
+                    if name is None:
+                        document["peers"][peer_name] = None
+                        _skip(events, event)
+                    elif neighbors is None or peer_name in neighbors:
+                        document["peers"][peer_name] = _construct(events, event)
+                    else:
+                        _skip(events, event)
+            elif key == "connections" and name is not None:
+                document["connections"] = _connections_of(events, event, name)
+                neighbors = {name}
+                for entry in document["connections"]:
+                    neighbors.add(entry["peer_a"])
+                    neighbors.add(entry["peer_b"])
+            elif key == "connections":
+                _skip(events, event)
+            else:
+                document[key] = _construct(events, event)
+
+    return document